@@ -1,6 +1,17 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # 서버 기동 시 임베딩 모델을 백그라운드에서 미리 로드 (EMBEDDING_WARMUP=True 인 경우)
+        if settings.EMBEDDING_WARMUP:
+            from .embeddings import registry
+            threading.Thread(target=registry.warm_up, name="embedding-warmup", daemon=True).start()
@@ -0,0 +1,143 @@
+import functools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+
+from . import search_index
+from .dedup import SHA256UploadHandler
+from .embeddings import registry
+from .models import PDFFile
+from .semantic import semantic_search
+from .uploads import UploadRejected, create_upload_job, dispatch_job
+
+logger = logging.getLogger(__name__)
+
+# PDF 파싱, 모델 추론 같은 CPU 작업을 돌리는 제한된 크기의 스레드 풀
+# 이벤트 루프는 막지 않고, 동시에 실행되는 무거운 작업 수는 ASYNC_CPU_WORKERS 로 제한
+cpu_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_CPU_WORKERS, thread_name_prefix="async-cpu")
+
+
+# 풀 스레드는 요청 시작/종료 신호를 받지 않으므로 호출 앞뒤로 끊겼거나 CONN_MAX_AGE 가 지난 DB 연결을 직접 정리
+# (정리하지 않으면 MySQL 이 wait_timeout 으로 끊은 연결을 다음 호출이 그대로 씀)
+def with_fresh_connections(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+def run_in_cpu_pool(func):
+    return sync_to_async(with_fresh_connections(func), thread_sensitive=False, executor=cpu_executor)
+
+
+# 파일 I/O, S3 처럼 대기 시간이 대부분인 작업은 기본 스레드 풀로 넘김
+def run_in_io_pool(func):
+    return sync_to_async(with_fresh_connections(func), thread_sensitive=False)
+
+
+class AsyncView(View):
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # ASGI 에서 CSRF 검사 없이 API 로 쓰도록 (DRF APIView 와 동일하게 세션 인증을 쓰지 않음)
+        view.csrf_exempt = True
+        return view
+
+    # DRF 의 JSONParser / FormParser / MultiPartParser 와 같은 입력을 받음
+    def request_data(self, request):
+        if request.content_type == 'application/json':
+            return json.loads(request.body or b'{}')
+        return request.POST
+
+
+# RecommendView 의 비동기 버전. 업로드 저장은 I/O 스레드, 동기 모드의 ingestion 은 CPU 풀에서 실행
+class AsyncRecommendView(AsyncView):
+    async def post(self, request):
+        hasher = SHA256UploadHandler(request)
+        request.upload_handlers.insert(0, hasher)
+        try:
+            # multipart 파싱은 업로드 핸들러가 파일을 쓰므로 스레드에서 수행
+            data, files = await run_in_io_pool(lambda: (request.POST, request.FILES))()
+            try:
+                job = await run_in_io_pool(create_upload_job)(data, files, hasher)
+            except UploadRejected as e:
+                return JsonResponse({"error": str(e)}, status=e.status)
+            body, status_code = await run_in_cpu_pool(dispatch_job)(job)
+            return JsonResponse(body, status=status_code)
+        except Exception as e:
+            logger.error(f"Error occurred: {e}")
+            return JsonResponse({"error": str(e)}, status=500)
+
+
+# SearchView 의 비동기 버전
+class AsyncSearchView(AsyncView):
+    async def post(self, request):
+        try:
+            data = self.request_data(request)
+            if 'keyword' not in data or not ('pdf_file_id' in data or 'user_id' in data):
+                return JsonResponse({"error": "keyword and pdf_file_id or user_id must be provided."}, status=400)
+
+            keyword = data['keyword']
+            try:
+                limit = int(data.get('limit', 20))
+                pdf_file_id = int(data['pdf_file_id']) if 'pdf_file_id' in data else None
+                user_id = int(data['user_id']) if 'user_id' in data else None
+            except (TypeError, ValueError):
+                return JsonResponse({"error": "pdf_file_id, user_id and limit must be integers."}, status=400)
+            search = run_in_io_pool(search_index.search)
+            if pdf_file_id is not None:
+                if not await PDFFile.objects.filter(pk=pdf_file_id).aexists():
+                    return JsonResponse({"error": "PDF file or user not found."}, status=404)
+                results = await search(keyword, pdf_file_id=pdf_file_id, limit=limit)
+            else:
+                if not await User.objects.filter(pk=user_id).aexists():
+                    return JsonResponse({"error": "PDF file or user not found."}, status=404)
+                results = await search(keyword, user_id=user_id, limit=limit)
+
+            return JsonResponse({'results': results})
+        except Exception as e:
+            logger.error(f"Error occurred in AsyncSearchView: {e}")
+            return JsonResponse({"error": str(e)}, status=500)
+
+
+# SemanticSearchView 의 비동기 버전 (질의 인코딩은 CPU 풀에서 실행)
+class AsyncSemanticSearchView(AsyncView):
+    async def post(self, request):
+        try:
+            data = self.request_data(request)
+            if 'query' not in data or not ('pdf_file_id' in data or 'user_id' in data):
+                return JsonResponse({"error": "query and pdf_file_id or user_id must be provided."}, status=400)
+
+            query = data['query']
+            try:
+                top_k = int(data.get('top_k', 10))
+                pdf_file_id = int(data['pdf_file_id']) if 'pdf_file_id' in data else None
+                user_id = int(data['user_id']) if 'user_id' in data else None
+            except (TypeError, ValueError):
+                return JsonResponse({"error": "pdf_file_id, user_id and top_k must be integers."}, status=400)
+            search = run_in_cpu_pool(semantic_search)
+            if pdf_file_id is not None:
+                if not await PDFFile.objects.filter(pk=pdf_file_id).aexists():
+                    return JsonResponse({"error": "PDF file or user not found."}, status=404)
+                results = await search(query, registry.encode, top_k=top_k, pdf_file_id=pdf_file_id)
+            else:
+                if not await User.objects.filter(pk=user_id).aexists():
+                    return JsonResponse({"error": "PDF file or user not found."}, status=404)
+                results = await search(query, registry.encode, top_k=top_k, user_id=user_id)
+
+            return JsonResponse({'results': results})
+        except Exception as e:
+            logger.error(f"Error occurred in AsyncSemanticSearchView: {e}")
+            return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,129 @@
+import logging
+import re
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import PageText
+from .similarity import normalize
+
+logger = logging.getLogger(__name__)
+
+# 챕터 임베딩에 쓸 텍스트: 'title' 은 챕터 제목만, 'content' 는 챕터 페이지 본문
+EMBEDDING_SOURCES = ('title', 'content')
+
+
+def load_page_texts(pdf_file):
+    return dict(PageText.objects.filter(pdf_file=pdf_file).values_list('page_number', 'text'))
+
+
+# 토크나이저가 없을 때 쓰는 토큰 수 추정: 영문/숫자는 4글자마다, 그 외 글자(한글, 기호)는 한 글자마다 토큰 하나로 셈
+TOKEN_ESTIMATE_RE = re.compile(r'[A-Za-z0-9]{1,4}|\S')
+
+
+def _chunk_estimated(text, max_tokens):
+    chunks = []
+    words = []
+    tokens = 0
+    for word in text.split():
+        count = len(TOKEN_ESTIMATE_RE.findall(word))
+        if words and tokens + count > max_tokens:
+            chunks.append(' '.join(words))
+            words, tokens = [], 0
+        # 한 단어가 max_tokens 보다 길면 글자 단위로 나눔
+        while count > max_tokens:
+            pieces = TOKEN_ESTIMATE_RE.findall(word)
+            chunks.append(''.join(pieces[:max_tokens]))
+            word = ''.join(pieces[max_tokens:])
+            count -= max_tokens
+        words.append(word)
+        tokens += count
+    if words:
+        chunks.append(' '.join(words))
+    return chunks
+
+
+# max_tokens 토큰 이하의 조각으로 나눔. model 이 있으면 모델 토크나이저로 센 토큰 기준으로 자르고
+# (한국어처럼 단어 하나가 여러 토큰이 되는 텍스트도 모델이 뒷부분을 잘라내지 않도록) 없으면 글자 수로 추정
+def chunk_text(text, max_tokens, model=None):
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is None or not getattr(tokenizer, 'is_fast', False):
+        return _chunk_estimated(text, max_tokens)
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)['offset_mapping']
+    return [
+        text[offsets[start][0]:offsets[min(start + max_tokens, len(offsets)) - 1][1]]
+        for start in range(0, len(offsets), max_tokens)
+    ]
+
+
+# 챕터 제목과 페이지(start_page ~ end_page) 본문을 조각으로 나눔. 조각이 너무 많으면 고르게 골라서 비용을 제한
+# model 은 tokenizer 와 max_seq_length 를 가진 인코더 (registry.get()). 조각은 특수 토큰을 뺀 모델 최대 길이를 넘지 않음
+def chapter_chunks(chapter, page_texts, max_tokens=None, max_chunks=None, model=None):
+    max_tokens = max_tokens or settings.CHAPTER_EMBEDDING_CHUNK_TOKENS
+    max_chunks = max_chunks or settings.CHAPTER_EMBEDDING_MAX_CHUNKS
+    if getattr(model, 'max_seq_length', None):
+        max_tokens = min(max_tokens, model.max_seq_length - 2)
+    body = '\n'.join(page_texts.get(page, '') for page in range(chapter.start_page, chapter.end_page + 1))
+    if not body.strip():
+        return [chapter.name]
+    # 제목도 챕터 내용의 일부로 반영 (첫 조각에 포함되고, 고르게 고를 때도 첫 조각은 항상 남음)
+    chunks = chunk_text(f"{chapter.name}\n{body}", max_tokens, model)
+    if len(chunks) > max_chunks:
+        chunks = [chunks[i] for i in np.linspace(0, len(chunks) - 1, max_chunks).round().astype(int)]
+    return chunks
+
+
+# 챕터 임베딩 계산. content 모드에서는 모든 챕터의 조각을 길이순으로 정렬해서 한 번에 배치 인코딩하고
+# (비슷한 길이끼리 배치되므로 padding 낭비가 적음) 챕터별로 평균을 냄
+def encode_chapters(chapters, encode, page_texts=None, source=None, model=None):
+    source = source or settings.CHAPTER_EMBEDDING_SOURCE
+    if not chapters:
+        return None
+    if source == 'title' or not page_texts:
+        return encode([chapter.name for chapter in chapters])
+    return encode_documents([(chapters, page_texts)], encode, source, model)[0]
+
+
+# 여러 문서의 챕터를 모아서 한 번에 인코딩하고 문서별 임베딩 목록을 반환 (챕터가 없는 문서는 None)
+# documents 는 (chapters, page_texts) 목록. 문서 하나씩 인코딩할 때보다 모델이 받는 배치가 커짐
+def encode_documents(documents, encode, source=None, model=None):
+    source = source or settings.CHAPTER_EMBEDDING_SOURCE
+    started = time.perf_counter()
+    texts = []
+    owners = []
+    total_chapters = 0
+    for chapters, page_texts in documents:
+        for chapter in chapters:
+            chunks = [chapter.name] if source == 'title' else chapter_chunks(chapter, page_texts or {}, model=model)
+            texts += chunks
+            owners += [total_chapters] * len(chunks)
+            total_chapters += 1
+    if not texts:
+        return [None] * len(documents)
+
+    if source == 'title':
+        # 제목은 챕터당 하나이므로 encode_chapters 와 같은 (정규화하지 않은) 결과를 그대로 씀
+        pooled = np.asarray(encode(texts), dtype=np.float32)
+    else:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        encoded = normalize(encode([texts[i] for i in order]))
+        chunk_vectors = np.empty_like(encoded)
+        chunk_vectors[order] = encoded
+
+        owners = np.asarray(owners)
+        pooled = np.zeros((total_chapters, chunk_vectors.shape[1]), dtype=np.float32)
+        np.add.at(pooled, owners, chunk_vectors)
+        pooled /= np.bincount(owners, minlength=total_chapters)[:, None]
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Encoded {len(texts)} chunks for {total_chapters} chapters of {len(documents)} documents in {elapsed:.3f}s "
+        f"({len(texts) / elapsed if elapsed else 0.0:.1f} chunks/s)"
+    )
+    results = []
+    offset = 0
+    for chapters, _ in documents:
+        results.append(pooled[offset:offset + len(chapters)] if chapters else None)
+        offset += len(chapters)
+    return results
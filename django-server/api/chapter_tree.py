@@ -0,0 +1,28 @@
+from .ingestion import PATH_STEP
+from .models import Chapter
+
+
+# 챕터 X 의 모든 하위 챕터: 같은 PDF 에서 path 가 X.path 로 시작하는 행 ((pdf_file, path) 인덱스 범위 조회 1회)
+def descendants(chapter, include_self=False):
+    chapters = Chapter.objects.filter(pdf_file_id=chapter.pdf_file_id, path__startswith=chapter.path)
+    if not include_self:
+        chapters = chapters.exclude(pk=chapter.pk)
+    return chapters.order_by('path')
+
+
+# 루트부터 챕터 X 까지의 조상: path 의 접두사들을 한 번에 조회
+def ancestors(chapter, include_self=False):
+    step = PATH_STEP + 1
+    depth = chapter.depth + 1 if include_self else chapter.depth
+    prefixes = [chapter.path[:step * i] for i in range(1, depth + 1)]
+    return Chapter.objects.filter(pdf_file_id=chapter.pdf_file_id, path__in=prefixes).order_by('path')
+
+
+# 페이지 P 를 포함하는 챕터들 (바깥쪽 -> 안쪽). start_page <= P 인 범위를 (pdf_file, start_page) 인덱스로 읽음
+def chapters_at_page(pdf_file_id, page):
+    return Chapter.objects.filter(pdf_file_id=pdf_file_id, start_page__lte=page, end_page__gte=page).order_by('depth', 'path')
+
+
+# 페이지 P 를 포함하는 가장 깊은(구체적인) 챕터
+def chapter_at_page(pdf_file_id, page):
+    return chapters_at_page(pdf_file_id, page).order_by('-depth', '-start_page').first()
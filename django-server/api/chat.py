@@ -0,0 +1,68 @@
+import base64
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Message
+
+MESSAGE_FIELDS = ('id', 'sender', 'content', 'created_at')
+
+
+# 커서는 마지막으로 받은 메세지의 (created_at, id) 를 담은 불투명한 문자열
+def encode_cursor(created_at, message_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{message_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at, message_id = datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+    # encode_cursor 가 만든 값만 허용 (timezone 이 있는 시각, BIGINT 범위의 id)
+    if created_at.tzinfo is None or not 0 < message_id < 2 ** 63:
+        raise ValueError("Invalid cursor.")
+    return created_at, message_id
+
+
+# 세션의 메세지를 (session, created_at, id) 인덱스 순서로 한 페이지 읽음
+# OFFSET 없이 커서 이후의 행만 읽으므로 대화가 길어져도 페이지마다 쿼리 1회, 같은 비용
+def message_page(session_id, cursor=None, limit=None, newest_first=True):
+    limit = min(limit or settings.CHAT_PAGE_SIZE, settings.CHAT_MAX_PAGE_SIZE)
+    messages = Message.objects.filter(session_id=session_id)
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        if newest_first:
+            messages = messages.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+        else:
+            messages = messages.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id))
+    ordering = ('-created_at', '-id') if newest_first else ('created_at', 'id')
+
+    # 다음 페이지가 있는지 알기 위해 한 행 더 읽음
+    rows = list(messages.order_by(*ordering).values(*MESSAGE_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return rows, next_cursor
+
+
+# 여러 메세지를 한 번의 bulk insert 로 추가하고 저장된 행을 반환
+def append_messages(session, messages, batch_size=None):
+    rows = [Message(session=session, sender=message['sender'], content=message['content']) for message in messages]
+    with transaction.atomic():
+        Message.objects.bulk_create(rows, batch_size=batch_size or settings.INGEST_BULK_BATCH_SIZE)
+        if rows and rows[0].pk is None:
+            # MySQL 은 bulk_create 후 pk 를 돌려주지 않으므로 이번 insert 가 정한 created_at 과 내용으로 다시 찾음
+            # (같은 세션에 동시에 추가된 다른 요청의 행과 섞이지 않도록 세션의 마지막 id 들을 쓰지 않음)
+            saved = defaultdict(list)
+            for message_id, created_at, sender, content in Message.objects.filter(
+                session=session, created_at__in={row.created_at for row in rows}
+            ).order_by('id').values_list('id', 'created_at', 'sender', 'content'):
+                saved[(created_at, sender, content)].append(message_id)
+            for row in rows:
+                row.pk = saved[(row.created_at, row.sender, row.content)].pop(0)
+    return [{field: getattr(row, field) for field in MESSAGE_FIELDS} for row in rows]
@@ -0,0 +1,77 @@
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import ChapterEmbedding, CrossConnection
+from .semantic import chapter_index, from_bytes
+from .similarity import cross_similarity_edges
+
+logger = logging.getLogger(__name__)
+
+
+# 새 PDF 의 챕터를 같은 사용자의 다른 PDF 챕터와 비교해서 유사한 쌍을 CrossConnection 으로 저장하고 저장한 수를 반환
+# 비교 대상 벡터는 의미 검색용 메모리 인덱스(chapter_index)에서 가져오므로 라이브러리 전체를 DB 에서 다시 읽지 않고,
+# 비용은 (새 챕터 수 x 사용자 챕터 수) 로 라이브러리 크기의 제곱이 아니라 새 PDF 크기에 비례
+def link_pdf(pdf_file, chapters, embeddings=None, threshold=None, top_k=None, batch_size=None):
+    if not settings.CROSS_LINK_ENABLED or not chapters:
+        return 0
+    started = time.perf_counter()
+    threshold = settings.CROSS_LINK_THRESHOLD if threshold is None else threshold
+    top_k = settings.CROSS_LINK_TOP_K if top_k is None else top_k
+    if embeddings is None:
+        # 복제된 PDF 처럼 벡터를 들고 있지 않으면 저장된 임베딩을 읽음
+        vectors = dict(ChapterEmbedding.objects.filter(pdf_file=pdf_file).values_list('chapter_id', 'vector'))
+        chapters = [chapter for chapter in chapters if chapter.id in vectors]
+        if not chapters:
+            return 0
+        embeddings = np.stack([from_bytes(vectors[chapter.id]) for chapter in chapters])
+
+    chapter_ids, pdf_ids, corpus = chapter_index.user_vectors(pdf_file.user_id, exclude_pdf_file_id=pdf_file.id)
+    if not len(chapter_ids):
+        return 0
+    sources, targets, similarities = cross_similarity_edges(embeddings, corpus, threshold=threshold, top_k=top_k)
+
+    # 다시 실행해도 이미 있는 연결은 건너뛰고 새 연결만 씀
+    existing = set(CrossConnection.objects.filter(source_pdf_file=pdf_file).values_list('source_id', 'target_id'))
+    connections = []
+    for source, target, similarity in zip(sources.tolist(), targets.tolist(), similarities.tolist()):
+        pair = (chapters[source].id, int(chapter_ids[target]))
+        if pair in existing:
+            continue
+        connections.append(CrossConnection(
+            user_id=pdf_file.user_id,
+            source_id=pair[0],
+            target_id=pair[1],
+            source_pdf_file_id=pdf_file.id,
+            target_pdf_file_id=int(pdf_ids[target]),
+            similarity=similarity,
+        ))
+    CrossConnection.objects.bulk_create(
+        connections, batch_size=batch_size or settings.INGEST_BULK_BATCH_SIZE, ignore_conflicts=True
+    )
+    logger.info(
+        f"Linked {len(chapters)} chapters of PDF {pdf_file.id} against {len(chapter_ids)} chapters: "
+        f"{len(connections)} new cross-document connections in {time.perf_counter() - started:.3f}s"
+    )
+    return len(connections)
+
+
+# PDF 챕터와 다른 PDF 챕터 사이의 연결 (나가는/들어오는 연결 모두, 이 PDF 의 챕터를 chapter 쪽에 둠)
+def pdf_links(pdf_file_id, min_similarity=None, limit=None):
+    outgoing = CrossConnection.objects.filter(source_pdf_file_id=pdf_file_id)
+    incoming = CrossConnection.objects.filter(target_pdf_file_id=pdf_file_id)
+    if min_similarity is not None:
+        outgoing = outgoing.filter(similarity__gte=min_similarity)
+        incoming = incoming.filter(similarity__gte=min_similarity)
+    links = [
+        {'chapter_id': chapter_id, 'other_chapter_id': other_id, 'other_chapter_name': other_name,
+         'other_pdf_file_id': other_pdf_id, 'similarity': similarity}
+        for chapter_id, other_id, other_name, other_pdf_id, similarity in outgoing.values_list(
+            'source_id', 'target_id', 'target__name', 'target_pdf_file_id', 'similarity'
+        ).union(incoming.values_list(
+            'target_id', 'source_id', 'source__name', 'source_pdf_file_id', 'similarity'
+        ), all=True).order_by('-similarity')[:limit]
+    ]
+    return links
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.utils import timezone
+
+from . import search_index
+from .ingestion import BulkWriter
+from .models import (
+    Chapter,
+    ChapterEmbedding,
+    DocumentArtifact,
+    IngestionJob,
+    PageConnection,
+    PageText,
+    PDFFile,
+)
+from .semantic import bump_embedding_revision
+from .similarity import resolve_similarity_params
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+# 업로드가 들어오는 동안 청크 단위로 SHA-256 을 계산하는 업로드 핸들러
+# 다른 핸들러(메모리/임시파일)에 데이터를 그대로 넘기므로 별도의 복사가 없음
+class SHA256UploadHandler(FileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hashes = {}
+        self._hash = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.hashes[self.field_name] = self._hash.hexdigest()
+        return None
+
+
+# 업로드 핸들러를 거치지 않은 파일(관리 명령 등)의 SHA-256
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+    return digest.hexdigest()
+
+
+def storage_key(content_hash, file_name):
+    return f"{content_hash}/{file_name}"
+
+
+# 챕터 그래프와 임베딩을 결정하는 조건의 해시 (PDFFile.ingest_key)
+# 조건이 다른 업로드에 예전 조건으로 만든 그래프를 넘겨주지 않도록 중복 재사용 키에 포함
+def ingest_key(similarity_params=None, embedding_source=None):
+    similarity_params = similarity_params or resolve_similarity_params()
+    options = {
+        'model_name': settings.EMBEDDING_MODEL_NAME,
+        'embedding_source': embedding_source or settings.CHAPTER_EMBEDDING_SOURCE,
+        'threshold': similarity_params['threshold'],
+        'top_k': similarity_params['top_k'],
+    }
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+
+# 같은 내용, 같은 조건으로 ingestion 이 끝난 PDF 가 있으면 반환
+def find_ingested(content_hash, key):
+    if not content_hash:
+        return None
+    return (
+        PDFFile.objects.filter(content_hash=content_hash, ingest_key=key, ingested_at__isnull=False)
+        .order_by('-ingested_at')
+        .first()
+    )
+
+
+# 원본 PDF 를 처음 처리했을 때 걸린 시간 (캐시 적중 시 절약한 시간 계산용)
+def original_ingest_seconds(content_hash):
+    timings = (
+        IngestionJob.objects.filter(pdf_file__content_hash=content_hash, status=IngestionJob.DONE, cache_hit=False)
+        .order_by('-id')
+        .values_list('timings', flat=True)
+        .first()
+    ) or {}
+    return sum(seconds for stage, seconds in timings.items() if stage != 'upload_transfer')
+
+
+# 같은 내용의 원본이 저장소에 있으면 사용 시각을 갱신하고 url 을 반환 (eviction 과 경합하지 않도록 UPDATE 로 선점)
+def reuse_artifact(content_hash):
+    updated = DocumentArtifact.objects.filter(content_hash=content_hash).update(last_used_at=timezone.now())
+    if not updated:
+        return None
+    return DocumentArtifact.objects.filter(content_hash=content_hash).values_list('url', flat=True).first()
+
+
+# 업로드한 원본을 기록 (작업 스레드에서 upload_original 이 끝난 뒤 호출)
+# 같은 내용을 동시에 처리하는 작업이 있을 수 있으므로 UPDATE 를 먼저 하고, 행이 없으면 INSERT
+# 그 사이 다른 작업이 먼저 INSERT 했으면 (IntegrityError) 그 행을 UPDATE
+def record_artifact(content_hash, key, url, size):
+    fields = {'storage_key': key, 'url': url, 'size': size}
+    if not DocumentArtifact.objects.filter(content_hash=content_hash).update(last_used_at=timezone.now(), **fields):
+        try:
+            with transaction.atomic():
+                DocumentArtifact.objects.create(content_hash=content_hash, **fields)
+        except IntegrityError:
+            # 같은 내용을 다른 작업이 먼저 기록함
+            DocumentArtifact.objects.filter(content_hash=content_hash).update(last_used_at=timezone.now(), **fields)
+    return DocumentArtifact.objects.get(content_hash=content_hash)
+
+
+# 원본을 저장소에 올리고 (key, url, 전송 시간) 을 반환. DB 는 쓰지 않음 (기록은 record_artifact)
+def upload_original(path, file_name, content_hash):
+    started = time.perf_counter()
+    key = storage_key(content_hash, file_name)
+    url = get_storage().upload(path, key)
+    logger.info(f"File {file_name} uploaded to {url}")
+    return key, url, time.perf_counter() - started
+
+
+# 원본을 저장소에 올리고 (url, 전송 시간) 을 반환. 같은 내용의 원본이 이미 있으면 올리지 않고 전송 시간은 None
+def store_original(path, file_name, content_hash):
+    url = reuse_artifact(content_hash)
+    if url:
+        return url, None
+    key, url, seconds = upload_original(path, file_name, content_hash)
+    record_artifact(content_hash, key, url, os.path.getsize(path))
+    return url, seconds
+
+
+# 이미 처리된 PDF 의 챕터 그래프, 페이지 텍스트, 색인, 임베딩을 새 PDFFile 로 복제
+def clone_pdf(source, pdf_file, batch_size=None):
+    writer = BulkWriter(batch_size)
+    with transaction.atomic():
+        source_chapters = list(Chapter.objects.filter(pdf_file=source).order_by('id'))
+        chapters = [
+            Chapter(
+                name=chapter.name,
+                start_page=chapter.start_page,
+                end_page=chapter.end_page,
+                level=chapter.level,
+                group=chapter.group,
+                bookmarked=False,
+                pdf_file=pdf_file,
+                depth=chapter.depth,
+                path=chapter.path,
+            )
+            for chapter in source_chapters
+        ]
+        writer.save_chapters(chapters)
+        chapter_map = {old.id: new.id for old, new in zip(source_chapters, chapters)}
+        children = []
+        for old, new in zip(source_chapters, chapters):
+            if old.parent_id in chapter_map:
+                new.parent_id = chapter_map[old.parent_id]
+                children.append(new)
+        Chapter.objects.bulk_update(children, ['parent'], batch_size=writer.batch_size)
+
+        connections = [
+            PageConnection(
+                pdf_file=pdf_file,
+                source_id=chapter_map[source_id],
+                target_id=chapter_map[target_id],
+                similarity=similarity,
+            )
+            for source_id, target_id, similarity in PageConnection.objects.filter(pdf_file=source)
+            .values_list('source_id', 'target_id', 'similarity')
+            if source_id in chapter_map and target_id in chapter_map
+        ]
+        writer.save_connections(connections)
+
+        writer.save_pages([
+            PageText(pdf_file=pdf_file, page_number=page_number, text=text, token_count=token_count)
+            for page_number, text, token_count in PageText.objects.filter(pdf_file=source)
+            .values_list('page_number', 'text', 'token_count')
+        ])
+
+        ChapterEmbedding.objects.bulk_create([
+            ChapterEmbedding(chapter_id=chapter_map[chapter_id], pdf_file=pdf_file, model_name=model_name, vector=vector)
+            for chapter_id, model_name, vector in ChapterEmbedding.objects.filter(pdf_file=source)
+            .values_list('chapter_id', 'model_name', 'vector')
+            if chapter_id in chapter_map
+        ], batch_size=writer.batch_size)
+        bump_embedding_revision()
+
+        postings = search_index.clone_pdf(source.id, pdf_file, chapter_map, writer.batch_size)
+
+    return chapters, {
+        'chapters': len(chapters),
+        'connections': len(connections),
+        'postings': postings,
+        'seconds': round(writer.seconds, 4),
+        'rows_per_second': round(writer.rows_per_second, 1),
+    }
+
+
+# 참조하는 PDFFile 이 없고 grace 기간 동안 쓰이지 않은 저장소 원본을 삭제
+# 같은 hash 로 새 업로드가 들어오면 last_used_at 이 갱신되므로 grace 기간 안에서는 지워지지 않음
+def evict_unused_artifacts(storage, grace=None, dry_run=False):
+    grace = grace or timedelta(seconds=settings.ARTIFACT_EVICTION_GRACE_SECONDS)
+    unused = DocumentArtifact.objects.filter(last_used_at__lt=timezone.now() - grace).exclude(
+        Exists(PDFFile.objects.filter(content_hash=OuterRef('content_hash')))
+    )
+    evicted = []
+    for artifact in unused:
+        if dry_run:
+            evicted.append(artifact.storage_key)
+            continue
+        with transaction.atomic():
+            # 삭제 직전에 다시 확인하고 행을 먼저 지운 뒤 저장소 객체를 삭제
+            deleted, _ = DocumentArtifact.objects.filter(
+                pk=artifact.pk, last_used_at=artifact.last_used_at
+            ).exclude(Exists(PDFFile.objects.filter(content_hash=OuterRef('content_hash')))).delete()
+            if not deleted:
+                continue
+            storage.delete(artifact.storage_key)
+        evicted.append(artifact.storage_key)
+        logger.info(f"Evicted unused artifact {artifact.storage_key}")
+    return evicted
+
+
+# 중복 업로드 캐시 적중률과 절약한 시간
+def cache_stats():
+    jobs = IngestionJob.objects.filter(status=IngestionJob.DONE, cache_hit__isnull=False)
+    counts = dict(jobs.values('cache_hit').annotate(n=Count('id')).values_list('cache_hit', 'n'))
+    hits, misses = counts.get(True, 0), counts.get(False, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+        'seconds_saved': round(jobs.aggregate(total=Sum('seconds_saved'))['total'] or 0.0, 3),
+        'artifacts': DocumentArtifact.objects.count(),
+    }
+
+
+def timed_clone(source, pdf_file):
+    started = time.perf_counter()
+    chapters, stats = clone_pdf(source, pdf_file)
+    elapsed = time.perf_counter() - started
+    saved = max(original_ingest_seconds(source.content_hash) - elapsed, 0.0)
+    logger.info(f"Reused PDF {source.id} for PDF {pdf_file.id} in {elapsed:.3f}s (saved {saved:.2f}s)")
+    return chapters, stats, saved
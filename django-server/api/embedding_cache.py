@@ -0,0 +1,247 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+# 1단계: 프로세스 내부의 크기 제한 LRU
+class MemoryLRU:
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is not None:
+                self._items.move_to_end(key)
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+KEY_DTYPE = 'S32'  # text_key() 길이
+
+
+# 2단계: 디스크 저장소. 벡터는 고정 크기 memmap(.npy), key -> row 색인과 LRU 순서는 sqlite 에 저장
+# 여러 프로세스가 같이 써도 row 할당은 sqlite 트랜잭션 안에서 이뤄짐
+# memmap 은 sqlite 잠금 밖에서 읽으므로 row 마다 그 row 에 들어 있는 key 를 keys.npy 에 같이 둠
+# 쓰는 쪽은 key 를 지우고 -> 벡터 -> key 순서로 쓰고, 읽는 쪽은 벡터를 읽기 전후의 key 가 모두 맞을 때만 사용
+# (색인을 읽은 뒤 다른 프로세스가 그 row 를 다른 텍스트로 덮어쓰고 있으면 미스로 처리)
+class DiskStore:
+    def __init__(self, directory, max_items):
+        self.directory = directory
+        self.max_items = max_items
+        self.vectors = None
+        self.keys = None
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), check_same_thread=False, timeout=30)
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER UNIQUE, last_used REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+        self._db.commit()
+        self._open_vectors()
+
+    def _vectors_path(self):
+        return os.path.join(self.directory, 'vectors.npy')
+
+    def _keys_path(self):
+        return os.path.join(self.directory, 'keys.npy')
+
+    # 이미 만들어진 파일만 엶. keys.npy 가 없는 (이전 형식의) 저장소는 쓰기 전까지 비어 있는 것으로 취급
+    def _open_vectors(self):
+        if os.path.exists(self._keys_path()) and os.path.exists(self._vectors_path()):
+            self.keys = np.load(self._keys_path(), mmap_mode='r+')
+            self.vectors = np.load(self._vectors_path(), mmap_mode='r+')
+
+    # 파일을 새로 만듦 (put_many 의 쓰기 트랜잭션 안에서만 호출하므로 다른 프로세스와 동시에 만들지 않음)
+    # 임시 파일에 만든 뒤 rename 하므로 다른 프로세스가 반쯤 만든 파일을 열지 않음. keys.npy 를 먼저 둠
+    def _create_vectors(self, dim):
+        self._db.execute('DELETE FROM entries')
+        for path, dtype, shape in (
+            (self._keys_path(), KEY_DTYPE, (self.max_items,)),
+            (self._vectors_path(), np.float32, (self.max_items, dim)),
+        ):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape).flush()
+            os.replace(tmp_path, path)
+        self._open_vectors()
+
+    def get_many(self, keys):
+        if self.vectors is None:
+            # 다른 프로세스가 먼저 만들었을 수 있음
+            self._open_vectors()
+        if self.vectors is None or not keys:
+            return {}
+        with self._lock:
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(self._db.execute(
+                    f'SELECT key, row FROM entries WHERE key IN ({placeholders})', chunk
+                ).fetchall())
+            if not found:
+                return {}
+            found_keys = list(found)
+            rows = np.fromiter(found.values(), dtype=np.int64, count=len(found))
+            expected = np.array([key.encode() for key in found_keys], dtype=KEY_DTYPE)
+            before = np.array(self.keys[rows])
+            vectors = np.array(self.vectors[rows])
+            valid = (before == expected) & (np.array(self.keys[rows]) == expected)
+            result = {key: vectors[i] for i, key in enumerate(found_keys) if valid[i]}
+            if result:
+                now = time.time()
+                self._db.executemany('UPDATE entries SET last_used = ? WHERE key = ?', [(now, key) for key in result])
+                self._db.commit()
+            return result
+
+    def put_many(self, items):
+        if not items:
+            return
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if self.vectors is None:
+                    self._open_vectors()
+                if self.vectors is None:
+                    self._create_vectors(dim=len(next(iter(items.values()))))
+                keys = list(items)
+                existing = set()
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    existing.update(key for (key,) in self._db.execute(
+                        f'SELECT key FROM entries WHERE key IN ({placeholders})', chunk
+                    ))
+                new_keys = [key for key in keys if key not in existing][:self.max_items]
+
+                # 삭제는 eviction 때만 일어나고 그 row 는 바로 재사용되므로 사용 중인 row 는 항상 0..used-1
+                used = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+                rows = list(range(used, min(used + len(new_keys), self.max_items)))
+                if len(rows) < len(new_keys):
+                    # 가장 오래 쓰이지 않은 항목의 row 를 재사용
+                    victims = self._db.execute(
+                        'SELECT key, row FROM entries ORDER BY last_used LIMIT ?', (len(new_keys) - len(rows),)
+                    ).fetchall()
+                    self._db.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key, _ in victims])
+                    rows += [row for _, row in victims]
+                    self.evictions += len(victims)
+
+                if new_keys:
+                    row_index = np.asarray(rows, dtype=np.int64)
+                    # 읽는 쪽이 덮어쓰는 중인 row 를 이전 key 의 벡터로 쓰지 않도록 key 를 먼저 지움
+                    self.keys[row_index] = b''
+                    self.vectors[row_index] = np.stack([items[key] for key in new_keys])
+                    self.keys[row_index] = np.array([key.encode() for key in new_keys], dtype=KEY_DTYPE)
+                    self.vectors.flush()
+                    self.keys.flush()
+                now = time.time()
+                self._db.executemany(
+                    'INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)',
+                    [(key, row, now) for key, row in zip(new_keys, rows)],
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+# (모델, 텍스트) 를 키로 하는 2단계 임베딩 캐시
+class EmbeddingCache:
+    def __init__(self, model_name, memory_items=None, disk_dir=None, disk_items=None):
+        self.model_name = model_name
+        self.memory = MemoryLRU(memory_items or settings.EMBEDDING_CACHE_MEMORY_ITEMS)
+        disk_dir = disk_dir if disk_dir is not None else settings.EMBEDDING_CACHE_DIR
+        self.disk = None
+        if disk_dir:
+            directory = os.path.join(disk_dir, re.sub(r'[^\w.-]', '_', model_name))
+            self.disk = DiskStore(directory, disk_items or settings.EMBEDDING_CACHE_DISK_ITEMS)
+        # 여러 요청 스레드가 같은 캐시를 쓰므로 카운터는 락 안에서 갱신 (+= 는 원자적이지 않음)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _count(self, memory_hits=0, disk_hits=0, misses=0):
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += misses
+
+    # 캐시에 없는 텍스트만 모아서 한 번에 encode_fn 으로 계산
+    def encode(self, texts, encode_fn):
+        keys = [text_key(text) for text in texts]
+        vectors = {}
+        for key in set(keys):
+            vector = self.memory.get(key)
+            if vector is not None:
+                vectors[key] = vector
+        self._count(memory_hits=len(vectors))
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many(missing)
+            for key, vector in from_disk.items():
+                self.memory.put(key, vector)
+            vectors.update(from_disk)
+            self._count(disk_hits=len(from_disk))
+
+        missing_texts = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing_texts:
+            self._count(misses=len(missing_texts))
+            encoded = np.asarray(encode_fn(list(missing_texts.values())), dtype=np.float32)
+            computed = dict(zip(missing_texts, encoded))
+            for key, vector in computed.items():
+                self.memory.put(key, vector)
+            if self.disk is not None:
+                self.disk.put_many(computed)
+            vectors.update(computed)
+
+        return np.stack([vectors[key] for key in keys])
+
+    def stats(self):
+        with self._lock:
+            memory_hits, disk_hits, misses = self.memory_hits, self.disk_hits, self.misses
+        lookups = memory_hits + disk_hits + misses
+        return {
+            'model_name': self.model_name,
+            'memory_hits': memory_hits,
+            'disk_hits': disk_hits,
+            'misses': misses,
+            'hit_rate': round((memory_hits + disk_hits) / lookups, 4) if lookups else 0.0,
+            'memory_items': len(self.memory),
+            'memory_evictions': self.memory.evictions,
+            'disk_items': len(self.disk) if self.disk is not None else 0,
+            'disk_evictions': self.disk.evictions if self.disk is not None else 0,
+        }
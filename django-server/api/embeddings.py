@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .embedding_cache import EmbeddingCache
+from .encoders import current_rss_bytes, load_encoder
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+# 임베딩 모델(EMBEDDING_BACKEND 로 고른 인코더)을 프로세스당 한 번만 로드해서 요청 간에 공유
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._stats = {}
+        self._caches = {}
+        self._substitute = None  # (encode, chunker). substitute() 로 설정
+
+    def _key(self, name=None, device=None, backend=None):
+        return (
+            name or settings.EMBEDDING_MODEL_NAME,
+            device or settings.EMBEDDING_DEVICE,
+            backend or settings.EMBEDDING_BACKEND,
+        )
+
+    def get(self, name=None, device=None, backend=None):
+        key = self._key(name, device, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            # 다른 스레드가 먼저 로드했을 수 있으므로 락 안에서 다시 확인
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(*key)
+                self._models[key] = model
+        return model
+
+    def _load(self, name, device, backend):
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        model = load_encoder(name, backend, device, settings.EMBEDDING_THREADS, settings.EMBEDDING_ONNX_DIR)
+        load_seconds = time.perf_counter() - started
+        rss_delta = current_rss_bytes() - rss_before
+
+        self._stats[(name, device, backend)] = {
+            'model_name': name,
+            'device': device,
+            'backend': backend,
+            'threads': settings.EMBEDDING_THREADS,
+            'load_seconds': round(load_seconds, 3),
+            'rss_delta_bytes': rss_delta,
+            'loaded_at': time.time(),
+        }
+        logger.info(
+            f"Loaded embedding model {name} ({backend}) on {device} in {load_seconds:.2f}s "
+            f"(+{rss_delta / 2**20:.1f} MiB RSS)"
+        )
+        return model
+
+    def cache(self, name=None, backend=None):
+        name = name or settings.EMBEDDING_MODEL_NAME
+        backend = backend or settings.EMBEDDING_BACKEND
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return None
+        if backend != 'torch':
+            # backend 마다 벡터가 조금씩 다르므로 캐시를 따로 둠
+            name = f"{name}@{backend}"
+        cache = self._caches.get(name)
+        if cache is None:
+            with self._lock:
+                cache = self._caches.get(name)
+                if cache is None:
+                    cache = self._caches[name] = EmbeddingCache(name)
+        return cache
+
+    # 모델 대신 encode 함수를 쓰도록 바꿈 (bench_ingestion --hash-encoder, 테스트). 그동안 모델은 로드하지 않음
+    # chunker 는 챕터 본문을 자를 때 쓸 (tokenizer, max_seq_length) 를 가진 객체. None 이면 토큰 수를 글자로 추정
+    @contextmanager
+    def substitute(self, encode, chunker=None):
+        previous = self._substitute
+        self._substitute = (encode, chunker)
+        try:
+            yield
+        finally:
+            self._substitute = previous
+
+    def encode(self, texts, name=None, device=None, batch_size=None, backend=None):
+        if self._substitute is not None:
+            return self._substitute[0](texts)
+        batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+
+        def encode_uncached(uncached_texts):
+            with span('embedding.encode'):
+                return self.get(name, device, backend).encode(uncached_texts, batch_size=batch_size)
+
+        cache = self.cache(name, backend)
+        if cache is None or not len(texts):
+            return encode_uncached(texts)
+        # 캐시에 없는 텍스트만 모델에 배치로 넘김
+        return cache.encode(list(texts), encode_uncached)
+
+    # 챕터 본문을 모델 토큰 기준으로 자를 때 쓰는 인코더 (tokenizer, max_seq_length)
+    # substitute() 중이면 그때 넘긴 chunker
+    def chunking_model(self):
+        if self._substitute is not None:
+            return self._substitute[1]
+        return self.get()
+
+    def warm_up(self):
+        # 첫 요청에서 커널 초기화 비용을 내지 않도록 더미 문장을 한 번 인코딩
+        try:
+            self.encode(['warm up'])
+        except Exception as e:
+            logger.error(f"Embedding model warm-up failed: {e}")
+
+    def is_loaded(self, name=None, device=None, backend=None):
+        return self._key(name, device, backend) in self._models
+
+    def stats(self):
+        return {
+            'models': list(self._stats.values()),
+            'caches': [cache.stats() for cache in self._caches.values()],
+            'rss_bytes': current_rss_bytes(),
+        }
+
+
+registry = ModelRegistry()
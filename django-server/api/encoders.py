@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import re
+import resource
+import time
+import uuid
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 임베딩 계산 방식 (같은 SentenceTransformer 모델)
+# - torch: 기본 PyTorch
+# - torch-int8: Linear 층을 동적 int8 양자화한 PyTorch
+# - onnx / onnx-int8: ONNX 로 내보낸 모델(과 그 동적 int8 양자화본)을 onnxruntime 으로 실행
+BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+
+# SentenceTransformer 를 그대로 쓰는 인코더 (quantize 면 Linear 층을 동적 int8 양자화)
+class TorchEncoder:
+    def __init__(self, name, device='cpu', threads=0, quantize=False):
+        # torch / sentence_transformers 는 실제로 모델이 필요할 때만 import
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            # CPU 서버에서 여러 워커가 코어를 두고 경합하지 않도록 intra-op 스레드 수 제한
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(name, device=device)
+        # 챕터 본문을 모델 토큰 기준으로 자를 때 씀 (chapter_embeddings.chunk_text)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        if quantize:
+            if device != 'cpu':
+                raise ValueError("Dynamic int8 quantization is only supported on CPU.")
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(texts, batch_size=batch_size)
+
+
+def _onnx_dir(onnx_dir, name):
+    return os.path.join(onnx_dir, re.sub(r'[^\w.-]', '_', name))
+
+
+def _replace(write, path):
+    # 여러 프로세스가 동시에 내보내도 완성된 파일만 보이도록 임시 파일에 쓰고 rename
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# SentenceTransformer 의 transformer 부분을 ONNX 로 내보내고 (처음 한 번) 모델 파일 경로를 반환
+# 토크나이저와 pooling/정규화 설정(meta.json)도 같은 디렉터리에 저장해서 실행할 때는 torch 가 필요 없음
+def export_onnx(name, onnx_dir, quantize=False):
+    directory = _onnx_dir(onnx_dir, name)
+    model_path = os.path.join(directory, 'model.onnx')
+    if not os.path.exists(model_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+
+        os.makedirs(directory, exist_ok=True)
+        started = time.perf_counter()
+        model = SentenceTransformer(name, device='cpu')
+        transformer = model[0]
+        pooling = next((module for module in model if isinstance(module, Pooling)), None)
+        if pooling is None or not pooling.pooling_mode_mean_tokens:
+            raise ValueError(f"{name}: only mean pooling models can be exported to ONNX.")
+
+        tokenizer = transformer.tokenizer
+        tokenizer.save_pretrained(directory)
+        sample = tokenizer(['export sample'], return_tensors='pt')
+        # 토크나이저 출력 순서와 forward 인자 순서가 다르므로 이름으로 넘기는 래퍼를 통해 내보냄
+        input_names = [key for key in ('input_ids', 'attention_mask', 'token_type_ids') if key in sample]
+
+        class HiddenStates(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs)))[0]
+
+        dynamic_axes = {key: {0: 'batch', 1: 'sequence'} for key in input_names + ['last_hidden_state']}
+        transformer.auto_model.eval()
+        with torch.no_grad():
+            _replace(lambda path: torch.onnx.export(
+                HiddenStates(transformer.auto_model), tuple(sample[key] for key in input_names), path,
+                input_names=input_names, output_names=['last_hidden_state'], dynamic_axes=dynamic_axes,
+                opset_version=14,
+            ), model_path)
+
+        meta = {
+            'max_seq_length': model.max_seq_length,
+            'normalize': any(isinstance(module, Normalize) for module in model),
+        }
+
+        def write_meta(path):
+            with open(path, 'w') as f:
+                json.dump(meta, f)
+
+        _replace(write_meta, os.path.join(directory, 'meta.json'))
+        logger.info(f"Exported {name} to ONNX in {time.perf_counter() - started:.2f}s")
+
+    if not quantize:
+        return model_path
+    quantized_path = os.path.join(directory, 'model-int8.onnx')
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        _replace(lambda path: quantize_dynamic(model_path, path, weight_type=QuantType.QInt8), quantized_path)
+        logger.info(f"Quantized ONNX model for {name} to int8")
+    return quantized_path
+
+
+# ONNX 로 내보낸 모델을 onnxruntime 으로 실행하는 인코더
+# SentenceTransformer 와 같게 mean pooling (+ 모델이 정규화하면 L2 정규화) 해서 같은 벡터 공간을 유지
+class OnnxEncoder:
+    def __init__(self, name, onnx_dir, device='cpu', threads=0, quantize=False):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = export_onnx(name, onnx_dir, quantize)
+        directory = os.path.dirname(model_path)
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.max_seq_length = self.meta['max_seq_length']
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        providers = ['CUDAExecutionProvider'] if device.startswith('cuda') else []
+        self.session = ort.InferenceSession(model_path, options, providers=providers + ['CPUExecutionProvider'])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        # 비슷한 길이끼리 배치해서 padding 을 줄임 (SentenceTransformer.encode 와 같은 방식)
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        outputs = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in batch], padding=True, truncation=True,
+                max_length=self.meta['max_seq_length'], return_tensors='np',
+            )
+            hidden = self.session.run(None, {key: inputs[key].astype(np.int64) for key in self.input_names})[0]
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.meta['normalize']:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            for i, vector in zip(batch, pooled):
+                outputs[i] = vector
+        return np.stack(outputs).astype(np.float32)
+
+
+def load_encoder(name, backend='torch', device='cpu', threads=0, onnx_dir=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(BACKENDS)}.")
+    if backend.startswith('onnx'):
+        return OnnxEncoder(name, onnx_dir, device, threads, quantize=backend == 'onnx-int8')
+    return TorchEncoder(name, device, threads, quantize=backend == 'torch-int8')
+
+
+def current_rss_bytes():
+    # /proc/self/statm 의 두 번째 값이 현재 RSS (페이지 단위)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # procfs 가 없는 환경에서는 최대 RSS 로 대체 (linux 기준 KB 단위)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# 프로세스 풀 워커: 새 프로세스에서 backend 하나를 로드해서 처리량과 메모리를 측정 (bench_encoders)
+# 다른 backend 가 올려 둔 메모리와 섞이지 않도록 backend 마다 새 프로세스에서 실행
+def measure_backend(name, backend, texts, batch_size=32, repeat=3, device='cpu', threads=0, onnx_dir=None):
+    rss_before = current_rss_bytes()
+    started = time.perf_counter()
+    encoder = load_encoder(name, backend, device, threads, onnx_dir)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = current_rss_bytes()
+
+    # 첫 배치는 커널/세션 초기화 비용이 섞이므로 측정에서 제외
+    encoder.encode(texts[:batch_size], batch_size=batch_size)
+    runs = []
+    embeddings = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        embeddings = encoder.encode(texts, batch_size=batch_size)
+        runs.append(time.perf_counter() - started)
+    best = min(runs)
+    return {
+        'backend': backend,
+        'load_seconds': round(load_seconds, 3),
+        'seconds': [round(run, 4) for run in runs],
+        'texts_per_second': round(len(texts) / best, 1) if best else 0.0,
+        'rss_model_bytes': rss_loaded - rss_before,
+        'rss_bytes': current_rss_bytes(),
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'embeddings': np.asarray(embeddings, dtype=np.float32),
+    }
+
+
+# 기준 임베딩과 후보 임베딩의 일치도: 같은 텍스트끼리의 코사인 유사도, 최근접 이웃이 같은 비율, top-k 이웃 겹침
+def agreement(reference, candidate, top_k=10):
+    reference = np.array(reference, dtype=np.float32)
+    candidate = np.array(candidate, dtype=np.float32)
+    reference /= np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate /= np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    cosine = np.sum(reference * candidate, axis=1)
+
+    result = {
+        'cosine_mean': round(float(cosine.mean()), 6),
+        'cosine_min': round(float(cosine.min()), 6),
+        'cosine_p1': round(float(np.percentile(cosine, 1)), 6),
+    }
+    n = len(reference)
+    if n > 1:
+        k = min(top_k, n - 1)
+        neighbors = []
+        for vectors in (reference, candidate):
+            sims = vectors @ vectors.T
+            np.fill_diagonal(sims, -np.inf)
+            neighbors.append(np.argsort(-sims, axis=1)[:, :k])
+        result['nearest_neighbor_agreement'] = round(float(np.mean(neighbors[0][:, 0] == neighbors[1][:, 0])), 4)
+        result[f'top{k}_overlap'] = round(float(np.mean([
+            len(np.intersect1d(a, b)) / k for a, b in zip(*neighbors)
+        ])), 4)
+    return result
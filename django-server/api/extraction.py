@@ -0,0 +1,118 @@
+import logging
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pymupdf as fitz  # PyMuPDF
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 스풀 파일을 mmap 으로 열어서 복사 없이 PyMuPDF 에 넘김
+@contextmanager
+def open_pdf(path):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                pdf_document = fitz.open(stream=view, filetype="pdf")
+            except Exception:
+                # view 가 남아 있으면 mmap 을 닫지 못해서 원래 오류 대신 BufferError 가 남
+                view.release()
+                raise
+            try:
+                yield pdf_document
+            finally:
+                pdf_document.close()
+                del pdf_document
+                view.release()
+
+
+# 프로세스 풀 워커: 같은 스풀 파일을 각자 mmap 으로 열어서 [start, stop) 페이지의 텍스트를 추출
+def extract_range(path, start, stop):
+    with open_pdf(path) as pdf_document:
+        return [pdf_document.load_page(page_num).get_text() for page_num in range(start, stop)]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# 추출용 프로세스 풀 (프로세스당 하나, 처음 쓸 때 생성)
+# 워커 스레드가 도는 프로세스에서 fork 하지 않도록 spawn 으로 시작
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = settings.EXTRACTION_WORKERS or os.cpu_count() or 1
+                _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+                logger.info(f"Started PDF extraction pool with {workers} processes")
+    return _executor
+
+
+# 페이지 범위를 프로세스 풀에 나눠서 추출하고 (page_number, text) 를 페이지 순서대로 하나씩 내보냄
+# 동시에 처리 중인 범위 수를 제한해서 문서 크기와 관계없이 메모리 사용량이 일정함
+class PageExtractor:
+    def __init__(self, path, total_pages, chunk_pages=None, max_pending=None):
+        self.path = path
+        self.total_pages = total_pages
+        self.chunk_pages = chunk_pages or settings.EXTRACTION_CHUNK_PAGES
+        self.max_pending = max_pending or 2 * (settings.EXTRACTION_WORKERS or os.cpu_count() or 1)
+        self.pages = 0
+        self.seconds = 0.0
+
+    def _parallel(self):
+        return settings.EXTRACTION_WORKERS != 1 and self.total_pages >= settings.EXTRACTION_PARALLEL_MIN_PAGES
+
+    def _chunks(self):
+        if not self._parallel():
+            # 작은 문서는 프로세스 간 전달 비용이 더 크므로 현재 프로세스에서 바로 추출
+            with open_pdf(self.path) as pdf_document:
+                for page_num in range(self.total_pages):
+                    yield [pdf_document.load_page(page_num).get_text()]
+            return
+
+        executor = get_executor()
+        ranges = iter(range(0, self.total_pages, self.chunk_pages))
+        pending = deque()
+        for start in ranges:
+            pending.append(executor.submit(extract_range, self.path, start, min(start + self.chunk_pages, self.total_pages)))
+            if len(pending) >= self.max_pending:
+                break
+        try:
+            while pending:
+                texts = pending.popleft().result()
+                start = next(ranges, None)
+                if start is not None:
+                    pending.append(executor.submit(
+                        extract_range, self.path, start, min(start + self.chunk_pages, self.total_pages)
+                    ))
+                yield texts
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def __iter__(self):
+        started = time.perf_counter()
+        try:
+            for texts in self._chunks():
+                for text in texts:
+                    self.pages += 1
+                    yield self.pages, text
+        finally:
+            self.seconds = time.perf_counter() - started
+            logger.info(
+                f"Extracted {self.pages}/{self.total_pages} pages in {self.seconds:.3f}s "
+                f"({self.pages_per_second:.1f} pages/s)"
+            )
+
+    @property
+    def pages_per_second(self):
+        return self.pages / self.seconds if self.seconds else 0.0
@@ -0,0 +1,77 @@
+import gzip
+import json
+import logging
+
+import msgpack
+from django.db.models import Count, F, Max
+
+from .models import Chapter, GraphSnapshot, PageConnection, PDFFile
+
+logger = logging.getLogger(__name__)
+
+
+# 연결 정보가 바뀌었는지 판단하는 시그니처 (PDF 의 graph_revision, 행 수, 최대 id) - 집계 쿼리 2회
+# 추가/삭제는 행 수와 최대 id 로, 기존 행의 수정은 graph_revision 으로 알 수 있음
+def graph_version(pdf_file_id):
+    state = PageConnection.objects.filter(pdf_file_id=pdf_file_id).aggregate(count=Count('id'), last=Max('id'))
+    chapters = Chapter.objects.filter(pdf_file_id=pdf_file_id).aggregate(
+        count=Count('id'), last=Max('id'), revision=Max('pdf_file__graph_revision')
+    )
+    return (
+        f"{chapters['revision'] or 0}.{chapters['count']}.{chapters['last'] or 0}."
+        f"{state['count']}.{state['last'] or 0}"
+    )
+
+
+# 챕터/연결을 bulk 가 아닌 방법(save, 관리 화면, queryset.update 등)으로 고친 뒤 호출
+# 개별 save() 는 signals.py 에서 자동으로 호출
+def bump_graph_revision(pdf_file_id):
+    PDFFile.objects.filter(pk=pdf_file_id).update(graph_revision=F('graph_revision') + 1)
+
+
+def graph_etag(pdf_file_id, version, fmt):
+    return f'"{pdf_file_id}-{version}-{fmt}"'
+
+
+# graph_data.json 과 같은 nodes / links(value) 구성을 열 단위 배열로 만듦
+# 정렬 순서를 (pdf_file, level, start_page), (pdf_file, similarity) 인덱스와 맞춰서 추가 정렬 없이 읽음
+def build_graph(pdf_file_id):
+    nodes = {'id': [], 'name': [], 'level': [], 'group': [], 'start_page': [], 'end_page': []}
+    for row in Chapter.objects.filter(pdf_file_id=pdf_file_id).order_by('level', 'start_page', 'id').values_list(
+        'id', 'name', 'level', 'group', 'start_page', 'end_page'
+    ):
+        for column, value in zip(nodes.values(), row):
+            column.append(value)
+
+    links = {'source': [], 'target': [], 'value': []}
+    for row in PageConnection.objects.filter(pdf_file_id=pdf_file_id).order_by('similarity', 'id').values_list(
+        'source_id', 'target_id', 'similarity'
+    ):
+        for column, value in zip(links.values(), row):
+            column.append(value)
+
+    return {'pdf_file_id': pdf_file_id, 'nodes': nodes, 'links': links}
+
+
+# 시그니처가 같으면 저장된 스냅샷을, 다르면 새로 만들어 저장한 스냅샷을 반환
+def get_snapshot(pdf_file_id, version=None):
+    version = version or graph_version(pdf_file_id)
+    snapshot = GraphSnapshot.objects.filter(pdf_file_id=pdf_file_id).first()
+    # msgpack_gzip 이 없는 (msgpack 없이 만든) 예전 스냅샷은 다시 만듦
+    if snapshot is not None and snapshot.version == version and snapshot.msgpack_gzip is not None:
+        return snapshot
+
+    graph = build_graph(pdf_file_id)
+    snapshot, _ = GraphSnapshot.objects.update_or_create(
+        pdf_file_id=pdf_file_id,
+        defaults={
+            'version': version,
+            'json_gzip': gzip.compress(json.dumps(graph, ensure_ascii=False, separators=(',', ':')).encode('utf-8')),
+            'msgpack_gzip': gzip.compress(msgpack.packb(graph)),
+        },
+    )
+    logger.info(
+        f"Rebuilt graph snapshot for PDF {pdf_file_id}: "
+        f"{len(graph['nodes']['id'])} nodes, {len(graph['links']['source'])} links"
+    )
+    return snapshot
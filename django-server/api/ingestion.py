@@ -0,0 +1,207 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Chapter, PageConnection, PageText
+from .similarity import resolve_similarity_params, similarity_edges
+
+logger = logging.getLogger(__name__)
+
+
+# materialized path 한 단계의 자리수 (형제 9999개까지)
+PATH_STEP = 4
+
+
+# 목차 제목이 챕터 이름 컬럼보다 길면 잘라서 저장 (MySQL strict 모드는 긴 값을 거부해서 ingestion 전체가 실패함)
+NAME_MAX_LENGTH = Chapter._meta.get_field('name').max_length
+
+
+def path_segment(position):
+    return f"{position:0{PATH_STEP}d}/"
+
+
+# TOC 항목을 저장되지 않은 Chapter 객체 목록으로 변환 (스택 한 번 순회, O(n))
+# 스택에는 현재 항목의 조상들이 있고, 새 항목보다 레벨이 같거나 깊은 항목을 꺼낼 때 그 항목의 끝 페이지가 정해짐
+# end_page 는 다음에 나오는 "자손이 아닌" 항목의 시작 페이지 - 1, 마지막까지 열려 있는 항목은 문서의 마지막 페이지
+def build_chapters(toc, pdf_file, total_pages):
+    chapters = []
+    stack = []  # (chapter, 자식 수)
+    root_count = 0
+    current_group = 1  # 현재 그룹 번호
+
+    def close(chapter, end_page):
+        # 시작 페이지와 끝 페이지가 동일한 경우를 처리
+        chapter.end_page = max(end_page, chapter.start_page)
+
+    for entry in toc:
+        level, title, start_page = entry[:3]
+        while stack and stack[-1][0].level >= level:
+            close(stack.pop()[0], start_page - 1)
+
+        if stack:
+            parent = stack[-1][0]
+            stack[-1][1] += 1
+            path = parent.path + path_segment(stack[-1][1])
+        else:
+            # 그루핑: 최상위 챕터마다 새로운 그룹 시작
+            parent = None
+            root_count += 1
+            current_group += 1
+            path = path_segment(root_count)
+
+        chapter = Chapter(
+            name=title[:NAME_MAX_LENGTH],
+            start_page=start_page,
+            end_page=start_page,
+            level=level,
+            group=current_group,
+            bookmarked=False,
+            pdf_file=pdf_file,
+            depth=len(stack),
+            path=path,
+        )
+        # 저장 전에는 FK 에 넣을 수 없으므로 저장 후 parent_id 를 채우기 위해 보관
+        chapter.tree_parent = parent
+        chapters.append(chapter)
+        stack.append([chapter, 0])
+
+    for chapter, _ in stack:
+        close(chapter, total_pages)
+    return chapters
+
+
+# 저장된 챕터의 parent_id 를 채움 (bulk_create 로 id 가 정해진 뒤)
+def link_parents(chapters, batch_size=None):
+    children = []
+    for chapter in chapters:
+        parent = getattr(chapter, 'tree_parent', None)
+        if parent is not None:
+            chapter.parent_id = parent.pk
+            children.append(chapter)
+    if children:
+        Chapter.objects.bulk_update(children, ['parent'], batch_size=batch_size or settings.INGEST_BULK_BATCH_SIZE)
+    return children
+
+
+# (page_number, text, token_count) 목록을 저장되지 않은 PageText 객체 목록으로 변환
+def build_page_texts(pdf_file, pages):
+    return [
+        PageText(pdf_file=pdf_file, page_number=page_number, text=text, token_count=token_count)
+        for page_number, text, token_count in pages
+    ]
+
+
+# 챕터 계층(부모 -> 바로 아래 자식) 기반 연결
+def build_hierarchy_connections(chapters):
+    return [
+        PageConnection(
+            pdf_file_id=chapter.pdf_file_id,
+            source=chapter.tree_parent,
+            target=chapter,
+            similarity=-1.0,  # 챕터기반 연결 구분
+        )
+        for chapter in chapters if getattr(chapter, 'tree_parent', None) is not None
+    ]
+
+
+# 챕터 임베딩 유사도 기반 연결
+# (source, target) 은 유일해야 하므로 exclude 에 있는 쌍(이미 계층으로 연결된 챕터)은 건너뜀
+def build_similarity_connections(chapters, embeddings, threshold=None, top_k=0, exclude=()):
+    if not chapters:
+        return []
+    sources, targets, similarities = similarity_edges(embeddings, threshold=threshold, top_k=top_k)
+    exclude = set(exclude)
+    return [
+        PageConnection(
+            pdf_file_id=chapters[i].pdf_file_id,
+            source=chapters[i],
+            target=chapters[j],
+            similarity=float(similarity),
+        )
+        for i, j, similarity in zip(sources.tolist(), targets.tolist(), similarities.tolist())
+        if (chapters[i].pk, chapters[j].pk) not in exclude
+    ]
+
+
+# 메모리에서 만든 행들을 batch 단위 bulk_create 로 저장
+class BulkWriter:
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.INGEST_BULK_BATCH_SIZE
+        self.rows = 0
+        self.seconds = 0.0
+
+    def save_chapters(self, chapters):
+        if not chapters:
+            return chapters
+        started = time.perf_counter()
+        Chapter.objects.bulk_create(chapters, batch_size=self.batch_size)
+        if chapters[0].pk is None:
+            # MySQL 은 bulk_create 후 pk 를 돌려주지 않으므로 삽입 순서대로 다시 매핑
+            ids = list(
+                Chapter.objects.filter(pdf_file_id=chapters[0].pdf_file_id)
+                .order_by('id')
+                .values_list('id', flat=True)
+            )[-len(chapters):]
+            for chapter, chapter_id in zip(chapters, ids):
+                chapter.pk = chapter_id
+        self._record(len(chapters), started)
+        return chapters
+
+    def save_pages(self, pages):
+        if not pages:
+            return pages
+        started = time.perf_counter()
+        PageText.objects.bulk_create(pages, batch_size=self.batch_size)
+        self._record(len(pages), started)
+        return pages
+
+    def save_connections(self, connections):
+        if not connections:
+            return connections
+        started = time.perf_counter()
+        PageConnection.objects.bulk_create(connections, batch_size=self.batch_size)
+        self._record(len(connections), started)
+        return connections
+
+    def _record(self, rows, started):
+        self.rows += rows
+        self.seconds += time.perf_counter() - started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+# 챕터와 연결 정보를 하나의 트랜잭션으로 저장
+def write_chapter_graph(chapters, embeddings, similarity_params=None, batch_size=None):
+    similarity_params = similarity_params or resolve_similarity_params()
+    writer = BulkWriter(batch_size)
+    with transaction.atomic():
+        writer.save_chapters(chapters)
+        link_parents(chapters, writer.batch_size)
+        connections = build_hierarchy_connections(chapters)
+        connections += build_similarity_connections(
+            chapters, embeddings, **similarity_params,
+            exclude=[(connection.source_id, connection.target_id) for connection in connections],
+        )
+        writer.save_connections(connections)
+
+    logger.info(
+        f"Bulk inserted {len(chapters)} chapters and {len(connections)} connections "
+        f"in {writer.seconds:.3f}s ({writer.rows_per_second:.0f} rows/s)"
+    )
+    return {
+        'chapters': len(chapters),
+        'connections': len(connections),
+        'seconds': round(writer.seconds, 4),
+        'rows_per_second': round(writer.rows_per_second, 1),
+    }
+
+
+def save_chapter_graph(pdf_file, toc, total_pages, encode, similarity_params=None, batch_size=None):
+    chapters = build_chapters(toc, pdf_file, total_pages)
+    # 모델 추론은 트랜잭션 밖에서 먼저 수행해서 DB 락 보유 시간을 줄임
+    embeddings = encode([chapter.name for chapter in chapters]) if chapters else None
+    return chapters, write_chapter_graph(chapters, embeddings, similarity_params, batch_size)
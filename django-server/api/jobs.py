@@ -0,0 +1,92 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import IngestionJob
+from .pipeline import run_job
+
+logger = logging.getLogger(__name__)
+
+
+# 대기 중인 작업 하나를 원자적으로 선점 (status 조건부 UPDATE 라서 브로커 없이 여러 워커/프로세스가 안전하게 공유)
+def claim_next_job():
+    pending = IngestionJob.objects.filter(status=IngestionJob.PENDING).order_by('id').values_list('id', flat=True)[:10]
+    for job_id in pending:
+        claimed = IngestionJob.objects.filter(pk=job_id, status=IngestionJob.PENDING).update(
+            status=IngestionJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return IngestionJob.objects.get(pk=job_id)
+    return None
+
+
+# 워커가 죽어서 running 상태로 남은 오래된 작업을 다시 대기열로 돌림
+# 실행 중인 작업은 단계/페이지 batch 마다 started_at 을 갱신하므로 마지막 heartbeat 이후 max_age 가 지난 작업만 해당
+# (다시 실행할 때 run_job 이 이전 실행의 PDFFile 을 지움)
+def requeue_stale_jobs(max_age=None):
+    max_age = max_age or timedelta(seconds=settings.INGESTION_JOB_TIMEOUT)
+    return IngestionJob.objects.filter(
+        status=IngestionJob.RUNNING, started_at__lt=timezone.now() - max_age
+    ).update(status=IngestionJob.PENDING, stage='', progress=0)
+
+
+# 로컬 스레드 풀 워커 (외부 브로커 없이 DB 를 큐로 사용)
+class JobWorkerPool:
+    def __init__(self, size=None, poll_interval=None):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            # 이전 프로세스가 처리 중에 죽어서 running 으로 남은 작업을 먼저 대기열로 돌림
+            try:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    logger.warning(f"Requeued {requeued} stale ingestion jobs")
+            except Exception as e:
+                logger.error(f"Failed to requeue stale ingestion jobs: {e}")
+            size = self.size or settings.INGESTION_WORKERS
+            for i in range(size):
+                thread = threading.Thread(target=self._run, name=f"ingestion-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {size} ingestion worker threads")
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        poll_interval = self.poll_interval or settings.INGESTION_POLL_SECONDS
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                job = claim_next_job()
+            except Exception as e:
+                logger.error(f"Failed to claim ingestion job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(poll_interval)
+                self._wakeup.clear()
+                continue
+            run_job(job)
+
+
+pool = JobWorkerPool()
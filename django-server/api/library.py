@@ -0,0 +1,283 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .chapter_embeddings import encode_documents
+from .cross_links import link_pdf
+from .dedup import file_sha256, find_ingested, ingest_key, reuse_artifact, store_original, timed_clone
+from .embeddings import registry
+from .ingestion import BulkWriter, build_chapters, build_page_texts, write_chapter_graph
+from .models import IngestionJob, PDFFile
+from .parsing import parse_document
+from .search_index import index_pdf, tokenize
+from .semantic import save_chapter_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+# 디렉터리 아래의 PDF 경로 (하위 디렉터리 포함, 이름순)
+def find_pdfs(directory):
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths += [os.path.join(root, name) for name in sorted(files) if name.lower().endswith('.pdf')]
+    return paths
+
+
+# 여러 PDF 를 한 번에 ingestion (강의 자료 일괄 등록용, manage.py ingest_pdfs)
+# - 파싱(텍스트/목차 추출)은 파일 단위로 프로세스 풀에서, 원본 업로드는 스레드 풀에서 병렬로 처리
+# - 챕터 임베딩은 여러 문서의 챕터를 모아서 INGEST_LIBRARY_ENCODE_BATCH 개 단위로 한 번에 인코딩
+# - 이미 ingestion 이 끝난 파일(같은 사용자, 같은 content_hash)은 건너뛰므로 중단 후 다시 실행하면 이어서 처리됨
+class LibraryIngester:
+    def __init__(self, user, workers=None, encode_batch=None, upload_threads=None,
+                 embedding_source=None, similarity=None, encode=None, on_file=None):
+        self.user = user
+        self.workers = workers or settings.EXTRACTION_WORKERS or os.cpu_count() or 1
+        self.encode_batch = encode_batch or settings.INGEST_LIBRARY_ENCODE_BATCH
+        self.upload_threads = upload_threads or settings.INGEST_LIBRARY_UPLOAD_THREADS
+        self.source = embedding_source or settings.CHAPTER_EMBEDDING_SOURCE
+        self.similarity = similarity
+        self.ingest_key = ingest_key(similarity, self.source)
+        self.encode = encode or registry.encode
+        self.on_file = on_file
+        self.infer_levels = settings.TOC_HEURISTIC_MAX_LEVELS if settings.TOC_HEURISTIC_ENABLED else 0
+        self.files = []
+        self.encode_batches = 0
+        self.encoded_chapters = 0
+        self.encode_seconds = 0.0
+
+    def _report(self, path, status, **result):
+        result = {'file': path, 'status': status, **result}
+        self.files.append(result)
+        if self.on_file is not None:
+            self.on_file(result)
+
+    def _record_jobs(self, jobs):
+        IngestionJob.objects.bulk_create(jobs, batch_size=settings.INGEST_BULK_BATCH_SIZE)
+
+    def _job(self, path, pdf_file, timings, result, cache_hit, seconds_saved=0.0):
+        now = timezone.now()
+        return IngestionJob(
+            user=self.user, pdf_file=pdf_file, file_name=os.path.basename(path), file_path=path,
+            status=IngestionJob.DONE, stage='clone' if cache_hit else 'index', progress=100,
+            options={'content_hash': pdf_file.content_hash, 'source': 'ingest_pdfs'},
+            timings=timings, result=result, cache_hit=cache_hit, seconds_saved=seconds_saved,
+            started_at=now, finished_at=now,
+        )
+
+    # 다른 사용자가 같은 내용을 이미 처리했으면 파싱 없이 복제
+    def _clone(self, path, content_hash, source):
+        started = time.perf_counter()
+        pdf_file = PDFFile.objects.create(
+            filename=os.path.basename(path), user=self.user, url=reuse_artifact(content_hash) or source.url,
+            content_hash=content_hash, ingest_key=self.ingest_key,
+        )
+        chapters, stats, seconds_saved = timed_clone(source, pdf_file)
+        stats['cross_connections'] = link_pdf(pdf_file, chapters)
+        PDFFile.objects.filter(pk=pdf_file.pk).update(ingested_at=timezone.now())
+        elapsed = time.perf_counter() - started
+        result = {'pdf_file_id': pdf_file.id, 'source_pdf_file_id': source.id, **stats}
+        self._record_jobs([self._job(path, pdf_file, {'clone': round(elapsed, 4)}, result, True, seconds_saved)])
+        self._report(path, 'cloned', pdf_file_id=pdf_file.id, chapters=stats['chapters'], seconds=round(elapsed, 4))
+
+    # 처리할 (경로, content_hash) 목록. 이미 처리된 파일은 건너뛰거나 복제하고 결과를 보고함
+    def _plan(self, paths):
+        done = set(
+            PDFFile.objects.filter(user=self.user, ingested_at__isnull=False).values_list('content_hash', flat=True)
+        )
+        todo = []
+        for path in paths:
+            content_hash = file_sha256(path)
+            if content_hash in done:
+                self._report(path, 'skipped', reason='already ingested')
+                continue
+            done.add(content_hash)
+            source = find_ingested(content_hash, self.ingest_key)
+            if source is not None:
+                self._clone(path, content_hash, source)
+            else:
+                todo.append((path, content_hash))
+        return todo
+
+    # 이전 실행이 중간에 멈춰서 ingestion 이 끝나지 않은 PDFFile 을 지움 (진행 중인 업로드 작업은 제외)
+    def _clear_incomplete(self, hashes):
+        active = IngestionJob.objects.filter(
+            pdf_file=OuterRef('pk'), status__in=[IngestionJob.PENDING, IngestionJob.RUNNING]
+        )
+        deleted = 0
+        for start in range(0, len(hashes), settings.INGEST_BULK_BATCH_SIZE):
+            stale = PDFFile.objects.filter(
+                user=self.user, content_hash__in=hashes[start:start + settings.INGEST_BULK_BATCH_SIZE],
+                ingested_at__isnull=True,
+            ).exclude(Exists(active))
+            for pdf_file in stale:
+                pdf_file.delete()
+                deleted += 1
+        if deleted:
+            logger.info(f"Removed {deleted} incomplete PDF files from a previous run")
+
+    # 파싱 결과로 PDFFile, 페이지 텍스트를 저장하고 챕터를 만듦 (챕터 저장은 인코딩 후 _flush 에서)
+    def _prepare(self, path, content_hash, parsed, url):
+        started = time.perf_counter()
+        texts = parsed['texts']
+        page_tokens = [tokenize(text) for text in texts]
+        with transaction.atomic():
+            pdf_file = PDFFile.objects.create(
+                filename=os.path.basename(path), user=self.user, url=url, content_hash=content_hash,
+                ingest_key=self.ingest_key,
+            )
+            BulkWriter().save_pages(build_page_texts(
+                pdf_file, [(number, text, len(tokens)) for number, (text, tokens) in enumerate(zip(texts, page_tokens), start=1)]
+            ))
+        chapters = build_chapters(parsed['toc'], pdf_file, len(texts))
+        return {
+            'path': path,
+            'pdf_file': pdf_file,
+            'chapters': chapters,
+            'page_tokens': page_tokens,
+            'page_texts': dict(enumerate(texts, start=1)) if self.source == 'content' else None,
+            'toc_source': parsed['toc_source'],
+            'timings': {'extract': round(parsed['seconds'], 4), 'pages': round(time.perf_counter() - started, 4)},
+        }
+
+    # 모인 문서들의 챕터를 한 번에 인코딩하고 문서별로 그래프, 임베딩, 색인을 저장
+    def _flush(self, batch):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            # 본문 조각은 모델 토크나이저 기준으로 자름 (다른 encode 를 받았으면 글자 수로 추정)
+            model = registry.chunking_model() if self.source == 'content' and self.encode == registry.encode else None
+            embeddings = encode_documents(
+                [(doc['chapters'], doc['page_texts']) for doc in batch], self.encode, self.source, model
+            )
+        except Exception as e:
+            logger.error(f"Encoding a batch of {len(batch)} documents failed: {e}")
+            for doc in batch:
+                self._report(doc['path'], 'failed', error=str(e))
+            return
+        encode_seconds = time.perf_counter() - started
+        total_chapters = sum(len(doc['chapters']) for doc in batch)
+        self.encode_batches += 1
+        self.encoded_chapters += total_chapters
+        self.encode_seconds += encode_seconds
+
+        jobs = []
+        for doc, vectors in zip(batch, embeddings):
+            pdf_file, chapters, timings = doc['pdf_file'], doc['chapters'], doc['timings']
+            timings['embed'] = round(encode_seconds * len(chapters) / total_chapters, 4) if total_chapters else 0.0
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    write_stats = write_chapter_graph(chapters, vectors, self.similarity)
+                    save_chapter_embeddings(chapters, vectors)
+                    postings = index_pdf(pdf_file, doc['page_tokens'], chapters)
+                    cross_connections = link_pdf(pdf_file, chapters, vectors)
+                    PDFFile.objects.filter(pk=pdf_file.pk).update(ingested_at=timezone.now())
+            except Exception as e:
+                # PDFFile 은 ingested_at 없이 남으므로 다음 실행에서 지우고 다시 처리됨
+                logger.error(f"Saving {doc['path']} failed: {e}")
+                self._report(doc['path'], 'failed', pdf_file_id=pdf_file.id, error=str(e))
+                continue
+            timings['connections'] = round(time.perf_counter() - started, 4)
+            if 'upload_transfer' in doc:
+                timings['upload_transfer'] = doc['upload_transfer']
+
+            pages = len(doc['page_tokens'])
+            seconds = sum(value for stage, value in timings.items() if stage != 'upload_transfer')
+            result = {
+                'pdf_file_id': pdf_file.id,
+                'first_chapter_id': chapters[0].id if chapters else None,
+                'pages': pages,
+                'postings': postings,
+                'toc_source': doc['toc_source'],
+                'cross_connections': cross_connections,
+                **write_stats,
+            }
+            jobs.append(self._job(doc['path'], pdf_file, timings, result, False))
+            self._report(
+                doc['path'], 'ingested', pdf_file_id=pdf_file.id, pages=pages, chapters=len(chapters),
+                connections=write_stats['connections'], cross_connections=cross_connections, toc_source=doc['toc_source'], seconds=round(seconds, 4),
+                pages_per_second=round(pages / seconds, 1) if seconds else 0.0, timings=timings,
+            )
+        self._record_jobs(jobs)
+
+    def _ingest(self, todo, parse_pool, upload_pool):
+        queue = iter(todo)
+        pending = {}
+
+        def submit():
+            for path, content_hash in queue:
+                upload = upload_pool.submit(store_original, path, os.path.basename(path), content_hash)
+                parse = parse_pool.submit(parse_document, path, self.infer_levels, settings.TOC_HEURISTIC_MAX_LINES)
+                pending[parse] = (path, content_hash, upload)
+                return True
+            return False
+
+        # 동시에 파싱 중인 파일 수를 제한해서 파일 수와 관계없이 메모리 사용량이 일정함
+        while len(pending) < 2 * self.workers and submit():
+            pass
+        batch = []
+        try:
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for parse in finished:
+                    path, content_hash, upload = pending.pop(parse)
+                    submit()
+                    try:
+                        url, transfer_seconds = upload.result()
+                        doc = self._prepare(path, content_hash, parse.result(), url)
+                    except Exception as e:
+                        logger.error(f"Ingesting {path} failed: {e}")
+                        self._report(path, 'failed', error=str(e))
+                        continue
+                    if transfer_seconds is not None:
+                        doc['upload_transfer'] = round(transfer_seconds, 4)
+                    batch.append(doc)
+                    if sum(len(doc['chapters']) for doc in batch) >= self.encode_batch:
+                        self._flush(batch)
+                        batch = []
+            self._flush(batch)
+        finally:
+            for parse in pending:
+                parse.cancel()
+
+    def run(self, paths):
+        started = time.perf_counter()
+        todo = self._plan(paths)
+        self._clear_incomplete([content_hash for _, content_hash in todo])
+        if todo:
+            # 워커 스레드가 도는 프로세스에서 fork 하지 않도록 spawn 으로 시작
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')) as parse_pool, \
+                    ThreadPoolExecutor(max_workers=self.upload_threads) as upload_pool:
+                self._ingest(todo, parse_pool, upload_pool)
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, seconds):
+        counts = {status: 0 for status in ('ingested', 'cloned', 'skipped', 'failed')}
+        for result in self.files:
+            counts[result['status']] += 1
+        pages = sum(result.get('pages', 0) for result in self.files if result['status'] == 'ingested')
+        return {
+            'files': len(self.files),
+            **counts,
+            'pages': pages,
+            'chapters': sum(result.get('chapters', 0) for result in self.files if result['status'] != 'failed'),
+            'seconds': round(seconds, 4),
+            'pages_per_second': round(pages / seconds, 1) if seconds else 0.0,
+            'files_per_second': round((counts['ingested'] + counts['cloned']) / seconds, 2) if seconds else 0.0,
+            'parse_workers': self.workers,
+            'encode': {
+                'batches': self.encode_batches,
+                'chapters': self.encoded_chapters,
+                'seconds': round(self.encode_seconds, 4),
+                'chapters_per_second': round(self.encoded_chapters / self.encode_seconds, 1) if self.encode_seconds else 0.0,
+            },
+        }
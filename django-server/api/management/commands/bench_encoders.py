@@ -0,0 +1,91 @@
+import json
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.encoders import BACKENDS, agreement, measure_backend
+from api.management.commands.bench_ingestion import WORDS
+from api.models import Chapter
+
+
+# 챕터 제목과 본문 조각 길이를 흉내낸 문장 (3 ~ 120 단어)
+def sample_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [' '.join(rng.choices(WORDS, k=rng.choice([3, 6, 12, 40, 120]))) for _ in range(count)]
+
+
+# 임베딩 backend 별 처리량(texts/sec), 로드 시간, 메모리와 기준 backend 대비 임베딩 일치도를 측정
+# backend 마다 새 프로세스에서 로드하므로 메모리 값이 서로 섞이지 않음
+# python manage.py bench_encoders --backends torch onnx onnx-int8 torch-int8 --threads 4 --output encoders.json
+class Command(BaseCommand):
+    help = "Benchmark embedding backends (texts/sec, memory) and report agreement with the baseline backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+        parser.add_argument("--baseline", choices=BACKENDS, default='torch')
+        parser.add_argument("--texts", type=int, default=1000, help="Number of texts to encode.")
+        parser.add_argument("--from-db", action="store_true", help="Use chapter names from the database as texts.")
+        parser.add_argument("--input", help="Read texts from this file, one per line.")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: EMBEDDING_THREADS).")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--output", help="Write JSON results to this file instead of stdout.")
+
+    def _texts(self, options):
+        if options["input"]:
+            with open(options["input"]) as f:
+                texts = [line.strip() for line in f if line.strip()]
+        elif options["from_db"]:
+            texts = list(Chapter.objects.values_list('name', flat=True)[:options["texts"]])
+        else:
+            texts = sample_texts(options["texts"])
+        texts = texts[:options["texts"]]
+        if not texts:
+            raise CommandError("No texts to encode.")
+        return texts
+
+    def handle(self, *args, **options):
+        texts = self._texts(options)
+        backends = [options["baseline"]] + [backend for backend in options["backends"] if backend != options["baseline"]]
+        batch_size = options["batch_size"] or settings.EMBEDDING_BATCH_SIZE
+        threads = settings.EMBEDDING_THREADS if options["threads"] is None else options["threads"]
+
+        results = []
+        baseline = None
+        for backend in backends:
+            # backend 마다 새 프로세스 (spawn) 에서 측정
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(
+                    measure_backend, settings.EMBEDDING_MODEL_NAME, backend, texts, batch_size, options["repeat"],
+                    settings.EMBEDDING_DEVICE, threads, settings.EMBEDDING_ONNX_DIR,
+                ).result()
+            embeddings = result.pop('embeddings')
+            if baseline is None:
+                baseline = result
+                baseline_embeddings = embeddings
+            else:
+                result['speedup'] = round(result['texts_per_second'] / baseline['texts_per_second'], 2)
+                result['agreement'] = agreement(baseline_embeddings, embeddings)
+            results.append(result)
+            self.stderr.write(
+                f"{backend}: {result['texts_per_second']:.1f} texts/s, load {result['load_seconds']:.2f}s, "
+                f"model +{result['rss_model_bytes'] / 2**20:.1f} MiB"
+                + (f", cosine {result['agreement']['cosine_mean']:.4f}" if 'agreement' in result else '')
+            )
+
+        report = json.dumps({
+            'model_name': settings.EMBEDDING_MODEL_NAME,
+            'texts': len(texts),
+            'batch_size': batch_size,
+            'threads': threads,
+            'baseline': options["baseline"],
+            'results': results,
+        }, indent=2)
+        if options["output"]:
+            with open(options["output"], 'w') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
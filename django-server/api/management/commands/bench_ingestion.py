@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import nullcontext
+
+import numpy as np
+import pymupdf as fitz  # PyMuPDF
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.embeddings import current_rss_bytes, registry
+from api.models import IngestionJob, PDFFile
+
+WORDS = (
+    "graph vector matrix theorem proof lemma network memory process thread cache index query "
+    "database storage model layer tensor gradient kernel compiler parser token stream buffer "
+    "알고리즘 자료구조 그래프 정렬 탐색 운영체제 메모리 프로세스 네트워크 데이터베이스"
+).split()
+
+
+# 3단계로 중첩된 목차와 본문이 있는 합성 PDF (장 -> 절 -> 소절)
+def make_textbook(pages, seed):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        lines = [f"{seed} page {i + 1}"] + [' '.join(rng.choices(WORDS, k=12)) for _ in range(30)]
+        page.insert_text((50, 60), '\n'.join(lines), fontsize=9)
+
+    toc = []
+    chapter_pages = max(pages // 10, 1)
+    section_pages = max(chapter_pages // 4, 1)
+    for chapter_start in range(0, pages, chapter_pages):
+        toc.append([1, f"Chapter {len(toc) + 1} {rng.choice(WORDS)}", chapter_start + 1])
+        for section_start in range(chapter_start, min(chapter_start + chapter_pages, pages), section_pages):
+            toc.append([2, f"Section {' '.join(rng.choices(WORDS, k=3))}", section_start + 1])
+            if section_pages >= 2:
+                toc.append([3, f"Topic {' '.join(rng.choices(WORDS, k=2))}", section_start + 2])
+    doc.set_toc(toc)
+    return doc.tobytes(), len(toc)
+
+
+# 모델 없이 DB / 추출 성능만 볼 때 쓰는 결정적 인코더 (텍스트 해시로 만든 난수 벡터)
+def hash_encode(texts, **kwargs):
+    if not len(texts):
+        return np.empty((0, 384), dtype=np.float32)
+    return np.stack([
+        np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).normal(size=384)
+        for text in texts
+    ]).astype(np.float32)
+
+
+def peak_rss_bytes():
+    # linux 에서 ru_maxrss 는 KB 단위. 추출 프로세스 풀은 RUSAGE_CHILDREN 에 잡힘
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+    }
+
+
+# 합성 PDF 를 크기별로 만들어서 RecommendView(동기 모드) -> SearchView 까지 단계별 시간, 쿼리 수, 메모리를 측정
+# python manage.py bench_ingestion --sizes 10 100 500 2000 --hash-encoder --output bench.json
+class Command(BaseCommand):
+    help = "Benchmark end-to-end PDF ingestion and search on synthetic PDFs and print JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000], help="Page counts.")
+        parser.add_argument("--repeat", type=int, default=1)
+        parser.add_argument("--hash-encoder", action="store_true", help="Use a deterministic hash encoder instead of the model.")
+        parser.add_argument("--search-queries", type=int, default=20)
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark PDFs in the database.")
+        parser.add_argument("--output", help="Write JSON results to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='ingestion-benchmark')
+        storage_dir = tempfile.mkdtemp(prefix='bench-storage-')
+        encoder = registry.substitute(hash_encode) if options["hash_encoder"] else nullcontext()
+
+        results = []
+        created = []
+        try:
+            with encoder, override_settings(
+                PDF_STORAGE_BACKEND='local',
+                PDF_LOCAL_STORAGE_DIR=storage_dir,
+                INGESTION_ASYNC=False,
+                EMBEDDING_CACHE_ENABLED=False,
+            ):
+                client = Client()
+                for pages in options["sizes"]:
+                    for run in range(options["repeat"]):
+                        result = self._run(client, user, pages, f"{uuid.uuid4().hex[:8]}-{run}", options)
+                        created += result.pop('pdf_file_ids')
+                        results.append(result)
+                        self.stderr.write(
+                            f"{pages} pages: {result['seconds']:.2f}s, {result['pages_per_second']:.1f} pages/s, "
+                            f"{result['queries']} queries"
+                        )
+        finally:
+            if not options["keep"]:
+                PDFFile.objects.filter(pk__in=created).delete()
+                shutil.rmtree(storage_dir, ignore_errors=True)
+
+        report = json.dumps({'results': results, 'peak_rss_bytes': peak_rss_bytes()}, indent=2)
+        if options["output"]:
+            with open(options["output"], 'w') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
+
+    def _upload(self, client, user, data):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.post('/api/recommend/', {
+                'user_id': user.id,
+                'file': SimpleUploadedFile('benchmark.pdf', data, content_type='application/pdf'),
+            })
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload failed ({response.status_code}): {response.content[:200]!r}")
+        pdf_file_id = response.json()['pdf_file_id']
+        job = IngestionJob.objects.filter(pdf_file_id=pdf_file_id).order_by('-id').first()
+        return pdf_file_id, job, elapsed, len(queries)
+
+    def _run(self, client, user, pages, seed, options):
+        data, toc_entries = make_textbook(pages, seed)
+        rss_before = current_rss_bytes()
+        pdf_file_id, job, elapsed, queries = self._upload(client, user, data)
+        rss_after = current_rss_bytes()
+
+        # 같은 파일을 다시 올리면 중복 업로드 캐시(복제)를 탐
+        reupload_id, reupload_job, reupload_elapsed, reupload_queries = self._upload(client, user, data)
+
+        search_latencies = []
+        rng = random.Random(seed)
+        for i in range(options["search_queries"]):
+            scope = {'pdf_file_id': pdf_file_id} if i % 2 == 0 else {'user_id': user.id}
+            started = time.perf_counter()
+            response = client.post('/api/search/', {'keyword': ' '.join(rng.choices(WORDS, k=2)), **scope})
+            search_latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"Search failed ({response.status_code})")
+
+        return {
+            'pages': pages,
+            'toc_entries': toc_entries,
+            'file_bytes': len(data),
+            'seconds': round(elapsed, 4),
+            'pages_per_second': round(pages / elapsed, 1),
+            'extract_pages_per_second': job.result.get('pages_per_second'),
+            'stage_seconds': job.timings,
+            'queries': queries,
+            'connections': job.result.get('connections'),
+            'postings': job.result.get('postings'),
+            'rows_per_second': job.result.get('rows_per_second'),
+            'rss_delta_bytes': rss_after - rss_before,
+            'reupload': {
+                'seconds': round(reupload_elapsed, 4),
+                'queries': reupload_queries,
+                'cache_hit': reupload_job.cache_hit,
+            },
+            'search': {
+                'queries': len(search_latencies),
+                'latency_p50': round(float(np.percentile(search_latencies, 50)), 4),
+                'latency_p95': round(float(np.percentile(search_latencies, 95)), 4),
+            },
+            'pdf_file_ids': [pdf_file_id, reupload_id],
+        }
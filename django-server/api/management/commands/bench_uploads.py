@@ -0,0 +1,100 @@
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pymupdf as fitz  # PyMuPDF
+from django.core.management.base import BaseCommand
+
+
+def make_pdf(pages, tag):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Benchmark page {i + 1} {tag}")
+    doc.set_toc([[1, f"Chapter {i // 10 + 1}", i + 1] for i in range(0, pages, 10)])
+    return doc.tobytes()
+
+
+def multipart(fields, file_name, data):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode() + data + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+# 실행 중인 서버에 동시 업로드를 보내서 동기 / 비동기 엔드포인트의 처리량과 지연 시간을 비교
+# python manage.py bench_uploads --base-url http://localhost:8000 --user-id 1 --concurrency 8 --requests 64
+class Command(BaseCommand):
+    help = "Load-test concurrent PDF uploads against the sync and async recommend endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--user-id", type=int, required=True)
+        parser.add_argument("--paths", nargs="+", default=["/api/recommend/", "/api/async/recommend/"])
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=32)
+        parser.add_argument("--pages", type=int, default=50)
+        parser.add_argument("--wait", action="store_true", help="Poll each job until it finishes (end-to-end throughput).")
+        parser.add_argument("--timeout", type=float, default=600)
+
+    def handle(self, *args, **options):
+        report = {}
+        for path in options["paths"]:
+            # 중복 업로드 캐시에 걸리지 않도록 요청마다 내용이 다른 PDF 를 미리 만들어 둠
+            payloads = [make_pdf(options["pages"], uuid.uuid4().hex) for _ in range(options["requests"])]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                results = list(executor.map(lambda data: self._upload(path, data, options), payloads))
+            elapsed = time.perf_counter() - started
+
+            latencies = np.array([latency for _, latency in results])
+            statuses = {}
+            for status_code, _ in results:
+                statuses[status_code] = statuses.get(status_code, 0) + 1
+            report[path] = {
+                "requests": len(results),
+                "concurrency": options["concurrency"],
+                "seconds": round(elapsed, 3),
+                "requests_per_second": round(len(results) / elapsed, 2),
+                "pages_per_second": round(len(results) * options["pages"] / elapsed, 1),
+                "latency_p50": round(float(np.percentile(latencies, 50)), 4),
+                "latency_p95": round(float(np.percentile(latencies, 95)), 4),
+                "statuses": statuses,
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _upload(self, path, data, options):
+        body, content_type = multipart({"user_id": options["user_id"]}, "bench.pdf", data)
+        request = urllib.request.Request(
+            options["base_url"] + path, data=body, headers={"Content-Type": content_type}, method="POST"
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=options["timeout"]) as response:
+                status_code, payload = response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, time.perf_counter() - started
+
+        if options["wait"] and status_code == 202:
+            status_code = self._wait(payload["status_url"], options)
+        return status_code, time.perf_counter() - started
+
+    def _wait(self, status_url, options):
+        deadline = time.perf_counter() + options["timeout"]
+        while time.perf_counter() < deadline:
+            with urllib.request.urlopen(options["base_url"] + status_url, timeout=options["timeout"]) as response:
+                job = json.loads(response.read())
+            if job["status"] in ("done", "failed"):
+                return 200 if job["status"] == "done" else 500
+            time.sleep(0.2)
+        return 504
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from api.models import PageText, PDFFile, Posting
+from api.search_index import backfill_pdf, remove_pdf
+
+
+# 검색 색인이 생기기 전에 처리된 PDF 를 저장된 PageText 와 챕터로 색인
+# python manage.py build_search_index [--pdf-file-id 3 --rebuild]
+class Command(BaseCommand):
+    help = "Index stored page text of PDFs that are missing from the keyword search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pdf-file-id", type=int, action="append", help="Only index these PDF files (repeatable).")
+        parser.add_argument("--rebuild", action="store_true", help="Drop and rebuild postings of PDFs that are already indexed.")
+        parser.add_argument("--dry-run", action="store_true", help="Only list PDF files that would be indexed.")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        pdf_files = PDFFile.objects.annotate(
+            has_pages=Exists(PageText.objects.filter(pdf_file=OuterRef('pk'))),
+            indexed=Exists(Posting.objects.filter(pdf_file=OuterRef('pk'))),
+        ).order_by('id')
+        if options["pdf_file_id"]:
+            pdf_files = pdf_files.filter(pk__in=options["pdf_file_id"])
+        if not options["rebuild"]:
+            pdf_files = pdf_files.filter(indexed=False)
+
+        indexed = 0
+        for pdf_file in pdf_files:
+            # PageText 보다 먼저 처리된 PDF 는 본문이 없으므로 다시 업로드해야 함
+            if not pdf_file.has_pages:
+                self.stdout.write(f"Skipped PDF {pdf_file.id} ({pdf_file.filename}): no stored page text")
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"PDF {pdf_file.id} ({pdf_file.filename})")
+                indexed += 1
+                continue
+            if pdf_file.indexed:
+                remove_pdf(pdf_file.id)
+            postings = backfill_pdf(pdf_file, options["batch_size"])
+            self.stdout.write(f"Indexed PDF {pdf_file.id} ({pdf_file.filename}): {postings} postings")
+            indexed += 1
+        self.stdout.write(f"{'Would index' if options['dry_run'] else 'Indexed'} {indexed} PDF files")
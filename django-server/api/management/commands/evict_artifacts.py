@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.dedup import evict_unused_artifacts
+from api.storage import get_storage
+
+
+# 어떤 PDFFile 도 참조하지 않는 저장소 원본 정리
+# python manage.py evict_artifacts --dry-run
+class Command(BaseCommand):
+    help = "Delete stored PDF originals that are no longer referenced by any PDFFile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only list artifacts that would be evicted.")
+
+    def handle(self, *args, **options):
+        evicted = evict_unused_artifacts(get_storage(), dry_run=options["dry_run"])
+        for key in evicted:
+            self.stdout.write(key)
+        self.stdout.write(f"{'Would evict' if options['dry_run'] else 'Evicted'} {len(evicted)} artifacts")
@@ -0,0 +1,82 @@
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.chapter_embeddings import EMBEDDING_SOURCES
+from api.library import LibraryIngester, find_pdfs
+from api.similarity import resolve_similarity_params
+
+
+# 디렉터리의 PDF 를 한 사용자의 자료로 일괄 ingestion. 중단 후 다시 실행하면 끝난 파일은 건너뜀
+# python manage.py ingest_pdfs /data/courses --user-id 1 --workers 8 --output ingest.json
+class Command(BaseCommand):
+    help = "Ingest every PDF under a directory for one user and print per-file and aggregate throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument("--user-id", type=int, required=True)
+        parser.add_argument("--workers", type=int, help="Parser processes (default: EXTRACTION_WORKERS or CPU count).")
+        parser.add_argument("--encode-batch", type=int, help="Chapters to collect across documents before encoding.")
+        parser.add_argument("--upload-threads", type=int)
+        parser.add_argument("--embedding-source", choices=EMBEDDING_SOURCES)
+        parser.add_argument("--similarity-threshold", type=float)
+        parser.add_argument("--similarity-top-k", type=int)
+        parser.add_argument("--limit", type=int, help="Only consider the first N files.")
+        parser.add_argument("--output", help="Write the JSON summary to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options["directory"]):
+            raise CommandError(f"{options['directory']} is not a directory")
+        try:
+            user = User.objects.get(pk=options["user_id"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user_id']} does not exist")
+        similarity = None
+        if options["similarity_threshold"] is not None or options["similarity_top_k"] is not None:
+            try:
+                similarity = resolve_similarity_params({
+                    'similarity_threshold': options["similarity_threshold"],
+                    'similarity_top_k': options["similarity_top_k"],
+                })
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        paths = find_pdfs(options["directory"])[:options["limit"]]
+        self.stderr.write(f"Found {len(paths)} PDF files")
+        ingester = LibraryIngester(
+            user,
+            workers=options["workers"],
+            encode_batch=options["encode_batch"],
+            upload_threads=options["upload_threads"],
+            embedding_source=options["embedding_source"],
+            similarity=similarity,
+            on_file=self._report,
+        )
+        summary = ingester.run(paths)
+        report = json.dumps({'summary': summary, 'files': ingester.files}, indent=2)
+        if options["output"]:
+            with open(options["output"], 'w') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
+        self.stderr.write(
+            f"{summary['ingested']} ingested, {summary['cloned']} cloned, {summary['skipped']} skipped, "
+            f"{summary['failed']} failed: {summary['pages']} pages in {summary['seconds']:.2f}s "
+            f"({summary['pages_per_second']:.1f} pages/s)"
+        )
+
+    def _report(self, result):
+        name = os.path.basename(result['file'])
+        if result['status'] == 'ingested':
+            self.stderr.write(
+                f"{name}: {result['pages']} pages, {result['chapters']} chapters ({result['toc_source']}), "
+                f"{result['seconds']:.2f}s, {result['pages_per_second']:.1f} pages/s"
+            )
+        elif result['status'] == 'failed':
+            self.stderr.write(f"{name}: failed: {result['error']}")
+        elif result['status'] == 'skipped':
+            self.stderr.write(f"{name}: skipped ({result['reason']})")
+        else:
+            self.stderr.write(f"{name}: {result['status']} in {result['seconds']:.2f}s")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import JobWorkerPool
+
+
+# 웹 서버와 별도 프로세스에서 ingestion 작업을 처리하는 워커 (시작할 때 오래된 running 작업을 다시 대기열로 돌림)
+# python manage.py run_ingestion_worker --threads 2
+class Command(BaseCommand):
+    help = "Process pending PDF ingestion jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=None, help="Number of worker threads.")
+
+    def handle(self, *args, **options):
+        pool = JobWorkerPool(size=options["threads"])
+        pool.start()
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
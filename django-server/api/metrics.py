@@ -0,0 +1,172 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, labels, value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + (('le', bound),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+# 프로세스 안의 지표 모음 (Prometheus text format 으로 내보냄, uvicorn worker 마다 따로 집계됨)
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, metric_class, name, help_text, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, metric_class(name, help_text, **kwargs))
+        return metric
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def inc(self, name, help_text, amount=1, **labels):
+        metric = self.counter(name, help_text)
+        with self._lock:
+            metric.inc(amount, **labels)
+
+    def observe(self, name, help_text, value, buckets=DEFAULT_BUCKETS, **labels):
+        metric = self.histogram(name, help_text, buckets)
+        with self._lock:
+            metric.observe(value, **labels)
+
+    def render(self, extra_samples=()):
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.append(f'# HELP {metric.name} {metric.help_text}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines += [f'{name}{_label_text(labels)} {value}' for name, labels, value in metric.samples()]
+        for name, kind, help_text, samples in extra_samples:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines += [f'{name}{_label_text(tuple(sorted(labels.items())))} {value}' for labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# 현재 스레드의 DB 연결에서 실행되는 쿼리 수를 셈
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# 요청 하나에서 실행되는 쿼리 수를 요청 context 를 따라가며 셈
+# async 뷰의 쿼리는 sync_to_async 스레드마다 다른 DB 연결에서 실행되므로 연결별 execute_wrapper 로는 셀 수 없음
+# 모든 연결에 count_request_queries 를 걸어두고 (signals.py) 현재 context 의 counter 에 더함
+_request_counter = ContextVar('request_query_counter', default=None)
+
+
+def count_request_queries(execute, sql, params, many, context):
+    counter = _request_counter.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def request_queries():
+    counter = QueryCounter()
+    token = _request_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _request_counter.reset(token)
+
+
+# 구간(span)의 소요 시간과 그 안에서 실행된 쿼리 수를 기록
+# with span('extract'): ...
+@contextmanager
+def span(name, **labels):
+    counter = QueryCounter()
+    started = time.perf_counter()
+    failed = False
+    try:
+        with connection.execute_wrapper(counter):
+            yield counter
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('spreadout_span_seconds', 'Time spent in an instrumented span.', elapsed, span=name, **labels)
+        registry.observe(
+            'spreadout_span_queries', 'Database queries executed in an instrumented span.', counter.count,
+            buckets=QUERY_BUCKETS, span=name, **labels,
+        )
+        if failed:
+            registry.inc('spreadout_span_errors_total', 'Spans that raised an exception.', span=name, **labels)
+        logger.debug(f"span {name} took {elapsed:.4f}s with {counter.count} queries")
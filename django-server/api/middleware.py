@@ -0,0 +1,93 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import QUERY_BUCKETS, registry, request_queries
+
+logger = logging.getLogger(__name__)
+
+
+# 요청별 처리 시간, DB 쿼리 수 기록과 선택적 cProfile 덤프
+# - X-DB-Queries 응답 헤더로 쿼리 수를 돌려줌
+# - PROFILE_SAMPLE_RATE 비율의 요청, 또는 PROFILE_HEADER_ENABLED 일 때 X-Profile: 1 헤더가 붙은 요청을 프로파일링해서
+#   PROFILE_DIR 에 .prof 파일로 저장 (python -m pstats / snakeviz 로 확인)
+class RequestMetricsMiddleware:
+    # ASGI(uvicorn) 에서 async 뷰 요청이 스레드로 어댑트되지 않도록 sync/async 둘 다 지원
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _should_profile(self, request):
+        if settings.PROFILE_HEADER_ENABLED and request.headers.get('X-Profile') == '1':
+            return True
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def _start_profiler(self, request):
+        if not self._should_profile(request):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 다른 스레드에서 이미 프로파일러가 동작 중 (Python 3.12 는 동시에 하나만 허용)
+            return None
+        return profiler
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with request_queries() as counter:
+            profiler = self._start_profiler(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        return self._record(request, response, counter, profiler, time.perf_counter() - started)
+
+    # async 뷰의 DB 쿼리는 sync_to_async 스레드(다른 DB 연결)에서 실행되지만 요청 context 를 따라가므로 같이 집계됨
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with request_queries() as counter:
+            profiler = self._start_profiler(request)
+            try:
+                response = await self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        return self._record(request, response, counter, profiler, time.perf_counter() - started)
+
+    def _record(self, request, response, counter, profiler, elapsed):
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        labels = {'route': route, 'method': request.method}
+        registry.observe('spreadout_request_seconds', 'HTTP request latency.', elapsed, status=response.status_code, **labels)
+        registry.observe(
+            'spreadout_request_queries', 'Database queries per HTTP request.', counter.count,
+            buckets=QUERY_BUCKETS, **labels,
+        )
+        response['X-DB-Queries'] = str(counter.count)
+        if profiler is not None:
+            response['X-Profile-File'] = os.path.basename(self._dump(profiler, request, route))
+        return response
+
+    def _dump(self, profiler, request, route):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = re.sub(r'[^\w]+', '_', route).strip('_') or 'root'
+        path = os.path.join(settings.PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{name}-{uuid.uuid4().hex[:8]}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Saved profile for {request.method} {request.path} to {path}")
+        return path
@@ -0,0 +1,124 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="message",
+            name="session",
+            field=models.ForeignKey(
+                db_column="session",
+                on_delete=django.db.models.deletion.CASCADE,
+                to="api.session",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pageconnection",
+            name="source",
+            field=models.ForeignKey(
+                db_column="source",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="source_connections",
+                to="api.chapter",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pageconnection",
+            name="target",
+            field=models.ForeignKey(
+                db_column="target",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="target_connections",
+                to="api.chapter",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="session",
+            name="chapter",
+            field=models.ForeignKey(
+                db_column="chapter",
+                on_delete=django.db.models.deletion.CASCADE,
+                to="api.chapter",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="session",
+            name="user",
+            field=models.ForeignKey(
+                db_column="user",
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.CreateModel(
+            name="IngestionJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("file_name", models.CharField(max_length=255)),
+                ("file_path", models.CharField(max_length=500)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("stage", models.CharField(blank=True, max_length=30)),
+                ("progress", models.IntegerField(default=0)),
+                ("options", models.JSONField(default=dict)),
+                ("timings", models.JSONField(default=dict)),
+                ("result", models.JSONField(default=dict)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "pdf_file",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="api.pdffile",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "id"], name="api_ingesti_status_71fff4_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_ingestionjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PageText",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("page_number", models.IntegerField()),
+                ("text", models.TextField()),
+                (
+                    "pdf_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pages",
+                        to="api.pdffile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="pagetext",
+            constraint=models.UniqueConstraint(
+                fields=("pdf_file", "page_number"), name="unique_pdf_page"
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_pagetext"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchIndexStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("documents", models.BigIntegerField(default=0)),
+                ("total_length", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SearchTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=100, unique=True)),
+                ("doc_freq", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="pagetext",
+            name="token_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="Posting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("page_number", models.IntegerField()),
+                ("term_freq", models.IntegerField()),
+                ("page_length", models.IntegerField()),
+                ("positions", models.TextField()),
+                (
+                    "chapter",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="api.chapter",
+                    ),
+                ),
+                (
+                    "pdf_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.pdffile"
+                    ),
+                ),
+                (
+                    "term",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.searchterm"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["term", "pdf_file"],
+                        name="api_posting_term_id_745455_idx",
+                    )
+                ],
+            },
+        ),
+    ]
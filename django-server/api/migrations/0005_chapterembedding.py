@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChapterEmbedding",
+            fields=[
+                (
+                    "chapter",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="embedding",
+                        serialize=False,
+                        to="api.chapter",
+                    ),
+                ),
+                ("model_name", models.CharField(max_length=100)),
+                ("vector", models.BinaryField()),
+                (
+                    "pdf_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="api.pdffile"
+                    ),
+                ),
+            ],
+        ),
+    ]
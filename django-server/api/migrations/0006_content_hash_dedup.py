@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_chapterembedding"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentArtifact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64, unique=True)),
+                ("storage_key", models.CharField(max_length=500)),
+                ("url", models.URLField(max_length=500)),
+                ("size", models.BigIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_used_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="ingestionjob",
+            name="cache_hit",
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AddField(
+            model_name="ingestionjob",
+            name="seconds_saved",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="pdffile",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="pdffile",
+            name="ingested_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
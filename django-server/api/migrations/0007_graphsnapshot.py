@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_content_hash_dedup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GraphSnapshot",
+            fields=[
+                (
+                    "pdf_file",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="graph_snapshot",
+                        serialize=False,
+                        to="api.pdffile",
+                    ),
+                ),
+                ("version", models.CharField(max_length=64)),
+                ("json_gzip", models.BinaryField()),
+                ("msgpack_gzip", models.BinaryField(null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
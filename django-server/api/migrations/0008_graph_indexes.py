@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:17
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+# 계층 연결과 유사도 연결이 같은 (source, target) 에 중복으로 저장된 기존 행을 정리
+# 먼저 저장된 행(계층 연결)을 남김
+def remove_duplicate_connections(apps, schema_editor):
+    PageConnection = apps.get_model("api", "PageConnection")
+    duplicates = (
+        PageConnection.objects.values("source_id", "target_id")
+        .annotate(n=Count("id"), keep=Min("id"))
+        .filter(n__gt=1)
+    )
+    for row in duplicates.iterator():
+        PageConnection.objects.filter(
+            source_id=row["source_id"], target_id=row["target_id"]
+        ).exclude(pk=row["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_graphsnapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chapter",
+            index=models.Index(
+                fields=["pdf_file", "level", "start_page"],
+                name="api_chapter_pdf_fil_4df610_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pageconnection",
+            index=models.Index(
+                fields=["pdf_file", "similarity"], name="api_pagecon_pdf_fil_8bd365_idx"
+            ),
+        ),
+        migrations.RunPython(
+            remove_duplicate_connections, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="pageconnection",
+            constraint=models.UniqueConstraint(
+                fields=("source", "target"), name="unique_connection_pair"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_graph_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["session", "created_at", "id"],
+                name="api_message_session_03589a_idx",
+            ),
+        ),
+    ]
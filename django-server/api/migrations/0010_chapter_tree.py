@@ -0,0 +1,72 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# 기존 챕터의 parent / depth / path 를 저장 순서(id)와 level 로 다시 계산 (end_page 는 그대로 둠)
+def backfill_chapter_tree(apps, schema_editor):
+    Chapter = apps.get_model("api", "Chapter")
+    pdf_file_ids = Chapter.objects.values_list("pdf_file_id", flat=True).distinct()
+    for pdf_file_id in pdf_file_ids.iterator():
+        chapters = list(Chapter.objects.filter(pdf_file_id=pdf_file_id).order_by("id"))
+        stack = []  # [chapter, 자식 수]
+        roots = 0
+        for chapter in chapters:
+            while stack and stack[-1][0].level >= chapter.level:
+                stack.pop()
+            if stack:
+                stack[-1][1] += 1
+                chapter.parent_id = stack[-1][0].id
+                chapter.path = f"{stack[-1][0].path}{stack[-1][1]:04d}/"
+            else:
+                roots += 1
+                chapter.parent_id = None
+                chapter.path = f"{roots:04d}/"
+            chapter.depth = len(stack)
+            stack.append([chapter, 0])
+        Chapter.objects.bulk_update(chapters, ["parent", "depth", "path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_message_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chapter",
+            name="depth",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="chapter",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="children",
+                to="api.chapter",
+            ),
+        ),
+        migrations.AddField(
+            model_name="chapter",
+            name="path",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_chapter_tree, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="chapter",
+            index=models.Index(
+                fields=["pdf_file", "path"], name="api_chapter_pdf_fil_31de3b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chapter",
+            index=models.Index(
+                fields=["pdf_file", "start_page"], name="api_chapter_pdf_fil_1aca8b_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_cross_connection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pdffile",
+            name="ingest_key",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
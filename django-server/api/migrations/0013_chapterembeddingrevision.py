@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_pdffile_ingest_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChapterEmbeddingRevision",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("revision", models.CharField(max_length=32)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_chapterembeddingrevision"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="posting",
+            index=models.Index(
+                fields=["term", "-term_freq"], name="api_posting_term_id_a04ec6_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_posting_term_freq_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pdffile",
+            name="graph_revision",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -7,6 +7,12 @@ class PDFFile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     url = models.URLField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # 원본 SHA-256
+    ingested_at = models.DateTimeField(null=True, blank=True)  # 챕터/연결/색인 생성이 끝난 시각
+    # 그래프를 만든 조건(임베딩 모델/대상, 유사도 threshold/top_k)의 해시. 중복 업로드는 이 값까지 같아야 재사용
+    ingest_key = models.CharField(max_length=64, blank=True)
+    # 챕터/연결 행을 고칠 때마다 증가 (행 수와 최대 id 로는 알 수 없는 변경을 그래프 ETag 에 반영)
+    graph_revision = models.IntegerField(default=0)
 
 
 class Chapter(models.Model):
@@ -18,6 +24,21 @@ class Chapter(models.Model):
     pdf_file = models.ForeignKey(
         PDFFile, on_delete=models.CASCADE)
     group = models.IntegerField(null=True)
+    parent = models.ForeignKey(
+        "self", on_delete=models.CASCADE, null=True, blank=True, related_name="children")
+    depth = models.IntegerField(default=0)  # 최상위 챕터가 0
+    # 목차 트리의 materialized path (형제 순번 4자리 + '/' 를 루트부터 이어붙임, 예: 0002/0001/)
+    # 하위 챕터 전체는 path 접두사 범위 조회 한 번으로 읽음
+    path = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        # PDF 단위로 레벨/페이지 순서대로 읽는 접근 경로 (그래프, 목차)
+        # (pdf_file, path): 하위 챕터 조회, (pdf_file, start_page): 페이지가 속한 챕터 조회
+        indexes = [
+            models.Index(fields=["pdf_file", "level", "start_page"]),
+            models.Index(fields=["pdf_file", "path"]),
+            models.Index(fields=["pdf_file", "start_page"]),
+        ]
 
 
 class PageConnection(models.Model):
@@ -37,6 +58,137 @@ class PageConnection(models.Model):
     )
     similarity = models.FloatField()
 
+    class Meta:
+        # 계층 연결은 similarity = -1 이므로 (pdf_file, similarity) 로 종류/임계값별 조회
+        indexes = [models.Index(fields=["pdf_file", "similarity"])]
+        constraints = [
+            models.UniqueConstraint(fields=["source", "target"], name="unique_connection_pair"),
+        ]
+
+
+# 같은 사용자의 서로 다른 PDF 챕터 사이의 유사도 연결 (source 는 나중에 ingestion 된 PDF 의 챕터)
+# PDF 안의 연결(PageConnection)과 따로 두어서 PDF 별 그래프는 그대로 유지
+class CrossConnection(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    source = models.ForeignKey(Chapter, related_name="cross_source_connections", on_delete=models.CASCADE)
+    target = models.ForeignKey(Chapter, related_name="cross_target_connections", on_delete=models.CASCADE)
+    source_pdf_file = models.ForeignKey(PDFFile, related_name="outgoing_cross_connections", on_delete=models.CASCADE)
+    target_pdf_file = models.ForeignKey(PDFFile, related_name="incoming_cross_connections", on_delete=models.CASCADE)
+    similarity = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "target"], name="unique_cross_connection_pair"),
+        ]
+
+
+# 같은 내용의 PDF 가 공유하는 저장소 원본 (content_hash 로 중복 업로드를 막음)
+class DocumentArtifact(models.Model):
+    content_hash = models.CharField(max_length=64, unique=True)
+    storage_key = models.CharField(max_length=500)
+    url = models.URLField(max_length=500)
+    size = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+
+# ingestion 시점에 추출해 둔 페이지별 텍스트 (page_number 는 1부터 시작)
+class PageText(models.Model):
+    pdf_file = models.ForeignKey(PDFFile, on_delete=models.CASCADE, related_name="pages")
+    page_number = models.IntegerField()
+    text = models.TextField()
+    token_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["pdf_file", "page_number"], name="unique_pdf_page"),
+        ]
+
+
+# 프론트엔드 그래프용으로 미리 만들어 둔 인접 정보 (gzip 압축된 columnar JSON / MessagePack)
+class GraphSnapshot(models.Model):
+    pdf_file = models.OneToOneField(PDFFile, on_delete=models.CASCADE, primary_key=True, related_name="graph_snapshot")
+    version = models.CharField(max_length=64)  # 연결 정보가 바뀌었는지 판단하는 시그니처
+    json_gzip = models.BinaryField()
+    msgpack_gzip = models.BinaryField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+# 의미 검색용 챕터 임베딩 (float32 배열을 bytes 로 저장)
+class ChapterEmbedding(models.Model):
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, primary_key=True, related_name="embedding")
+    pdf_file = models.ForeignKey(PDFFile, on_delete=models.CASCADE)
+    model_name = models.CharField(max_length=100)
+    vector = models.BinaryField()
+
+
+# 챕터 임베딩이 추가/삭제될 때마다 새 값으로 바뀌는 revision (한 행만 사용)
+# 메모리 인덱스(chapter_index)는 질의마다 이 값만 비교하고, 바뀌었을 때만 임베딩 테이블을 확인
+class ChapterEmbeddingRevision(models.Model):
+    revision = models.CharField(max_length=32)
+
+
+# 역색인: 검색어 사전 (doc_freq 는 해당 검색어가 나온 페이지 수)
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=100, unique=True)
+    doc_freq = models.IntegerField(default=0)
+
+
+# 역색인: 검색어가 나온 (PDF, 페이지, 챕터) 와 페이지 안에서의 위치
+class Posting(models.Model):
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE)
+    pdf_file = models.ForeignKey(PDFFile, on_delete=models.CASCADE)
+    page_number = models.IntegerField()
+    chapter = models.ForeignKey(Chapter, on_delete=models.SET_NULL, null=True)
+    term_freq = models.IntegerField()
+    page_length = models.IntegerField()  # BM25 문서 길이 정규화용 페이지 토큰 수
+    positions = models.TextField()  # 공백으로 구분한 토큰 위치
+
+    class Meta:
+        # (term, -term_freq): 흔한 검색어의 term_freq 상위 posting 만 읽는 검색 후보 조회
+        indexes = [models.Index(fields=["term", "pdf_file"]), models.Index(fields=["term", "-term_freq"])]
+
+
+# BM25 에 필요한 전체 색인 통계 (한 행만 사용)
+class SearchIndexStats(models.Model):
+    documents = models.BigIntegerField(default=0)
+    total_length = models.BigIntegerField(default=0)
+
+
+# PDF 업로드 후 비동기로 처리되는 ingestion 작업 (DB 기반 작업 큐)
+class IngestionJob(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    pdf_file = models.ForeignKey(PDFFile, on_delete=models.SET_NULL, null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)  # 워커가 읽을 스풀 파일 경로
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    stage = models.CharField(max_length=30, blank=True)
+    progress = models.IntegerField(default=0)
+    options = models.JSONField(default=dict)
+    timings = models.JSONField(default=dict)
+    result = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    cache_hit = models.BooleanField(null=True)  # 이미 처리된 PDF 를 재사용했는지
+    seconds_saved = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+
 
 # 메세지 관련 모델
 class Session(models.Model):
@@ -50,6 +202,10 @@ class Message(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # 세션별 메세지를 (created_at, id) 키셋으로 페이지네이션
+        indexes = [models.Index(fields=["session", "created_at", "id"])]
+
 
 """
 db migration
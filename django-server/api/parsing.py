@@ -0,0 +1,37 @@
+import time
+
+import pymupdf as fitz  # PyMuPDF
+
+from .extraction import open_pdf
+from .toc import scan_range, toc_from_scan
+
+
+# 문서에 없는 페이지를 요청함 (뷰에서 404 로 응답)
+class PageNotFound(ValueError):
+    pass
+
+
+# 프로세스 풀 워커: PDF 하나의 페이지 텍스트와 목차를 한 번에 추출 (ingest_pdfs 에서 파일 단위로 병렬 처리)
+# 목차(outline)가 없고 infer_levels 가 있으면 글자 크기로 추정. DB 와 Django 설정을 쓰지 않음
+def parse_document(path, infer_levels=0, max_lines=0):
+    started = time.perf_counter()
+    with open_pdf(path) as pdf_document:
+        toc = pdf_document.get_toc()
+        texts = [page.get_text() for page in pdf_document]
+    toc_source = 'outline'
+    if not toc and infer_levels:
+        sizes, candidates = scan_range(path, 0, len(texts), max_lines)
+        toc = toc_from_scan(sizes, candidates, len(texts), infer_levels)
+        toc_source = 'heuristic'
+    return {'texts': texts, 'toc': toc, 'toc_source': toc_source, 'seconds': time.perf_counter() - started}
+
+
+# 프로세스 풀 워커: 페이지 하나(page_number 는 1부터)를 PNG 로 렌더링
+# width 가 있으면 페이지 폭이 width 픽셀이 되는 해상도로 렌더링 (썸네일)
+def render_page(path, page_number, dpi=None, width=None):
+    with open_pdf(path) as pdf_document:
+        if not 1 <= page_number <= len(pdf_document):
+            raise PageNotFound(f"Page {page_number} is out of range (1-{len(pdf_document)})")
+        page = pdf_document.load_page(page_number - 1)
+        zoom = width / page.rect.width if width else dpi / 72
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes('png')
@@ -0,0 +1,257 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .chapter_embeddings import encode_chapters, load_page_texts
+from .cross_links import link_pdf
+from .dedup import (
+    file_sha256, find_ingested, ingest_key, record_artifact, reuse_artifact, timed_clone, upload_original,
+)
+from .embeddings import registry
+from .extraction import PageExtractor, open_pdf
+from .ingestion import BulkWriter, build_chapters, build_page_texts, write_chapter_graph
+from .metrics import registry as metrics, span
+from .models import IngestionJob, PDFFile
+from .search_index import assign_chapters, index_pages, tokenize
+from .semantic import save_chapter_embeddings
+from .toc import infer_toc
+
+logger = logging.getLogger(__name__)
+
+# 단계 이름과 단계가 끝났을 때의 진행률(%)
+STAGES = [
+    ('extract', 35),
+    ('upload', 40),
+    ('pages', 50),
+    ('chapters', 55),
+    ('embed', 75),
+    ('connections', 85),
+    ('links', 90),
+    ('index', 100),
+    ('clone', 100),
+]
+
+
+# 업로드 파일을 워커가 읽을 수 있도록 스풀 디렉터리에 저장하고 (경로, 복사한 바이트 수) 를 반환
+# 큰 업로드는 Django 가 이미 임시 파일로 받아두므로 하드링크로 옮겨서 복사하지 않음
+def spool_upload(file, job_key):
+    os.makedirs(settings.INGESTION_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(settings.INGESTION_SPOOL_DIR, f"{job_key}.pdf")
+    if hasattr(file, 'temporary_file_path'):
+        try:
+            os.link(file.temporary_file_path(), path)
+            return path, 0
+        except OSError:
+            # 다른 파일시스템이면 하드링크가 안 되므로 복사
+            pass
+    bytes_copied = 0
+    with open(path, 'wb') as out:
+        for chunk in file.chunks():
+            out.write(chunk)
+            bytes_copied += len(chunk)
+    return path, bytes_copied
+
+
+class IngestionPipeline:
+    def __init__(self, job):
+        self.job = job
+        self.progress = dict(STAGES)
+
+    # 오래 걸리는 작업이 requeue_stale_jobs 에 잡히지 않도록 started_at 을 heartbeat 로 갱신
+    def heartbeat(self, **fields):
+        self.job.started_at = timezone.now()
+        IngestionJob.objects.filter(pk=self.job.pk).update(started_at=self.job.started_at, **fields)
+
+    @contextmanager
+    def stage(self, name):
+        job = self.job
+        job.stage = name
+        self.heartbeat(stage=name)
+        started = time.perf_counter()
+        with span(f"ingest.{name}"):
+            yield
+        job.timings[name] = round(time.perf_counter() - started, 4)
+        job.progress = self.progress[name]
+        IngestionJob.objects.filter(pk=job.pk).update(
+            timings=job.timings, progress=job.progress, pdf_file=job.pdf_file
+        )
+        logger.info(f"Job {job.pk}: stage {name} finished in {job.timings[name]:.3f}s")
+
+    # 업로드 스레드가 올린 원본을 DocumentArtifact 로 기록 (DB 쓰기는 작업 스레드에서만 함)
+    def _record_upload(self, uploaded):
+        key, url, seconds = uploaded
+        record_artifact(self.content_hash, key, url, os.path.getsize(self.job.file_path))
+        self.job.timings['upload_transfer'] = round(seconds, 4)
+        return url
+
+    def _create_pdf_file(self, url):
+        job = self.job
+        job.pdf_file = PDFFile.objects.create(
+            filename=job.file_name, user_id=job.user_id, url=url, content_hash=self.content_hash,
+            ingest_key=self.ingest_key,
+        )
+        # 작업이 중간에 죽어도 다시 실행할 때 지울 수 있도록 바로 기록
+        IngestionJob.objects.filter(pk=job.pk).update(pdf_file=job.pdf_file)
+        logger.info(f"PDFFile object created with id {job.pdf_file.id}")
+
+    # 페이지 텍스트와 그 페이지들의 색인을 같은 트랜잭션으로 저장 (색인 통계가 저장된 페이지와 항상 맞도록)
+    # pages 는 (page_number, text, tokens) 목록
+    def _save_pages(self, writer, pages):
+        with transaction.atomic():
+            writer.save_pages(build_page_texts(
+                self.job.pdf_file, [(page_number, text, len(tokens)) for page_number, text, tokens in pages]
+            ))
+            self.postings += index_pages(
+                self.job.pdf_file, [(page_number, tokens) for page_number, _, tokens in pages], batch_size=writer.batch_size
+            )
+        self.heartbeat()
+
+    # 같은 내용의 PDF 가 이미 처리되어 있으면 파이프라인 대신 결과를 복제
+    def _run_cached(self, source):
+        job = self.job
+        with self.stage('clone'):
+            self._create_pdf_file(reuse_artifact(self.content_hash) or source.url)
+            chapters, clone_stats, seconds_saved = timed_clone(source, job.pdf_file)
+            clone_stats['cross_connections'] = link_pdf(job.pdf_file, chapters)
+            PDFFile.objects.filter(pk=job.pdf_file.pk).update(ingested_at=timezone.now())
+        job.cache_hit = True
+        job.seconds_saved = seconds_saved
+        return {
+            **job.result,
+            'pdf_file_id': job.pdf_file.id,
+            'first_chapter_id': chapters[0].id if chapters else None,
+            'source_pdf_file_id': source.id,
+            **clone_stats,
+        }
+
+    def run(self):
+        job = self.job
+        self.content_hash = job.options.get('content_hash') or file_sha256(job.file_path)
+        self.ingest_key = ingest_key(job.options.get('similarity'), job.options.get('embedding_source'))
+        source = find_ingested(self.content_hash, self.ingest_key)
+        if source is not None:
+            return self._run_cached(source)
+        job.cache_hit = False
+        # 업로드가 끝나기 전부터 페이지를 저장할 수 있도록 PDFFile 을 먼저 만들고 url 은 업로드 후에 채움
+        self._create_pdf_file('')
+        self.postings = 0
+
+        # 같은 내용의 원본이 이미 저장소에 있으면 다시 올리지 않음
+        stored_url = reuse_artifact(self.content_hash)
+
+        # 원본 전송(S3 등)만 별도 스레드에서 하고 그동안 같은 스풀 파일에서 바로 텍스트를 추출
+        # (executor 스레드가 연 DB 연결은 닫히지 않고, SQLite 에서는 페이지 저장 트랜잭션과 부딪히므로 DB 는 쓰지 않음)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            upload = None if stored_url else executor.submit(
+                upload_original, job.file_path, job.file_name, self.content_hash
+            )
+
+            with open_pdf(job.file_path) as pdf_document:
+                total_pages = len(pdf_document)
+                toc = pdf_document.get_toc()
+
+            # 추출된 페이지를 순서대로 받아서 바로 토큰화하고 batch 단위로 페이지 텍스트와 색인을 저장
+            # (검색 때마다 PDF 를 다시 파싱하지 않도록 페이지 텍스트를 저장해 둠)
+            # 메모리에는 저장 전의 한 batch 만 남으므로 업로드가 느려도 페이지 수에 비례해서 늘지 않음
+            writer = BulkWriter()
+            extractor = PageExtractor(job.file_path, total_pages)
+            pending_pages = []
+            with self.stage('extract'):
+                for page_number, text in extractor:
+                    pending_pages.append((page_number, text, tokenize(text)))
+                    if len(pending_pages) >= writer.batch_size:
+                        self._save_pages(writer, pending_pages)
+                        pending_pages = []
+                job.result['pages_per_second'] = round(extractor.pages_per_second, 1)
+
+            with self.stage('upload'):
+                job.pdf_file.url = stored_url or self._record_upload(upload.result())
+                PDFFile.objects.filter(pk=job.pdf_file.pk).update(url=job.pdf_file.url)
+
+        with self.stage('pages'):
+            self._save_pages(writer, pending_pages)
+
+        with self.stage('chapters'):
+            job.result['toc_source'] = 'outline'
+            if not toc:
+                logger.warning("No TOC found in PDF")
+                if settings.TOC_HEURISTIC_ENABLED:
+                    toc = infer_toc(job.file_path, total_pages)
+                    job.result['toc_source'] = 'heuristic'
+            chapters = build_chapters(toc, job.pdf_file, total_pages)
+
+        with self.stage('embed'):
+            source = job.options.get('embedding_source') or settings.CHAPTER_EMBEDDING_SOURCE
+            page_texts = load_page_texts(job.pdf_file) if source == 'content' and chapters else None
+            # 본문 조각은 모델 토크나이저 기준으로 자름
+            model = registry.chunking_model() if page_texts else None
+            embeddings = encode_chapters(chapters, registry.encode, page_texts, source, model)
+
+        with self.stage('connections'):
+            write_stats = write_chapter_graph(chapters, embeddings, job.options.get('similarity'))
+            save_chapter_embeddings(chapters, embeddings)
+
+        # 같은 사용자의 다른 PDF 챕터와의 연결 (새 챕터 쪽에서만 계산)
+        with self.stage('links'):
+            job.result['cross_connections'] = link_pdf(job.pdf_file, chapters, embeddings)
+
+        # 페이지 batch 마다 색인해 둔 posting 에 챕터를 채워서 검색 결과에 나오게 함
+        with self.stage('index'):
+            assign_chapters(job.pdf_file, chapters, total_pages)
+            PDFFile.objects.filter(pk=job.pdf_file.pk).update(ingested_at=timezone.now())
+
+        return {
+            **job.result,
+            'pdf_file_id': job.pdf_file.id,
+            'first_chapter_id': chapters[0].id if chapters else None,
+            'pages': total_pages,
+            'postings': self.postings,
+            **write_stats,
+        }
+
+
+# 작업이 만들다 만 (ingestion 이 끝나지 않은) PDFFile 을 지움
+# pre_delete 신호로 색인 통계(doc_freq, 문서 수)가 되돌려지고 페이지, 챕터, 연결, posting 은 cascade 로 지워짐
+def discard_partial_pdf(job):
+    if job.pdf_file_id is None:
+        return
+    for pdf_file in PDFFile.objects.filter(pk=job.pdf_file_id, ingested_at__isnull=True):
+        pdf_file.delete()
+        logger.info(f"Removed incomplete PDF file {pdf_file.id} of job {job.pk}")
+        job.pdf_file = None
+
+
+# 작업 하나를 실행하고 결과/오류를 기록
+def run_job(job):
+    try:
+        # requeue 된 작업이면 이전 실행이 남긴 PDFFile 부터 지우고 처음부터 다시 실행
+        discard_partial_pdf(job)
+        job.result = IngestionPipeline(job).run()
+        job.status = IngestionJob.DONE
+    except Exception as e:
+        logger.error(f"Ingestion job {job.pk} failed at stage {job.stage}: {e}")
+        job.status = IngestionJob.FAILED
+        job.error = str(e)
+        # 실패한 작업의 PDF 가 반쯤 만들어진 채로 사용자 라이브러리에 남지 않도록 정리
+        try:
+            discard_partial_pdf(job)
+        except Exception as cleanup_error:
+            logger.error(f"Failed to remove incomplete PDF file of job {job.pk}: {cleanup_error}")
+    finally:
+        job.finished_at = timezone.now()
+        metrics.inc('spreadout_ingestion_jobs_total', 'Finished ingestion jobs.', status=job.status, cache_hit=job.cache_hit)
+        job.save(update_fields=[
+            'status', 'result', 'error', 'finished_at', 'pdf_file', 'progress', 'timings', 'stage',
+            'cache_hit', 'seconds_saved',
+        ])
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+    return job
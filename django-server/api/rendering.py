@@ -0,0 +1,295 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import chapter_tree
+from .extraction import get_executor
+from .metrics import registry as metrics
+from .models import DocumentArtifact
+from .parsing import render_page
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+# 전체 크기(bytes)를 제한하는 디스크 LRU. 가장 오래 쓰이지 않은 파일부터 지움
+# 사용 순서는 파일 mtime 으로 남기므로 재시작 후에도 이어지고, 다른 프로세스가 만든 파일도 처음 볼 때 목록에 추가됨
+# (여러 worker 가 같은 디렉터리를 쓰면 각자 자기 목록 기준으로 정리하므로 잠깐 한도를 넘을 수 있음)
+class DiskLRU:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, os.path.relpath(path, self.directory), stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(files))
+        self.bytes = sum(self._entries.values())
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    # 캐시에 있으면 사용 시각을 갱신하고 파일 경로를 반환
+    def lookup(self, key):
+        path = self.path(key)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            try:
+                os.utime(path)
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                # 다른 프로세스가 지웠음
+                self.bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                self._entries[key] = size
+                self.bytes += size
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return path
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def read(self, key):
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # 임시 파일에 쓴 뒤 rename 으로 넣어서 읽는 쪽이 쓰다 만 파일을 보지 않음
+    def put(self, key, data=None, write=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            if write is not None:
+                write(tmp_path)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        size = os.path.getsize(path)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self.bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict(keep=key)
+        return path
+
+    def _evict(self, keep):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            del self._entries[key]
+            self.bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            return {
+                'files': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _cache(name, max_bytes):
+    directory = os.path.join(settings.PAGE_CACHE_DIR, name)
+    cache = _caches.get(directory)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(directory, DiskLRU(directory, max_bytes))
+    return cache
+
+
+# 렌더링한 페이지 이미지
+def image_cache():
+    return _cache('images', settings.PAGE_CACHE_MAX_BYTES)
+
+
+# 렌더링용 원본 PDF 사본 (저장소에서 한 번 받아서 재사용)
+def source_cache():
+    return _cache('sources', settings.PAGE_SOURCE_CACHE_MAX_BYTES)
+
+
+# 같은 내용의 PDF 는 이미지를 공유하도록 content_hash 로 키를 만듦
+def document_key(pdf_file):
+    return pdf_file.content_hash or f"pdf-{pdf_file.id}"
+
+
+def image_key(pdf_file, page_number, dpi=None, thumbnail=False):
+    variant = f"thumb{settings.PAGE_THUMBNAIL_WIDTH}" if thumbnail else f"{dpi}dpi"
+    return f"{document_key(pdf_file)}/{page_number}-{variant}.png"
+
+
+# (원본 사본의 캐시 키, 저장소 키). 저장소 위치를 알 수 없으면 저장소 키는 None
+def _source_location(pdf_file):
+    storage_key = None
+    if pdf_file.content_hash:
+        storage_key = (
+            DocumentArtifact.objects.filter(content_hash=pdf_file.content_hash).values_list('storage_key', flat=True).first()
+        )
+    if storage_key is None and pdf_file.url:
+        # 중복 제거(DocumentArtifact) 이전에 올라온 PDF 는 url 에서 저장소 키를 구함
+        storage_key = get_storage().key_for_url(pdf_file.url)
+    return f"{document_key(pdf_file)}.pdf", storage_key
+
+
+_render_lock = threading.Lock()
+
+
+# 렌더링에 쓰는 저장소, 캐시, 설정을 만든 시점(요청 스레드)에 고정
+# 백그라운드 prefetch 가 실행될 때 settings 를 다시 읽으면 요청 이후에 바뀐 설정 (테스트의 override_settings 해제 등) 을 쓰게 됨
+class PageRenderer:
+    def __init__(self, thumbnail=False):
+        self.storage = get_storage()
+        self.images = image_cache()
+        self.sources = source_cache()
+        self.width = settings.PAGE_THUMBNAIL_WIDTH if thumbnail else None
+        self.in_process = settings.EXTRACTION_WORKERS == 1
+
+    def fetch_source(self, source_key, storage_key):
+        path = self.sources.lookup(source_key)
+        if path is not None:
+            return path
+        if storage_key is None:
+            raise FileNotFoundError("The original PDF is not available in storage.")
+        return self.sources.put(source_key, write=lambda tmp_path: self.storage.download(storage_key, tmp_path))
+
+    def render(self, source_path, page_number, dpi):
+        if self.in_process:
+            # PyMuPDF 는 스레드 안전하지 않으므로 프로세스 풀이 없으면 한 번에 하나씩
+            with _render_lock:
+                return render_page(source_path, page_number, dpi, self.width)
+        return get_executor().submit(render_page, source_path, page_number, dpi, self.width).result()
+
+    def render_to_cache(self, key, source_key, storage_key, page_number, dpi):
+        try:
+            data = self.render(self.fetch_source(source_key, storage_key), page_number, dpi)
+        except FileNotFoundError:
+            # 렌더링 중에 원본 사본이 LRU 에서 지워졌으면 다시 받아서 한 번 더 시도
+            data = self.render(self.fetch_source(source_key, storage_key), page_number, dpi)
+        self.images.put(key, data)
+        return data
+
+
+# 페이지 PNG 를 반환 (bytes, 캐시 적중 여부). 없으면 렌더링해서 캐시에 넣음
+def page_image(pdf_file, page_number, dpi=None, thumbnail=False):
+    key = image_key(pdf_file, page_number, dpi, thumbnail)
+    data = image_cache().read(key)
+    if data is not None:
+        metrics.inc('spreadout_page_images_total', 'Page image requests by cache result.', result='hit')
+        return data, True
+    metrics.inc('spreadout_page_images_total', 'Page image requests by cache result.', result='miss')
+    source_key, storage_key = _source_location(pdf_file)
+    return PageRenderer(thumbnail).render_to_cache(key, source_key, storage_key, page_number, dpi), False
+
+
+_prefetch_executor = None
+_prefetching = set()
+_prefetch_lock = threading.Lock()
+
+
+def _get_prefetch_executor():
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        with _prefetch_lock:
+            if _prefetch_executor is None:
+                _prefetch_executor = ThreadPoolExecutor(
+                    max_workers=settings.PAGE_PREFETCH_THREADS, thread_name_prefix='page-prefetch'
+                )
+    return _prefetch_executor
+
+
+def _prefetch(renderer, key, *args):
+    try:
+        renderer.render_to_cache(key, *args)
+    except Exception as e:
+        logger.warning(f"Prefetching {key} failed: {e}")
+    finally:
+        with _prefetch_lock:
+            _prefetching.discard(key)
+
+
+# 요청한 페이지가 속한 (가장 깊은) 챕터 안에서 앞 1쪽, 뒤 PAGE_PREFETCH_PAGES 쪽을 백그라운드 스레드에서 미리 렌더링
+# DB 조회(챕터, 원본 위치)와 저장소/설정 고정은 요청 스레드에서 하고 백그라운드에서는 파일 읽기와 렌더링만 함
+# PAGE_PREFETCH_ASYNC 가 False 면 (테스트) 요청 스레드에서 바로 렌더링
+def prefetch_adjacent(pdf_file, page_number, dpi=None, thumbnail=False):
+    if settings.PAGE_PREFETCH_PAGES <= 0:
+        return []
+    chapter = chapter_tree.chapter_at_page(pdf_file.id, page_number)
+    first = chapter.start_page if chapter else 1
+    last = chapter.end_page if chapter else page_number + settings.PAGE_PREFETCH_PAGES
+    pages = [page_number - 1] + list(range(page_number + 1, page_number + settings.PAGE_PREFETCH_PAGES + 1))
+    renderer = PageRenderer(thumbnail)
+    keys = {
+        page: image_key(pdf_file, page, dpi, thumbnail)
+        for page in pages if first <= page <= last
+    }
+    keys = {page: key for page, key in keys.items() if not renderer.images.contains(key)}
+    if not keys:
+        return []
+
+    source_key, storage_key = _source_location(pdf_file)
+    executor = _get_prefetch_executor() if settings.PAGE_PREFETCH_ASYNC else None
+    submitted = []
+    for page, key in keys.items():
+        with _prefetch_lock:
+            if key in _prefetching:
+                continue
+            _prefetching.add(key)
+        if executor is None:
+            _prefetch(renderer, key, source_key, storage_key, page, dpi)
+        else:
+            executor.submit(_prefetch, renderer, key, source_key, storage_key, page, dpi)
+        submitted.append(page)
+    return submitted
+
+
+def stats():
+    return {'images': image_cache().stats(), 'sources': source_cache().stats()}
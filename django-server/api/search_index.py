@@ -0,0 +1,349 @@
+import logging
+import math
+import re
+import shlex
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+
+from .models import Chapter, PageText, Posting, SearchIndexStats, SearchTerm
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[가-힣]+|[^\W_가-힣]+')
+MAX_TERM_LENGTH = 100
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+# 영어/숫자는 단어 단위, 한글은 형태소 분석기 없이 음절 bigram 으로 분리
+# 한 단어에서 나온 토큰들은 연속된 위치를 가지므로 구문(phrase)처럼 검색할 수 있음
+def tokenize_words(text):
+    words = []
+    for word in TOKEN_RE.findall(text.lower()):
+        if '가' <= word[0] <= '힣' and len(word) > 1:
+            words.append([word[i:i + 2] for i in range(len(word) - 1)])
+        else:
+            words.append([word[:MAX_TERM_LENGTH]])
+    return words
+
+
+def tokenize(text):
+    return [token for word in tokenize_words(text) for token in word]
+
+
+# 검색어를 구(phrase) 단위 토큰 목록으로 분리: 따옴표로 묶은 구절, 그 외 단어
+def parse_query(query):
+    try:
+        parts = shlex.split(query)
+    except ValueError:
+        parts = query.split()
+    groups = []
+    for part in parts:
+        tokens = tokenize(part)
+        if tokens and tokens not in groups:
+            groups.append(tokens)
+    return groups
+
+
+# 페이지별로 가장 깊은(구체적인) 챕터를 찾아둠
+def page_chapter_map(chapters, total_pages):
+    page_chapters = [None] * (total_pages + 1)
+    for chapter in sorted(chapters, key=lambda c: (c.level, c.start_page)):
+        for page in range(max(chapter.start_page, 1), min(chapter.end_page, total_pages) + 1):
+            page_chapters[page] = chapter.id
+    return page_chapters
+
+
+def _stats_row():
+    stats, _ = SearchIndexStats.objects.get_or_create(pk=1)
+    return stats
+
+
+# 전체 통계 행 갱신 (UPDATE 한 번). 모든 쓰기 트랜잭션이 같은 행을 잠그므로 트랜잭션의 마지막 쿼리로 호출
+def _shift_stats(documents, total_length):
+    updated = SearchIndexStats.objects.filter(pk=1).update(
+        documents=F('documents') + documents, total_length=F('total_length') + total_length,
+    )
+    if not updated:
+        _stats_row()
+        _shift_stats(documents, total_length)
+
+
+def _term_ids(terms, batch_size):
+    ids = dict(SearchTerm.objects.filter(term__in=terms).values_list('term', 'id'))
+    missing = sorted(term for term in terms if term not in ids)
+    if missing:
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term) for term in missing], batch_size=batch_size, ignore_conflicts=True
+        )
+        ids.update(SearchTerm.objects.filter(term__in=missing).values_list('term', 'id'))
+    return ids
+
+
+# 검색어별 doc_freq 증감. id 순서로 나눈 batch 마다 CASE 로 UPDATE 한 번
+# 동시에 색인하는 트랜잭션들이 항상 같은 (id) 순서로 행을 잠그므로 서로 기다리다 deadlock 이 나지 않음
+def _shift_doc_freq(term_page_counts, sign, batch_size=None):
+    batch_size = batch_size or settings.INGEST_BULK_BATCH_SIZE
+    term_ids = sorted(term_page_counts)
+    for start in range(0, len(term_ids), batch_size):
+        batch = term_ids[start:start + batch_size]
+        SearchTerm.objects.filter(id__in=batch).update(doc_freq=F('doc_freq') + Case(
+            *[When(id=term_id, then=Value(sign * term_page_counts[term_id])) for term_id in batch],
+            output_field=IntegerField(),
+        ))
+
+
+# 페이지들을 색인에 추가. pages 는 (page_number, tokenize() 결과) 목록
+# page_chapters 가 없으면 chapter 없이 저장하고 목차를 만든 뒤 assign_chapters 로 채움 (그 전에는 검색 결과에 나오지 않음)
+# 페이지 batch 마다 doc_freq 와 전체 통계를 같이 갱신하므로 중간에 멈춰도 remove_pdf 로 그대로 되돌릴 수 있음
+def index_pages(pdf_file, pages, page_chapters=None, batch_size=None):
+    batch_size = batch_size or settings.INGEST_BULK_BATCH_SIZE
+    pages = list(pages)
+    if not pages:
+        return 0
+    all_terms = {token for _, tokens in pages for token in tokens}
+
+    with transaction.atomic():
+        term_ids = _term_ids(list(all_terms), batch_size)
+        postings = []
+        term_page_counts = Counter()
+        for page_number, tokens in pages:
+            positions = defaultdict(list)
+            for position, token in enumerate(tokens):
+                positions[token].append(position)
+            for token, token_positions in positions.items():
+                term_id = term_ids[token]
+                term_page_counts[term_id] += 1
+                postings.append(Posting(
+                    term_id=term_id,
+                    pdf_file=pdf_file,
+                    page_number=page_number,
+                    chapter_id=page_chapters[page_number] if page_chapters else None,
+                    term_freq=len(token_positions),
+                    page_length=len(tokens),
+                    positions=' '.join(map(str, token_positions)),
+                ))
+
+        Posting.objects.bulk_create(postings, batch_size=batch_size)
+        _shift_doc_freq(term_page_counts, 1, batch_size)
+        _shift_stats(len(pages), sum(len(tokens) for _, tokens in pages))
+    return len(postings)
+
+
+# index_pages 로 먼저 색인한 PDF 의 posting 에 페이지별 (가장 깊은) 챕터를 채움
+# 같은 챕터에 속한 연속된 페이지 구간마다 UPDATE 한 번
+def assign_chapters(pdf_file, chapters, total_pages):
+    page_chapters = page_chapter_map(chapters, total_pages)
+    ranges = []
+    for page_number in range(1, total_pages + 1):
+        chapter_id = page_chapters[page_number]
+        if ranges and ranges[-1][0] == chapter_id and ranges[-1][2] == page_number - 1:
+            ranges[-1][2] = page_number
+        else:
+            ranges.append([chapter_id, page_number, page_number])
+    with transaction.atomic():
+        for chapter_id, first, last in ranges:
+            if chapter_id is not None:
+                Posting.objects.filter(pdf_file=pdf_file, page_number__range=(first, last)).update(chapter_id=chapter_id)
+    return len(ranges)
+
+
+# PDF 하나를 챕터와 함께 색인에 추가. page_tokens 는 페이지 순서대로의 tokenize() 결과
+def index_pdf(pdf_file, page_tokens, chapters, batch_size=None):
+    started = time.perf_counter()
+    page_chapters = page_chapter_map(chapters, len(page_tokens))
+    postings = index_pages(pdf_file, enumerate(page_tokens, start=1), page_chapters, batch_size)
+    logger.info(f"Indexed {postings} postings for PDF {pdf_file.id} in {time.perf_counter() - started:.3f}s")
+    return postings
+
+
+# 색인이 생기기 전에 저장된 PDF 를 PageText 와 챕터로 색인 (이미 posting 이 있으면 건너뜀)
+# token_count 도 tokenize() 기준으로 맞춰야 remove_pdf 가 전체 통계를 정확히 되돌림
+def backfill_pdf(pdf_file, batch_size=None):
+    batch_size = batch_size or settings.INGEST_BULK_BATCH_SIZE
+    if Posting.objects.filter(pdf_file=pdf_file).exists():
+        return 0
+    postings = 0
+    total_pages = 0
+    page_texts = PageText.objects.filter(pdf_file=pdf_file).order_by('page_number')
+    batch = []
+    for page_text in page_texts.iterator(chunk_size=batch_size):
+        batch.append(page_text)
+        if len(batch) >= batch_size:
+            postings += _backfill_pages(pdf_file, batch, batch_size)
+            batch = []
+        total_pages = page_text.page_number
+    postings += _backfill_pages(pdf_file, batch, batch_size)
+    assign_chapters(pdf_file, Chapter.objects.filter(pdf_file=pdf_file), total_pages)
+    return postings
+
+
+def _backfill_pages(pdf_file, page_texts, batch_size):
+    pages = [(page_text.page_number, tokenize(page_text.text)) for page_text in page_texts]
+    stale = []
+    for page_text, (_, tokens) in zip(page_texts, pages):
+        if page_text.token_count != len(tokens):
+            page_text.token_count = len(tokens)
+            stale.append(page_text)
+    with transaction.atomic():
+        PageText.objects.bulk_update(stale, ['token_count'], batch_size=batch_size)
+        return index_pages(pdf_file, pages, batch_size=batch_size)
+
+
+# 이미 색인된 PDF 의 posting 을 새 PDF 로 복제 (같은 내용의 PDF 가 다시 올라온 경우)
+# chapter_map 은 원본 챕터 id -> 새 챕터 id
+def clone_pdf(source_pdf_id, pdf_file, chapter_map, batch_size=None):
+    batch_size = batch_size or settings.INGEST_BULK_BATCH_SIZE
+    with transaction.atomic():
+        postings = []
+        term_page_counts = Counter()
+        rows = Posting.objects.filter(pdf_file_id=source_pdf_id).values_list(
+            'term_id', 'page_number', 'chapter_id', 'term_freq', 'page_length', 'positions'
+        )
+        for term_id, page_number, chapter_id, term_freq, page_length, positions in rows.iterator(chunk_size=batch_size):
+            term_page_counts[term_id] += 1
+            postings.append(Posting(
+                term_id=term_id,
+                pdf_file=pdf_file,
+                page_number=page_number,
+                chapter_id=chapter_map.get(chapter_id),
+                term_freq=term_freq,
+                page_length=page_length,
+                positions=positions,
+            ))
+        Posting.objects.bulk_create(postings, batch_size=batch_size)
+        _shift_doc_freq(term_page_counts, 1, batch_size)
+        pages = PageText.objects.filter(pdf_file_id=source_pdf_id).aggregate(
+            documents=Count('id'), total_length=Sum('token_count')
+        )
+        _shift_stats(pages['documents'], pages['total_length'] or 0)
+    return len(postings)
+
+
+# PDF 하나를 색인에서 제거 (PDFFile 삭제 전에 호출)
+def remove_pdf(pdf_file_id):
+    with transaction.atomic():
+        counts = dict(
+            Posting.objects.filter(pdf_file_id=pdf_file_id)
+            .values('term_id').annotate(pages=Count('id')).values_list('term_id', 'pages')
+        )
+        _shift_doc_freq(counts, -1)
+        pages = PageText.objects.filter(pdf_file_id=pdf_file_id).aggregate(
+            documents=Count('id'), total_length=Sum('token_count')
+        )
+        deleted, _ = Posting.objects.filter(pdf_file_id=pdf_file_id).delete()
+        _shift_stats(-pages['documents'], -(pages['total_length'] or 0))
+    return deleted
+
+
+def _phrase_matches(token_positions, tokens):
+    # 첫 토큰의 위치에서 시작해 이어지는 토큰들이 연속된 위치에 있는 경우만 일치
+    first = token_positions.get(tokens[0])
+    if not first:
+        return 0
+    rest = [token_positions.get(token) for token in tokens[1:]]
+    if any(positions is None for positions in rest):
+        return 0
+    return sum(1 for start in first if all(start + i + 1 in positions for i, positions in enumerate(rest)))
+
+
+# 질의 검색어의 posting 중 점수를 매길 후보 (term_id, pdf_file_id, page_number, chapter_id, term_freq, page_length, positions)
+# doc_freq 가 SEARCH_MAX_POSTINGS_PER_TERM 를 넘는 흔한 검색어는 term_freq 가 큰 posting 만 그 수만큼 읽고,
+# 다른 검색어로 후보가 된 페이지에 있는 posting 만 추가로 읽음 (흔한 검색어 하나 때문에 색인 전체를 읽지 않도록)
+def _candidate_postings(term_by_id, pdf_file_id=None, user_id=None):
+    postings = Posting.objects.all()
+    if pdf_file_id is not None:
+        postings = postings.filter(pdf_file_id=pdf_file_id)
+    elif user_id is not None:
+        postings = postings.filter(pdf_file__user_id=user_id)
+    columns = ('term_id', 'pdf_file_id', 'page_number', 'chapter_id', 'term_freq', 'page_length', 'positions')
+
+    limit = settings.SEARCH_MAX_POSTINGS_PER_TERM
+    common = sorted(term_id for term_id, row in term_by_id.items() if row['doc_freq'] > limit)
+    rows = list(postings.filter(term_id__in=[term_id for term_id in term_by_id if term_id not in common]).values_list(*columns))
+    for term_id in common:
+        rows += postings.filter(term_id=term_id).order_by('-term_freq', 'id').values_list(*columns)[:limit]
+    if not common or not rows:
+        return rows
+
+    loaded = {(term_id, pdf_id, page_number) for term_id, pdf_id, page_number, *_ in rows}
+    candidates = {(pdf_id, page_number) for _, pdf_id, page_number, *_ in rows}
+    rest = postings.filter(
+        term_id__in=common,
+        pdf_file_id__in={pdf_id for pdf_id, _ in candidates},
+        page_number__in={page_number for _, page_number in candidates},
+    ).values_list(*columns)
+    rows += [
+        row for row in rest.iterator(chunk_size=limit)
+        if (row[1], row[2]) in candidates and (row[0], row[1], row[2]) not in loaded
+    ]
+    return rows
+
+
+# BM25 로 챕터 순위를 매겨서 반환. pdf_file_id 또는 user_id 로 범위를 지정
+def search(query, pdf_file_id=None, user_id=None, limit=20):
+    groups = parse_query(query)
+    if not groups:
+        return []
+    terms = {token for tokens in groups for token in tokens}
+    term_rows = {row['term']: row for row in SearchTerm.objects.filter(term__in=terms).values('id', 'term', 'doc_freq')}
+    if not term_rows:
+        return []
+
+    stats = _stats_row()
+    documents = max(stats.documents, 1)
+    average_length = stats.total_length / documents or 1.0
+    term_by_id = {row['id']: row for row in term_rows.values()}
+
+    pages = defaultdict(dict)
+    for term_id, pdf_id, page_number, chapter_id, term_freq, page_length, positions in _candidate_postings(
+        term_by_id, pdf_file_id, user_id
+    ):
+        pages[(pdf_id, page_number, chapter_id, page_length)][term_by_id[term_id]['term']] = (
+            term_freq, {int(p) for p in positions.split()}
+        )
+
+    chapter_scores = defaultdict(float)
+    chapter_pages = defaultdict(set)
+    for (pdf_id, page_number, chapter_id, page_length), page_terms in pages.items():
+        if chapter_id is None:
+            continue
+        token_positions = {token: positions for token, (_, positions) in page_terms.items()}
+        score = 0.0
+        for tokens in groups:
+            if len(tokens) > 1:
+                # 구(phrase) 는 연속된 위치에 모두 나와야 함
+                freq = _phrase_matches(token_positions, tokens)
+                if not freq:
+                    continue
+            for token in tokens:
+                if token not in page_terms:
+                    continue
+                term_freq = page_terms[token][0] if len(tokens) == 1 else freq
+                doc_freq = term_rows[token]['doc_freq']
+                idf = math.log(1 + (documents - doc_freq + 0.5) / (doc_freq + 0.5))
+                score += idf * term_freq * (BM25_K1 + 1) / (
+                    term_freq + BM25_K1 * (1 - BM25_B + BM25_B * page_length / average_length)
+                )
+        if score > 0:
+            chapter_scores[chapter_id] += score
+            chapter_pages[chapter_id].add(page_number)
+
+    ranked = sorted(chapter_scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+    chapters = Chapter.objects.in_bulk([chapter_id for chapter_id, _ in ranked])
+    return [
+        {
+            'id': chapter_id,
+            'name': chapters[chapter_id].name,
+            'page': chapters[chapter_id].start_page,
+            'pdf_file_id': chapters[chapter_id].pdf_file_id,
+            'found_pages': sorted(chapter_pages[chapter_id]),
+            'score': round(score, 4),
+        }
+        for chapter_id, score in ranked if chapter_id in chapters
+    ]
@@ -0,0 +1,190 @@
+import logging
+import threading
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import Chapter, ChapterEmbedding, ChapterEmbeddingRevision
+from .similarity import normalize
+
+logger = logging.getLogger(__name__)
+
+
+def to_bytes(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(data, dtype=np.float32)
+
+
+# 챕터 임베딩을 쓰거나 지운 쪽에서 호출. 값은 매번 새로 만들므로 롤백된 쓰기의 revision 과도 겹치지 않음
+def bump_embedding_revision():
+    ChapterEmbeddingRevision.objects.update_or_create(pk=1, defaults={'revision': uuid.uuid4().hex})
+
+
+# ingestion 에서 계산한 챕터 임베딩을 저장 (한 번의 bulk insert)
+def save_chapter_embeddings(chapters, embeddings, model_name=None, batch_size=None):
+    if not chapters:
+        return []
+    model_name = model_name or settings.EMBEDDING_MODEL_NAME
+    rows = [
+        ChapterEmbedding(chapter_id=chapter.id, pdf_file_id=chapter.pdf_file_id, model_name=model_name, vector=to_bytes(vector))
+        for chapter, vector in zip(chapters, embeddings)
+    ]
+    rows = ChapterEmbedding.objects.bulk_create(rows, batch_size=batch_size or settings.INGEST_BULK_BATCH_SIZE)
+    bump_embedding_revision()
+    return rows
+
+
+# 순수 NumPy IVF (inverted file) 인덱스: k-means 중심점으로 벡터를 나눠두고 가까운 리스트만 탐색
+class IVFIndex:
+    def __init__(self, vectors, n_lists, iterations=8, seed=0):
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[assignment == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = normalize(centroids)
+        self.centroids = centroids
+        self.trained_size = len(vectors)
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self.add(vectors, 0)
+
+    def add(self, vectors, offset):
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for i in np.unique(assignment):
+            rows = np.flatnonzero(assignment == i) + offset
+            self.lists[i] = np.concatenate([self.lists[i], rows])
+
+    def candidates(self, query, n_probe):
+        nearest = np.argsort(-(self.centroids @ query))[:n_probe]
+        return np.concatenate([self.lists[i] for i in nearest])
+
+
+# 전체 챕터 임베딩을 메모리에 들고 있는 검색 인덱스 (프로세스당 하나)
+# 새 PDF 가 ingestion 되면 DB 에서 추가된 행만 읽어서 증분으로 갱신 (revision 이 바뀌었을 때만 확인)
+class ChapterVectorIndex:
+    def __init__(self, model_name=None):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.chapter_ids = np.empty(0, dtype=np.int64)
+        self.pdf_ids = np.empty(0, dtype=np.int64)
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.vectors = None
+        self.last_chapter_id = 0
+        self.revision = None
+        self.ivf = None
+
+    def _rows(self):
+        return ChapterEmbedding.objects.filter(model_name=self.model_name or settings.EMBEDDING_MODEL_NAME)
+
+    # revision 이 마지막으로 읽은 값과 같으면 그대로 사용 (pk 조회 1회)
+    # 바뀌었으면 DB 와 비교해서 새로 생긴 행은 추가하고, 삭제가 있었으면 다시 로드
+    # revision 을 행보다 먼저 읽으므로 읽는 도중에 커밋된 쓰기는 다음 질의에서 반영됨
+    def refresh(self):
+        revision = ChapterEmbeddingRevision.objects.filter(pk=1).values_list('revision', flat=True).first()
+        if revision is not None and revision == self.revision:
+            return
+        state = self._rows().aggregate(count=Count('chapter_id'), last=Max('chapter_id'))
+        with self._lock:
+            if state['count'] < len(self.chapter_ids) or (state['last'] or 0) < self.last_chapter_id:
+                self._reset()
+            if (state['last'] or 0) > self.last_chapter_id:
+                self._load(self._rows().filter(chapter_id__gt=self.last_chapter_id))
+            if state['count'] != len(self.chapter_ids):
+                # 늦게 커밋된 작은 id 가 있거나 삭제와 추가가 겹친 경우 전체 다시 로드
+                self._reset()
+                self._load(self._rows())
+            self.revision = revision
+
+    def _load(self, rows):
+        rows = list(rows.order_by('chapter_id').values_list('chapter_id', 'pdf_file_id', 'pdf_file__user_id', 'vector'))
+        if not rows:
+            return
+        chapter_ids, pdf_ids, user_ids, vectors = zip(*rows)
+        vectors = normalize(np.stack([from_bytes(v) for v in vectors]))
+        offset = len(self.chapter_ids)
+        self.chapter_ids = np.concatenate([self.chapter_ids, np.asarray(chapter_ids, dtype=np.int64)])
+        self.pdf_ids = np.concatenate([self.pdf_ids, np.asarray(pdf_ids, dtype=np.int64)])
+        self.user_ids = np.concatenate([self.user_ids, np.asarray(user_ids, dtype=np.int64)])
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+        self.last_chapter_id = int(self.chapter_ids[-1])
+
+        size = len(self.chapter_ids)
+        if size >= settings.SEMANTIC_IVF_MIN_SIZE and (self.ivf is None or size > 2 * self.ivf.trained_size):
+            # 처음 임계 크기를 넘었거나 학습 때보다 두 배 이상 커지면 중심점을 다시 학습
+            self.ivf = IVFIndex(self.vectors, n_lists=int(np.sqrt(size)))
+        elif self.ivf is not None:
+            self.ivf.add(vectors, offset)
+        logger.info(f"Chapter vector index loaded {len(rows)} rows (total {size})")
+
+    # 사용자의 챕터 (id, pdf id, 정규화된 벡터). exclude_pdf_file_id 의 챕터는 제외 (교차 문서 연결의 비교 대상)
+    def user_vectors(self, user_id, exclude_pdf_file_id=None):
+        self.refresh()
+        with self._lock:
+            if self.vectors is None:
+                return self.chapter_ids, self.pdf_ids, np.empty((0, 0), dtype=np.float32)
+            mask = self.user_ids == user_id
+            if exclude_pdf_file_id is not None:
+                mask &= self.pdf_ids != exclude_pdf_file_id
+            rows = np.flatnonzero(mask)
+            return self.chapter_ids[rows], self.pdf_ids[rows], self.vectors[rows]
+
+    def search(self, query_vector, top_k=10, pdf_file_id=None, user_id=None):
+        self.refresh()
+        with self._lock:
+            if self.vectors is None:
+                return []
+            query = normalize(query_vector)[0]
+            if pdf_file_id is not None:
+                rows = np.flatnonzero(self.pdf_ids == pdf_file_id)
+            elif user_id is not None:
+                rows = np.flatnonzero(self.user_ids == user_id)
+            else:
+                rows = None
+
+            # 범위가 작으면 정확 검색, 크면 IVF 로 후보를 줄임
+            if self.ivf is not None and (rows is None or len(rows) > settings.SEMANTIC_EXACT_LIMIT):
+                candidates = self.ivf.candidates(query, settings.SEMANTIC_IVF_PROBES)
+                if rows is not None:
+                    candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            else:
+                candidates = rows if rows is not None else np.arange(len(self.chapter_ids))
+            if len(candidates) == 0:
+                return []
+
+            scores = self.vectors[candidates] @ query
+            k = min(top_k, len(candidates))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(int(self.chapter_ids[candidates[i]]), float(scores[i])) for i in best]
+
+
+chapter_index = ChapterVectorIndex()
+
+
+# 질의 문장과 가장 가까운 챕터 top-k
+def semantic_search(query, encode, top_k=10, pdf_file_id=None, user_id=None):
+    query_vector = encode([query])
+    matches = chapter_index.search(query_vector, top_k=top_k, pdf_file_id=pdf_file_id, user_id=user_id)
+    chapters = Chapter.objects.in_bulk([chapter_id for chapter_id, _ in matches])
+    return [
+        {
+            'id': chapter_id,
+            'name': chapters[chapter_id].name,
+            'page': chapters[chapter_id].start_page,
+            'pdf_file_id': chapters[chapter_id].pdf_file_id,
+            'score': round(score, 4),
+        }
+        for chapter_id, score in matches if chapter_id in chapters
+    ]
@@ -0,0 +1,36 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from .graph_export import bump_graph_revision
+from .metrics import count_request_queries
+from .models import Chapter, PageConnection, PDFFile
+from .search_index import remove_pdf
+from .semantic import bump_embedding_revision
+
+
+# PDF 가 삭제되면 역색인 통계(doc_freq, 문서 수)도 같이 갱신
+@receiver(pre_delete, sender=PDFFile)
+def remove_pdf_from_search_index(sender, instance, **kwargs):
+    remove_pdf(instance.id)
+
+
+# PDF 와 함께 지워지는 챕터 임베딩을 메모리 인덱스가 알 수 있도록 revision 을 바꿈
+@receiver(pre_delete, sender=PDFFile)
+def bump_chapter_embedding_revision(sender, instance, **kwargs):
+    bump_embedding_revision()
+
+
+# 챕터나 연결 한 행을 저장하면 그래프 스냅샷/ETag 가 바뀌도록 revision 을 올림 (ingestion 의 bulk_create 는 해당 없음)
+@receiver(post_save, sender=Chapter)
+@receiver(post_save, sender=PageConnection)
+def bump_pdf_graph_revision(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_graph_revision(instance.pdf_file_id)
+
+
+# 요청별 쿼리 수 집계 (RequestMetricsMiddleware) 를 위해 새 DB 연결마다 한 번 실행 래퍼를 등록
+@receiver(connection_created)
+def install_request_query_counter(sender, connection, **kwargs):
+    if count_request_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_request_queries)
@@ -0,0 +1,138 @@
+import numpy as np
+from django.conf import settings
+
+
+# 유사도 연결 조건을 결정 (요청에 하나라도 지정되면 요청 값만, 없으면 settings 기본값 사용)
+def resolve_similarity_params(data=None):
+    data = data or {}
+    if 'similarity_threshold' in data or 'similarity_top_k' in data:
+        threshold = data.get('similarity_threshold')
+        top_k = data.get('similarity_top_k')
+    else:
+        threshold = settings.SIMILARITY_THRESHOLD
+        top_k = settings.SIMILARITY_TOP_K
+    threshold = float(threshold) if threshold not in (None, '') else None
+    top_k = int(top_k) if top_k not in (None, '') else 0
+    if top_k < 0:
+        raise ValueError("similarity_top_k must not be negative.")
+    if threshold is None and top_k == 0:
+        raise ValueError("Either similarity_threshold or similarity_top_k must be set.")
+    return {'threshold': threshold, 'top_k': top_k}
+
+
+def normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+# threshold 도 top_k 도 없으면 모든 쌍이 연결되므로 거부
+def _check_params(threshold, top_k):
+    if top_k is not None and top_k < 0:
+        raise ValueError("top_k must not be negative.")
+    if threshold is None and not top_k:
+        raise ValueError("Either threshold or top_k must be set.")
+
+
+# 행 블록 단위로 코사인 유사도를 계산해서 (source, target, similarity) 배열을 반환
+# - threshold: 유사도가 threshold 를 넘는 쌍만
+# - top_k: 챕터마다 가장 유사한 k 개만 (threshold 와 같이 쓰면 두 조건 모두 만족하는 쌍)
+# source < target 인 무방향 간선으로 중복 없이 반환하며, 메모리는 block_size x N 으로 제한됨
+def similarity_edges(embeddings, threshold=None, top_k=0, block_size=None):
+    _check_params(threshold, top_k)
+    vectors = normalize(embeddings)
+    n = len(vectors)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    if n < 2:
+        return empty
+
+    block_size = block_size or settings.SIMILARITY_BLOCK_SIZE
+    top_k = min(top_k or 0, n - 1)
+    columns = np.arange(n)
+    sources, targets, values = [], [], []
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        rows = np.arange(start, end)
+        sims = vectors[start:end] @ vectors.T
+        sims[rows - start, rows] = -np.inf  # 자기 자신 제외
+
+        if top_k:
+            nearest = np.argpartition(-sims, top_k - 1, axis=1)[:, :top_k]
+            mask = np.zeros_like(sims, dtype=bool)
+            mask[(rows - start)[:, None], nearest] = True
+        else:
+            # threshold 만 쓰는 경우 대칭 행렬이므로 위쪽 삼각형만 보면 됨
+            mask = columns[None, :] > rows[:, None]
+        if threshold is not None:
+            mask &= sims > threshold
+
+        block_rows, block_cols = np.nonzero(mask)
+        sources.append(block_rows + start)
+        targets.append(block_cols)
+        values.append(sims[block_rows, block_cols])
+
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    values = np.concatenate(values).astype(np.float32)
+
+    # top-k 는 (i, j) 와 (j, i) 가 모두 선택될 수 있으므로 정렬 후 중복 제거
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    _, first = np.unique(low * n + high, return_index=True)
+    return low[first].astype(np.int64), high[first].astype(np.int64), values[first]
+
+
+# queries 의 각 행과 corpus 사이의 유사한 쌍을 (query index, corpus index, similarity) 배열로 반환
+# - top_k: query 마다 corpus 에서 가장 유사한 k 개만 (threshold 와 같이 쓰면 두 조건 모두 만족하는 쌍)
+# - threshold 만 쓰면 threshold 를 넘는 모든 쌍
+# query 는 block_size 행, corpus 는 corpus_block_size 행 단위로 나눠서 계산하고 top-k 는 블록마다 누적하므로
+# 메모리는 block_size x corpus_block_size 로 제한되고 비용은 len(queries) x len(corpus) 에 비례
+def cross_similarity_edges(queries, corpus, threshold=None, top_k=0, block_size=None, corpus_block_size=None):
+    _check_params(threshold, top_k)
+    queries = normalize(queries)
+    corpus = normalize(corpus)
+    m, n = len(queries), len(corpus)
+    if not m or not n:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    block_size = block_size or settings.SIMILARITY_BLOCK_SIZE
+    corpus_block_size = corpus_block_size or settings.CROSS_LINK_BLOCK_SIZE
+    top_k = min(top_k or 0, n)
+    sources, targets, values = [], [], []
+
+    for start in range(0, m, block_size):
+        block = queries[start:start + block_size]
+        if top_k:
+            best_scores = np.full((len(block), top_k), -np.inf, dtype=np.float32)
+            best_index = np.zeros((len(block), top_k), dtype=np.int64)
+            for corpus_start in range(0, n, corpus_block_size):
+                sims = block @ corpus[corpus_start:corpus_start + corpus_block_size].T
+                scores = np.hstack([best_scores, sims])
+                keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                # keep 의 앞쪽 top_k 칸은 지금까지의 후보, 나머지는 이번 corpus 블록의 열
+                previous = np.take_along_axis(best_index, np.minimum(keep, top_k - 1), axis=1)
+                best_index = np.where(keep >= top_k, corpus_start + keep - top_k, previous)
+                best_scores = np.take_along_axis(scores, keep, axis=1)
+            mask = np.isfinite(best_scores)
+            if threshold is not None:
+                mask &= best_scores > threshold
+            rows, cols = np.nonzero(mask)
+            sources.append(rows + start)
+            targets.append(best_index[rows, cols])
+            values.append(best_scores[rows, cols])
+        else:
+            for corpus_start in range(0, n, corpus_block_size):
+                sims = block @ corpus[corpus_start:corpus_start + corpus_block_size].T
+                rows, cols = np.nonzero(sims > threshold)
+                sources.append(rows + start)
+                targets.append(cols + corpus_start)
+                values.append(sims[rows, cols])
+
+    return (
+        np.concatenate(sources).astype(np.int64),
+        np.concatenate(targets).astype(np.int64),
+        np.concatenate(values).astype(np.float32),
+    )
@@ -0,0 +1,177 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+# 저장소 작업별 호출 수, 오류 수, 지연 시간 (프로세스 전체에서 공유)
+class StorageMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    @contextmanager
+    def timed(self, backend, operation, size=0):
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self._operations.setdefault((backend, operation), {
+                    'backend': backend, 'operation': operation, 'count': 0, 'errors': 0,
+                    'total_seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0,
+                })
+                stats['count'] += 1
+                stats['errors'] += failed
+                stats['total_seconds'] += elapsed
+                stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+                stats['bytes'] += size
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    **stats,
+                    'total_seconds': round(stats['total_seconds'], 4),
+                    'max_seconds': round(stats['max_seconds'], 4),
+                    'avg_seconds': round(stats['total_seconds'] / stats['count'], 4) if stats['count'] else 0.0,
+                }
+                for stats in self._operations.values()
+            ]
+
+
+metrics = StorageMetrics()
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+# 프로세스당 하나의 S3 클라이언트를 공유 (클라이언트는 thread-safe, 생성은 아니므로 락 안에서 한 번만 생성)
+# 자격 증명 확인, 엔드포인트 설정, TLS 연결을 요청마다 반복하지 않고 커넥션 풀을 재사용
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.session.Session().client(
+                    's3',
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_S3_REGION_NAME,
+                    config=Config(
+                        max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+                        retries={'max_attempts': 5, 'mode': 'standard'},
+                    ),
+                )
+    return _s3_client
+
+
+# 큰 PDF 는 여러 part 로 나눠서 병렬로 업로드/다운로드
+def transfer_config():
+    return TransferConfig(
+        multipart_threshold=settings.AWS_S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=settings.AWS_S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=settings.AWS_S3_TRANSFER_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+# 업로드된 PDF 원본을 보관하는 S3 저장소
+class S3Storage:
+    name = 's3'
+
+    def __init__(self):
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.client = get_s3_client()
+        self.config = transfer_config()
+
+    def url(self, key):
+        return f"https://{self.bucket}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{key}"
+
+    # url() 의 역. 이 저장소의 url 이 아니면 None
+    def key_for_url(self, url):
+        prefix = self.url('')
+        if not url.startswith(prefix):
+            return None
+        return url[len(prefix):] or None
+
+    def upload(self, path, key):
+        with metrics.timed(self.name, 'upload', os.path.getsize(path)):
+            self.client.upload_file(path, self.bucket, key, Config=self.config)
+        return self.url(key)
+
+    def download(self, key, path):
+        with metrics.timed(self.name, 'download'):
+            self.client.download_file(self.bucket, key, path, Config=self.config)
+        return path
+
+    def delete(self, key):
+        with metrics.timed(self.name, 'delete'):
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+# 테스트/로컬 개발용 파일시스템 저장소 (S3 대체)
+class LocalStorage:
+    name = 'local'
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or settings.PDF_LOCAL_STORAGE_DIR)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def url(self, key):
+        return f"file://{self._path(key)}"
+
+    def key_for_url(self, url):
+        prefix = self.url('')
+        if not url.startswith(prefix):
+            return None
+        return url[len(prefix):] or None
+
+    def upload(self, path, key):
+        target = self._path(key)
+        with metrics.timed(self.name, 'upload', os.path.getsize(path)):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+        return self.url(key)
+
+    def download(self, key, path):
+        with metrics.timed(self.name, 'download'):
+            shutil.copyfile(self._path(key), path)
+        return path
+
+    def delete(self, key):
+        with metrics.timed(self.name, 'delete'):
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+STORAGE_BACKENDS = {
+    's3': S3Storage,
+    'local': LocalStorage,
+}
+
+
+# PDF_STORAGE_BACKEND 는 's3', 'local' 또는 저장소 클래스의 dotted path
+def get_storage():
+    backend = settings.PDF_STORAGE_BACKEND
+    storage_class = STORAGE_BACKENDS.get(backend) or import_string(backend)
+    return storage_class()
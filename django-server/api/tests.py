@@ -1,3 +1,1475 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import pstats
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import boto3
+import msgpack
+import numpy as np
+import pymupdf as fitz  # PyMuPDF
+from asgiref.sync import async_to_sync
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import chapter_tree, chat, extraction, graph_export, rendering, search_index
+from .async_views import cpu_executor, run_in_cpu_pool
+from .chapter_embeddings import chapter_chunks, encode_chapters, encode_documents
+from .cross_links import link_pdf
+from .dedup import file_sha256, find_ingested, ingest_key, record_artifact, store_original
+from .embedding_cache import DiskStore, EmbeddingCache, MemoryLRU
+from .embeddings import ModelRegistry, registry
+from .encoders import agreement, load_encoder
+from .extraction import PageExtractor, open_pdf
+from .ingestion import BulkWriter, build_chapters, build_page_texts, write_chapter_graph
+from .jobs import JobWorkerPool, claim_next_job, requeue_stale_jobs
+from .management.commands.bench_ingestion import hash_encode, make_textbook
+from .metrics import MetricsRegistry, span
+from .metrics import registry as metrics_registry
+from .models import (
+    Chapter, CrossConnection, DocumentArtifact, IngestionJob, Message, PageConnection, PageText, PDFFile,
+    Posting, SearchIndexStats, SearchTerm, Session,
+)
+from .parsing import parse_document
+from .pipeline import run_job, spool_upload
+from .search_index import tokenize
+from .semantic import ChapterVectorIndex, IVFIndex, chapter_index, save_chapter_embeddings
+from .similarity import cross_similarity_edges, normalize, resolve_similarity_params, similarity_edges
+from .storage import LocalStorage, S3Storage, get_s3_client, get_storage, transfer_config
+from .storage import metrics as storage_metrics
+from .toc import infer_toc
+
+
+def make_pdf(user, chapters=20):
+    pdf_file = PDFFile.objects.create(filename='test.pdf', user=user, url='file:///tmp/test.pdf')
+    toc = []
+    for i in range(chapters):
+        toc.append([1, f'Chapter {i}', i * 10 + 1])
+        toc.append([2, f'Section {i}.1', i * 10 + 2])
+        toc.append([2, f'Section {i}.2', i * 10 + 5])
+    chapters = build_chapters(toc, pdf_file, chapters * 10)
+    # 모든 챕터가 서로 유사하도록 같은 벡터를 써서 계층 연결과 유사도 연결이 겹치게 만듦
+    embeddings = np.ones((len(chapters), 8), dtype=np.float32)
+    write_chapter_graph(chapters, embeddings, {'threshold': 0.5, 'top_k': 0})
+    return pdf_file
+
+
+class GraphQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='tester')
+
+    def test_similarity_edges_skip_hierarchy_pairs(self):
+        pdf_file = make_pdf(self.user, chapters=3)
+        pairs = list(PageConnection.objects.filter(pdf_file=pdf_file).values_list('source_id', 'target_id'))
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertEqual(PageConnection.objects.filter(pdf_file=pdf_file, similarity=-1.0).count(), 6)
+
+    def test_graph_queries_do_not_grow_with_pdf_size(self):
+        small = make_pdf(self.user, chapters=2)
+        large = make_pdf(self.user, chapters=40)
+        for pdf_file in (small, large):
+            with self.assertNumQueries(2):
+                graph_export.build_graph(pdf_file.id)
+            graph_export.get_snapshot(pdf_file.id)
+            # 변경이 없으면 시그니처 집계 2회 + 스냅샷 조회 1회
+            with self.assertNumQueries(3):
+                graph_export.get_snapshot(pdf_file.id)
+
+
+class GraphExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='viewer')
+        self.pdf_file = make_pdf(self.user, chapters=5)
+        self.url = reverse('accountapp:pdf-graph', args=[self.pdf_file.id])
+
+    def test_not_modified_graph(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_snapshot_matches_graph_rows(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        graph = json.loads(gzip.decompress(response.content))
+        self.assertEqual(graph, graph_export.build_graph(self.pdf_file.id))
+        self.assertEqual(len(graph['nodes']['id']), Chapter.objects.filter(pdf_file=self.pdf_file).count())
+        self.assertEqual(len(graph['links']['source']), PageConnection.objects.filter(pdf_file=self.pdf_file).count())
+
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), graph)
+        self.assertNotEqual(response['ETag'], self.client.get(self.url)['ETag'])
+
+    def test_edits_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        # 행 수나 최대 id 가 그대로인 수정
+        chapter = Chapter.objects.filter(pdf_file=self.pdf_file).order_by('id').first()
+        chapter.name = 'Renamed'
+        chapter.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', json.loads(response.content)['nodes']['name'])
+        etag = response['ETag']
+
+        PageConnection.objects.filter(pdf_file=self.pdf_file, similarity__gt=0).update(similarity=0.9)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        graph_export.bump_graph_revision(self.pdf_file.id)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(0.9, json.loads(response.content)['links']['value'])
+
+
+class BulkWriteTests(TestCase):
+    def setUp(self):
+        self.pdf_file = PDFFile.objects.create(
+            filename='bulk.pdf', user=User.objects.create(username='writer'), url='file:///tmp/bulk.pdf'
+        )
+        toc = [[1, f'Chapter {i}', i * 3 + 1] for i in range(10)] + [[2, f'Section 9.{i}', 31 + i] for i in range(5)]
+        self.chapters = build_chapters(toc, self.pdf_file, 40)
+
+    def test_rows_are_written_in_batches(self):
+        embeddings = np.ones((len(self.chapters), 4), dtype=np.float32)
+        with CaptureQueriesContext(connection) as queries:
+            result = write_chapter_graph(self.chapters, embeddings, {'threshold': 0.5, 'top_k': 2}, batch_size=4)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(sum('"api_chapter"' in sql for sql in inserts), 4)  # 15 행 / 4
+        self.assertEqual(
+            sum('"api_pageconnection"' in sql for sql in inserts), -(-result['connections'] // 4)
+        )
+
+        self.assertEqual(result['chapters'], Chapter.objects.filter(pdf_file=self.pdf_file).count())
+        self.assertEqual(result['connections'], PageConnection.objects.filter(pdf_file=self.pdf_file).count())
+        # 계층 연결 5개 + 챕터마다 top-2 유사도 연결 (계층 쌍 제외)
+        self.assertEqual(PageConnection.objects.filter(pdf_file=self.pdf_file, similarity=-1).count(), 5)
+        self.assertGreater(result['connections'], 5)
+        self.assertGreater(result['rows_per_second'], 0)
+        self.assertEqual(
+            Chapter.objects.filter(pdf_file=self.pdf_file, parent__name='Chapter 9').count(), 5
+        )
+
+    def test_failed_graph_write_saves_nothing(self):
+        # 챕터를 쓴 뒤 연결 저장에서 실패하면 챕터도 남지 않음
+        with mock.patch.object(BulkWriter, 'save_connections', side_effect=RuntimeError('connection lost')):
+            with self.assertRaises(RuntimeError):
+                write_chapter_graph(self.chapters, np.ones((len(self.chapters), 4), dtype=np.float32))
+        self.assertFalse(Chapter.objects.exists())
+
+    def test_chapter_ids_are_mapped_when_database_returns_no_pks(self):
+        bulk_create = Chapter.objects.bulk_create
+
+        def bulk_create_without_pks(rows, **kwargs):
+            created = bulk_create(rows, **kwargs)
+            for row in rows:
+                row.pk = None
+            return created
+
+        writer = BulkWriter(batch_size=4)
+        with mock.patch.object(Chapter.objects, 'bulk_create', bulk_create_without_pks):
+            writer.save_chapters(self.chapters)
+        stored = dict(Chapter.objects.values_list('id', 'name'))
+        self.assertEqual([stored[chapter.pk] for chapter in self.chapters], [chapter.name for chapter in self.chapters])
+        self.assertEqual(writer.rows, len(self.chapters))
+
+
+class ChapterTreeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+
+    def test_end_page_is_next_non_descendant_start(self):
+        toc = [[1, 'A', 1], [2, 'A.1', 2], [3, 'A.1.a', 3], [2, 'A.2', 6], [1, 'B', 10], [3, 'B.x', 12]]
+        chapters = build_chapters(toc, None, 20)
+        self.assertEqual([c.end_page for c in chapters], [9, 5, 5, 9, 20, 20])
+        self.assertEqual([c.depth for c in chapters], [0, 1, 2, 1, 0, 1])
+        self.assertEqual([c.path for c in chapters], ['0001/', '0001/0001/', '0001/0001/0001/', '0001/0002/', '0002/', '0002/0001/'])
+        self.assertEqual([c.group for c in chapters], [2, 2, 2, 2, 3, 3])
+
+    def test_subtree_and_page_lookups_are_single_queries(self):
+        pdf_file = make_pdf(self.user, chapters=4)
+        chapter = Chapter.objects.get(pdf_file=pdf_file, name='Chapter 1')
+        with self.assertNumQueries(1):
+            names = [c.name for c in chapter_tree.descendants(chapter)]
+        self.assertEqual(names, ['Section 1.1', 'Section 1.2'])
+        self.assertEqual(Chapter.objects.get(pdf_file=pdf_file, name='Section 1.2').parent_id, chapter.id)
+
+        with self.assertNumQueries(1):
+            deepest = chapter_tree.chapter_at_page(pdf_file.id, 16)
+        self.assertEqual(deepest.name, 'Section 1.2')
+        self.assertEqual([c.name for c in chapter_tree.ancestors(deepest)], ['Chapter 1'])
+
+
+    def temp_path(self, name):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return os.path.join(directory, name)
+
+    def test_inferred_toc_levels_follow_font_sizes(self):
+        path = self.temp_path('sizes.pdf')
+        doc = fitz.open()
+        body = 'plain body text of the lecture notes ' * 3
+        pages = [
+            [(24, 'Part One'), (16, '1.1 Intro'), (10, body), (10, body), (16, '1.2 Background'), (10, body)],
+            [(16, '1.3 A heading that wraps'), (16, 'onto a second line'), (10, body), (10, body), (10, body)],
+            [(24, 'Part Two'), (16, '2.1 Results'), (10, body), (10, body)],
+        ]
+        for lines in pages:
+            page = doc.new_page(width=900, height=600)
+            for i, (size, text) in enumerate(lines):
+                page.insert_text((20, 40 + i * 40), text, fontsize=size)
+        doc.save(path)
+
+        self.assertEqual(infer_toc(path, 3, max_levels=3, max_lines=8), [
+            [1, 'Part One', 1], [2, '1.1 Intro', 1], [2, '1.2 Background', 1],
+            [2, '1.3 A heading that wraps onto a second line', 2],
+            [1, 'Part Two', 3], [2, '2.1 Results', 3],
+        ])
+        # 제목 후보는 페이지 위쪽 max_lines 줄까지만
+        self.assertNotIn([2, '1.2 Background', 1], infer_toc(path, 3, max_levels=3, max_lines=4))
+
+    def test_inferred_toc_titles_fit_the_name_column(self):
+        # 목차가 없고 표지에 큰 글씨 줄이 여러 개 있는 PDF: 이어지는 제목 줄은 하나로 합쳐짐
+        path = self.temp_path('cover.pdf')
+        doc = fitz.open()
+        cover = doc.new_page(width=900, height=600)
+        for i in range(8):
+            cover.insert_text((20, 40 + i * 30), f'Cover line {i} ' + 'of a very long lecture title ' * 3, fontsize=14)
+        for i in range(3):
+            doc.new_page(width=900, height=600).insert_textbox(fitz.Rect(20, 20, 880, 580), 'body text ' * 400, fontsize=10)
+        doc.save(path)
+
+        parsed = parse_document(path, infer_levels=3, max_lines=8)
+        self.assertEqual(parsed['toc_source'], 'heuristic')
+        self.assertGreater(len(parsed['toc'][0][1]), 255)
+        chapters = build_chapters(parsed['toc'], PDFFile.objects.create(filename='cover.pdf', user=self.user, url='file:///tmp/cover.pdf'), 4)
+        self.assertEqual([len(c.name) for c in chapters], [255])
+        Chapter.objects.bulk_create(chapters)
+
+
+class ChatPaginationTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='chatter')
+        pdf_file = make_pdf(user, chapters=1)
+        self.session = Session.objects.create(user=user, chapter=Chapter.objects.filter(pdf_file=pdf_file).first())
+        self.url = reverse('accountapp:session-messages', args=[self.session.id])
+
+    def test_bulk_append_and_walk_pages(self):
+        messages = [{'sender': 'user' if i % 2 else 'bot', 'content': f'message {i}'} for i in range(25)]
+        response = self.client.post(self.url, {'messages': messages}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([m['content'] for m in response.json()['messages']], [m['content'] for m in messages])
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 10, 'order': 'asc', **({'cursor': cursor} if cursor else {})}
+            # 세션 확인 1회 + 페이지 조회 1회, 몇 번째 페이지든 같음
+            with self.assertNumQueries(2):
+                page = self.client.get(self.url, params).json()
+            seen += [m['content'] for m in page['messages']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [m['content'] for m in messages])
+
+        newest = self.client.get(self.url, {'limit': 3}).json()['messages']
+        self.assertEqual([m['content'] for m in newest], ['message 24', 'message 23', 'message 22'])
+
+    def test_rejects_invalid_input(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nope'}).status_code, 400)
+        response = self.client.post(self.url, {'messages': [{'sender': 'admin', 'content': 'x'}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Message.objects.exists())
+
+    def test_malformed_requests_are_bad_requests(self):
+        created_at = timezone.now()
+        for params in [
+            {'limit': 'ten'}, {'limit': '1.5'}, {'cursor': 'é'},
+            {'cursor': chat.encode_cursor(created_at, 0).rstrip('=') + 'x'},
+            {'cursor': chat.encode_cursor(created_at.replace(tzinfo=None), 1)},
+            {'cursor': chat.encode_cursor(created_at, 2 ** 63)},
+        ]:
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+        for body in [[{'sender': 'user', 'content': 'x'}], 5, 'x', {'messages': 5}, {'messages': {'sender': 'user'}}]:
+            self.assertEqual(self.client.post(self.url, body, content_type='application/json').status_code, 400, body)
+        self.assertFalse(Message.objects.exists())
+
+    def test_append_maps_ids_when_database_returns_no_pks(self):
+        bulk_create = Message.objects.bulk_create
+
+        # MySQL 처럼 pk 를 돌려주지 않고, 그 사이 다른 요청이 같은 세션에 메세지를 추가한 경우
+        def bulk_create_without_pks(rows, **kwargs):
+            created = bulk_create(rows, **kwargs)
+            Message.objects.create(session=self.session, sender='bot', content='concurrent')
+            for row in rows:
+                row.pk = None
+            return created
+
+        messages = [{'sender': 'user', 'content': 'same'}, {'sender': 'bot', 'content': 'reply'}, {'sender': 'user', 'content': 'same'}]
+        with mock.patch.object(Message.objects, 'bulk_create', bulk_create_without_pks):
+            saved = chat.append_messages(self.session, messages)
+        stored = dict(Message.objects.values_list('id', 'content'))
+        self.assertEqual([stored[message['id']] for message in saved], ['same', 'reply', 'same'])
+        self.assertEqual(len({message['id'] for message in saved}), 3)
+        self.assertNotIn(Message.objects.get(content='concurrent').id, [message['id'] for message in saved])
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='tester')
+
+    def make_job(self, status=IngestionJob.PENDING, started_at=None):
+        return IngestionJob.objects.create(
+            user=self.user, file_name='a.pdf', file_path='/tmp/a.pdf', status=status, started_at=started_at,
+        )
+
+    def test_claim_next_job_never_claims_twice(self):
+        jobs = [self.make_job() for _ in range(3)]
+        self.make_job(status=IngestionJob.DONE)
+        claimed = [claim_next_job() for _ in range(3)]
+        self.assertEqual([job.id for job in claimed], [job.id for job in jobs])
+        self.assertTrue(all(job.status == IngestionJob.RUNNING and job.started_at for job in claimed))
+        self.assertIsNone(claim_next_job())
+
+    def test_claim_skips_job_claimed_by_another_worker(self):
+        first, second = self.make_job(), self.make_job()
+        # 다른 워커가 대기 목록을 읽은 뒤 첫 작업을 먼저 가져간 상황
+        IngestionJob.objects.filter(pk=first.pk).update(status=IngestionJob.RUNNING, started_at=timezone.now())
+        self.assertEqual(claim_next_job().id, second.id)
+        self.assertIsNone(claim_next_job())
+
+    @override_settings(INGESTION_JOB_TIMEOUT=60)
+    def test_pool_start_requeues_stale_jobs(self):
+        stale = self.make_job(status=IngestionJob.RUNNING, started_at=timezone.now() - timedelta(minutes=5))
+        IngestionJob.objects.filter(pk=stale.pk).update(stage='embed', progress=70)
+        fresh = self.make_job(status=IngestionJob.RUNNING, started_at=timezone.now())
+        done = self.make_job(status=IngestionJob.DONE, started_at=timezone.now() - timedelta(minutes=5))
+
+        pool = JobWorkerPool(size=1)
+        # 워커 스레드는 바로 종료되도록 멈춘 상태로 시작
+        pool.stop()
+        pool.start()
+        pool.join()
+        statuses = dict(IngestionJob.objects.values_list('id', 'status'))
+        self.assertEqual(
+            [statuses[stale.id], statuses[fresh.id], statuses[done.id]],
+            [IngestionJob.PENDING, IngestionJob.RUNNING, IngestionJob.DONE],
+        )
+        stale.refresh_from_db()
+        self.assertEqual((stale.stage, stale.progress), ('', 0))
+        self.assertEqual(claim_next_job().id, stale.id)
+
+
+# 한 글자가 토큰 하나인 fast 토크나이저 (한국어 단어 하나가 여러 토큰이 되는 경우)
+class CharTokenizer:
+    is_fast = True
+
+    def __call__(self, text, **kwargs):
+        return {'offset_mapping': [(i, i + 1) for i, char in enumerate(text) if not char.isspace()]}
+
+
+def make_book_pdf(pages=9):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f'Page {i + 1} about graphs and keyword search')
+    doc.set_toc([[1, 'Intro', 1], [2, 'Background', 2], [1, 'Method', 4], [1, 'Results', 7]])
+    return doc.tobytes()
+
+
+class UploadSpoolTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            INGESTION_SPOOL_DIR=os.path.join(self.tmp, 'spool'), PDF_LOCAL_STORAGE_DIR=os.path.join(self.tmp, 'storage'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_memory_upload_is_copied_once(self):
+        content = make_book_pdf()
+        path, bytes_copied = spool_upload(SimpleUploadedFile('book.pdf', content), 'memory')
+        self.assertEqual(bytes_copied, len(content))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_temporary_upload_is_linked_not_copied(self):
+        upload = TemporaryUploadedFile('book.pdf', 'application/pdf', 0, None)
+        self.addCleanup(upload.close)
+        upload.write(make_book_pdf())
+        upload.flush()
+        path, bytes_copied = spool_upload(upload, 'temporary')
+        self.assertEqual(bytes_copied, 0)
+        self.assertTrue(os.path.samefile(path, upload.temporary_file_path()))
+        # mmap 으로 연 스풀 파일을 그대로 파싱
+        with open_pdf(path) as pdf_document:
+            self.assertEqual(pdf_document.page_count, 9)
+
+    def test_storage_backend_is_pluggable(self):
+        source = os.path.join(self.tmp, 'source.pdf')
+        with open(source, 'wb') as f:
+            f.write(b'%PDF-1.4 test')
+        with self.settings(PDF_STORAGE_BACKEND='api.storage.LocalStorage'):
+            storage = get_storage()
+        self.assertIsInstance(storage, LocalStorage)
+        url = storage.upload(source, 'originals/a.pdf')
+        self.assertEqual(storage.key_for_url(url), 'originals/a.pdf')
+        copy = storage.download('originals/a.pdf', os.path.join(self.tmp, 'copy.pdf'))
+        with open(copy, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 test')
+        storage.delete('originals/a.pdf')
+        storage.delete('originals/a.pdf')  # 없는 key 는 무시
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'storage', 'originals', 'a.pdf')))
+
+
+class PageExtractionTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.path = os.path.join(self.tmp, 'book.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(make_book_pdf(pages=20))
+
+    def expected(self):
+        return [(i, f'Page {i} about graphs and keyword search\n') for i in range(1, 21)]
+
+    @override_settings(EXTRACTION_WORKERS=1)
+    def test_small_documents_are_extracted_in_process(self):
+        extractor = PageExtractor(self.path, 20)
+        with mock.patch('api.extraction.get_executor') as get_executor:
+            self.assertEqual(list(extractor), self.expected())
+        get_executor.assert_not_called()
+        self.assertEqual(extractor.pages, 20)
+        self.assertGreater(extractor.pages_per_second, 0)
+
+    @override_settings(EXTRACTION_WORKERS=4, EXTRACTION_PARALLEL_MIN_PAGES=1)
+    def test_ranges_are_streamed_in_order_with_bounded_pending_work(self):
+        submitted = []
+
+        class Executor(ThreadPoolExecutor):
+            def submit(self, fn, path, start, stop):
+                submitted.append((start, stop))
+                return super().submit(fn, path, start, stop)
+
+        with Executor(max_workers=4) as executor, mock.patch('api.extraction.get_executor', return_value=executor):
+            pages = iter(PageExtractor(self.path, 20, chunk_pages=3, max_pending=2))
+            first = next(pages)
+            # 첫 범위를 받은 시점에는 max_pending 개 + 다음 범위 하나만 요청됨
+            self.assertEqual(submitted, [(0, 3), (3, 6), (6, 9)])
+            self.assertEqual([first] + list(pages), self.expected())
+        self.assertEqual(submitted, [(start, min(start + 3, 20)) for start in range(0, 20, 3)])
+
+    @override_settings(EXTRACTION_WORKERS=2, EXTRACTION_PARALLEL_MIN_PAGES=1)
+    def test_process_pool_extracts_the_same_pages(self):
+        self.addCleanup(self.shutdown_executor)
+        self.assertEqual(list(PageExtractor(self.path, 20, chunk_pages=6)), self.expected())
+        self.assertIsInstance(extraction._executor, ProcessPoolExecutor)
+
+    def shutdown_executor(self):
+        if extraction._executor is not None:
+            extraction._executor.shutdown()
+            extraction._executor = None
+
+
+# 비동기 뷰는 DB 작업을 다른 스레드(다른 연결)에서 하므로 테스트 데이터가 커밋되어 있어야 함
+class AsyncEndpointTests(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            INGESTION_SPOOL_DIR=os.path.join(self.tmp, 'spool'), INGESTION_ASYNC=True,
+            INGESTION_AUTOSTART_WORKERS=False, EMBEDDING_CACHE_ENABLED=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.enterContext(registry.substitute(hash_encode))
+        chapter_index._reset()
+        self.addCleanup(chapter_index._reset)
+        self.user = User.objects.create(username='async')
+        self.pdf_file = PDFFile.objects.create(filename='async.pdf', user=self.user, url='file:///tmp/async.pdf')
+        pages = ['async search engine', 'event loop', 'thread pool search']
+        chapters = BulkWriter().save_chapters(
+            build_chapters([[1, f'Chapter {i}', i + 1] for i in range(len(pages))], self.pdf_file, len(pages))
+        )
+        search_index.index_pdf(self.pdf_file, [tokenize(text) for text in pages], chapters)
+        save_chapter_embeddings(chapters, hash_encode([chapter.name for chapter in chapters]))
+
+    def post_both(self, sync_name, async_name, data):
+        sync = self.client.post(reverse(sync_name), data, content_type='application/json')
+        response = self.client.post(reverse(async_name), data, content_type='application/json')
+        self.assertEqual(response.status_code, sync.status_code)
+        return sync.json(), response.json()
+
+    def test_search_endpoints_match_the_sync_views(self):
+        for data in [
+            {'keyword': 'search', 'pdf_file_id': self.pdf_file.id},
+            {'keyword': 'loop', 'user_id': self.user.id, 'limit': 1},
+        ]:
+            sync, result = self.post_both('accountapp:search', 'accountapp:async-search', data)
+            self.assertTrue(result['results'])
+            self.assertEqual(result, sync)
+        sync, result = self.post_both(
+            'accountapp:semantic-search', 'accountapp:async-semantic-search', {'query': 'Chapter 1', 'user_id': self.user.id}
+        )
+        self.assertEqual(result['results'][0]['name'], 'Chapter 1')
+        self.assertEqual(result, sync)
+
+        # form 입력, 잘못된 요청, 없는 PDF
+        response = self.client.post(reverse('accountapp:async-search'), {'keyword': 'search', 'pdf_file_id': self.pdf_file.id})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(self.client.post(reverse('accountapp:async-search'), {'keyword': 'x'}).status_code, 400)
+        self.assertEqual(
+            self.client.post(reverse('accountapp:async-search'), {'keyword': 'x', 'pdf_file_id': self.pdf_file.id + 1}).status_code, 404
+        )
+
+    def test_non_integer_parameters_are_rejected(self):
+        for data in [
+            {'keyword': 'search', 'pdf_file_id': 'abc'},
+            {'keyword': 'search', 'user_id': [self.user.id]},
+            {'keyword': 'search', 'user_id': None},
+            {'keyword': 'search', 'pdf_file_id': self.pdf_file.id, 'limit': 'ten'},
+        ]:
+            sync, result = self.post_both('accountapp:search', 'accountapp:async-search', data)
+            self.assertEqual(result, sync)
+            self.assertIn('must be integers', result['error'], data)
+        for data in [
+            {'query': 'Chapter 1', 'pdf_file_id': '1.5'},
+            {'query': 'Chapter 1', 'user_id': {'id': self.user.id}},
+            {'query': 'Chapter 1', 'user_id': self.user.id, 'top_k': 'all'},
+        ]:
+            sync, result = self.post_both('accountapp:semantic-search', 'accountapp:async-semantic-search', data)
+            self.assertEqual(result, sync)
+            self.assertIn('must be integers', result['error'], data)
+        response = self.client.post(reverse('accountapp:search'), {'keyword': 'search', 'pdf_file_id': 'abc'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_is_queued(self):
+        response = self.client.post(reverse('accountapp:async-recommend'), {
+            'user_id': self.user.id, 'file': SimpleUploadedFile('book.pdf', make_book_pdf(), 'application/pdf'),
+        })
+        self.assertEqual(response.status_code, 202)
+        job = IngestionJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual((job.status, job.file_name, job.result['upload_bytes']), (IngestionJob.PENDING, 'book.pdf', len(make_book_pdf())))
+        # 업로드 핸들러가 계산한 원본 hash
+        with open(job.file_path, 'rb') as f:
+            self.assertEqual(job.options['content_hash'], hashlib.sha256(f.read()).hexdigest())
+        self.assertEqual(self.client.post(reverse('accountapp:async-recommend'), {'user_id': self.user.id}).status_code, 400)
+
+    def test_cpu_work_runs_in_a_bounded_pool(self):
+        self.assertEqual(cpu_executor._max_workers, settings.ASYNC_CPU_WORKERS)
+        threads = set()
+
+        def work():
+            threads.add(threading.current_thread().name)
+
+        async def run_many():
+            await asyncio.gather(*[run_in_cpu_pool(work)() for _ in range(20)])
+
+        async_to_sync(run_many)()
+        self.assertTrue(all(name.startswith('async-cpu') for name in threads))
+        self.assertLessEqual(len(threads), settings.ASYNC_CPU_WORKERS)
+
+
+class StorageServiceTests(TestCase):
+    def operation(self, backend, name):
+        for stats in storage_metrics.stats():
+            if (stats['backend'], stats['operation']) == (backend, name):
+                return stats
+        return {'count': 0, 'errors': 0, 'bytes': 0}
+
+    @mock.patch('api.storage._s3_client', None)
+    def test_s3_client_is_created_once_and_pooled(self):
+        barrier = threading.Barrier(8)
+        clients = []
+
+        def get():
+            barrier.wait()
+            clients.append(get_s3_client())
+
+        with mock.patch('boto3.session.Session', wraps=boto3.session.Session) as session:
+            threads = [threading.Thread(target=get) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(session.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 1)
+        self.assertEqual(clients[0].meta.config.max_pool_connections, settings.AWS_S3_MAX_POOL_CONNECTIONS)
+        self.assertIs(S3Storage().client, clients[0])
+
+        config = transfer_config()
+        self.assertEqual(
+            (config.multipart_threshold, config.multipart_chunksize, config.max_request_concurrency),
+            (settings.AWS_S3_MULTIPART_THRESHOLD, settings.AWS_S3_MULTIPART_CHUNKSIZE, settings.AWS_S3_TRANSFER_CONCURRENCY),
+        )
+
+    @mock.patch('api.storage._s3_client', None)
+    def test_s3_operations_record_latency_and_errors(self):
+        s3 = S3Storage()
+        before = self.operation('s3', 'delete')
+        with Stubber(s3.client) as stubber:
+            stubber.add_response('delete_object', {}, {'Bucket': s3.bucket, 'Key': 'a.pdf'})
+            stubber.add_client_error('delete_object', 'AccessDenied')
+            s3.delete('a.pdf')
+            with self.assertRaises(ClientError):
+                s3.delete('a.pdf')
+        after = self.operation('s3', 'delete')
+        self.assertEqual((after['count'] - before['count'], after['errors'] - before['errors']), (2, 1))
+        self.assertGreaterEqual(after['max_seconds'], after['avg_seconds'])
+
+    def test_local_operations_are_reported(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        source = os.path.join(tmp, 'source.pdf')
+        with open(source, 'wb') as f:
+            f.write(b'x' * 1000)
+        before = self.operation('local', 'upload')
+        LocalStorage(os.path.join(tmp, 'storage')).upload(source, 'a.pdf')
+        after = self.operation('local', 'upload')
+        self.assertEqual((after['count'] - before['count'], after['bytes'] - before['bytes']), (1, 1000))
+
+        operations = self.client.get(reverse('accountapp:storage-stats')).json()['operations']
+        self.assertIn(after, operations)
+
+
+class IngestionBenchmarkTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        chapter_index._reset()
+        self.addCleanup(chapter_index._reset)
+
+    def test_synthetic_textbook_has_nested_toc(self):
+        data, toc_entries = make_textbook(100, 'seed')
+        doc = fitz.open(stream=data, filetype='pdf')
+        toc = doc.get_toc()
+        self.assertEqual((doc.page_count, len(toc)), (100, toc_entries))
+        self.assertEqual(sorted({level for level, _, _ in toc}), [1, 2, 3])
+        # 같은 seed 면 같은 목차
+        self.assertEqual(fitz.open(stream=make_textbook(100, 'seed')[0], filetype='pdf').get_toc(), toc)
+
+    @override_settings(EXTRACTION_WORKERS=1)
+    def test_benchmark_reports_stages_as_json(self):
+        output = os.path.join(self.tmp, 'bench.json')
+        with self.settings(INGESTION_SPOOL_DIR=os.path.join(self.tmp, 'spool')):
+            call_command(
+                'bench_ingestion', '--sizes', '12', '--hash-encoder', '--search-queries', '2', '--output', output,
+                stderr=StringIO(),
+            )
+        with open(output) as f:
+            report = json.load(f)
+        [result] = report['results']
+        self.assertEqual(result['pages'], 12)
+        self.assertGreater(result['queries'], 0)
+        self.assertGreater(result['pages_per_second'], 0)
+        self.assertTrue({'extract', 'chapters', 'connections'} <= set(result['stage_seconds']))
+        self.assertTrue(result['reupload']['cache_hit'])
+        self.assertEqual(result['search']['queries'], 2)
+        self.assertGreater(report['peak_rss_bytes']['self'], 0)
+        # --keep 없이 실행하면 만든 PDF 를 지움
+        self.assertFalse(PDFFile.objects.exists())
+
+
+class MetricsTests(TestCase):
+    SAMPLE_RE = re.compile(r'^[a-z_]+(\{[a-z_]+="(?:[^"\\]|\\.)*"(,[a-z_]+="(?:[^"\\]|\\.)*")*\})? -?[0-9.e+-]+$')
+
+    def test_metrics_endpoint_is_prometheus_text(self):
+        user = User.objects.create(username='metered')
+        url = reverse('accountapp:session-messages', args=[
+            Session.objects.create(user=user, chapter=Chapter.objects.filter(pdf_file=make_pdf(user, chapters=1)).first()).id
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response['X-DB-Queries'], str(len(queries)))
+
+        response = self.client.get(reverse('accountapp:metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, self.SAMPLE_RE)
+        route = 'route="api/sessions/<int:session_id>/messages/"'
+        self.assertTrue(any(
+            line.startswith('spreadout_request_seconds_count') and route in line and 'status="200"' in line for line in lines
+        ))
+        self.assertTrue(any(line.startswith('spreadout_request_queries_bucket') and route in line for line in lines))
+        self.assertIn('spreadout_ingestion_queue_jobs{status="pending"} 0', lines)
+        self.assertIn('# TYPE spreadout_process_rss_bytes gauge', lines)
+
+    def test_histogram_and_span_samples(self):
+        metrics = MetricsRegistry()
+        for value in (0.003, 0.2, 100):
+            metrics.observe('latency', 'Latency.', value, buckets=(0.01, 1), path='a"b')
+        lines = metrics.render().splitlines()
+        self.assertEqual(lines[:2], ['# HELP latency Latency.', '# TYPE latency histogram'])
+        self.assertEqual(lines[2:], [
+            'latency_bucket{path="a\\"b",le="0.01"} 1',
+            'latency_bucket{path="a\\"b",le="1"} 2',
+            'latency_bucket{path="a\\"b",le="+Inf"} 3',
+            'latency_sum{path="a\\"b"} 100.203',
+            'latency_count{path="a\\"b"} 3',
+        ])
+
+        with self.assertRaises(RuntimeError):
+            with span('test.failing') as counter:
+                User.objects.count()
+                raise RuntimeError('boom')
+        self.assertEqual(counter.count, 1)
+        rendered = metrics_registry.render()
+        self.assertIn('spreadout_span_errors_total{span="test.failing"} 1', rendered)
+        self.assertIn('spreadout_span_queries_sum{span="test.failing"} 1', rendered)
+
+    def test_profile_is_dumped_only_when_enabled(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        url = reverse('accountapp:cache-stats')
+        with self.settings(PROFILE_DIR=tmp, PROFILE_HEADER_ENABLED=False, PROFILE_SAMPLE_RATE=0.0):
+            self.assertNotIn('X-Profile-File', self.client.get(url, HTTP_X_PROFILE='1'))
+        with self.settings(PROFILE_DIR=tmp, PROFILE_HEADER_ENABLED=True, PROFILE_SAMPLE_RATE=0.0):
+            response = self.client.get(url, HTTP_X_PROFILE='1')
+        self.assertEqual(os.listdir(tmp), [response['X-Profile-File']])
+        self.assertGreater(pstats.Stats(os.path.join(tmp, response['X-Profile-File'])).total_calls, 0)
+
+
+class IngestionPipelineTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            PDF_STORAGE_BACKEND='local', PDF_LOCAL_STORAGE_DIR=os.path.join(self.tmp, 'storage'),
+            INGESTION_SPOOL_DIR=os.path.join(self.tmp, 'spool'), INGESTION_ASYNC=True,
+            INGESTION_AUTOSTART_WORKERS=False, EXTRACTION_WORKERS=1, EMBEDDING_CACHE_ENABLED=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # 모델을 로드하지 않도록 해시 인코더 사용
+        self.enterContext(registry.substitute(hash_encode))
+        # 프로세스 전역 벡터 인덱스에 다른 테스트(롤백된 행)의 벡터가 남지 않도록 비움
+        chapter_index._reset()
+        self.addCleanup(chapter_index._reset)
+        self.user = User.objects.create(username='reader')
+
+    def upload(self, **data):
+        return self.client.post(reverse('accountapp:recommend'), {
+            'user_id': self.user.id, 'file': SimpleUploadedFile('book.pdf', make_book_pdf(), 'application/pdf'), **data,
+        })
+
+    def spooled_job(self, **options):
+        path = os.path.join(self.tmp, 'spooled.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_book_pdf())
+        return IngestionJob.objects.create(user=self.user, file_name='book.pdf', file_path=path, options=options)
+
+    def test_upload_is_processed_by_worker(self):
+        response = self.upload(similarity_threshold=0.5)
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['status'], IngestionJob.PENDING)
+
+        run_job(claim_next_job())
+        job_status = self.client.get(status_url).json()
+        self.assertEqual((job_status['status'], job_status['progress'], job_status['error']), (IngestionJob.DONE, 100, ''))
+        self.assertEqual(job_status['result']['pages'], 9)
+        self.assertEqual(
+            list(PageText.objects.filter(pdf_file_id=job_status['pdf_file_id']).order_by('page_number').values_list('page_number', flat=True)),
+            list(range(1, 10)),
+        )
+
+        graph = self.client.get(reverse('accountapp:pdf-graph', args=[job_status['pdf_file_id']])).json()
+        self.assertEqual(sorted(graph['nodes']['name']), ['Background', 'Intro', 'Method', 'Results'])
+        self.assertIn(job_status['first_chapter_id'], graph['nodes']['id'])
+        hierarchy = [
+            (source, target) for source, target, value in zip(*graph['links'].values()) if value == -1.0
+        ]
+        names = dict(zip(graph['nodes']['id'], graph['nodes']['name']))
+        self.assertEqual([(names[source], names[target]) for source, target in hierarchy], [('Intro', 'Background')])
+        self.assertTrue(search_index.search('keyword', pdf_file_id=job_status['pdf_file_id']))
+
+    def test_upload_is_parsed_from_the_spool_without_downloading(self):
+        downloads = lambda: sum(op['count'] for op in storage_metrics.stats() if op['operation'] == 'download')
+        before = downloads()
+        self.assertEqual(self.upload().status_code, 202)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, IngestionJob.DONE)
+        self.assertEqual(downloads(), before)
+        size = len(make_book_pdf())
+        self.assertEqual((job.result['upload_bytes'], job.result['bytes_copied']), (size, size))
+        # 스풀 파일은 처리 후 지움
+        self.assertFalse(os.listdir(os.path.join(self.tmp, 'spool')))
+        self.assertIsNotNone(get_storage().key_for_url(PDFFile.objects.get(pk=job.pdf_file_id).url))
+
+    def test_content_embeddings_use_the_registry_chunker(self):
+        class Model:
+            tokenizer = CharTokenizer()
+            max_seq_length = 10
+
+        texts = []
+
+        def encode(batch):
+            texts.extend(batch)
+            return hash_encode(batch)
+
+        with registry.substitute(encode, Model()):
+            self.assertIsInstance(registry.chunking_model(), Model)
+            job = run_job(self.spooled_job(embedding_source='content'))
+        self.assertIsNone(registry.chunking_model())
+        self.assertEqual(job.status, IngestionJob.DONE)
+        # 본문 조각이 특수 토큰 2개를 뺀 8 토큰 안에 들어감
+        self.assertGreater(len(texts), 4)
+        self.assertTrue(all(len(''.join(text.split())) <= 8 for text in texts))
+
+    def test_failed_job_leaves_no_partial_pdf(self):
+        # 연결 단계에서 실패하는 조건 (페이지, 색인, 챕터는 이미 저장된 뒤)
+        job = run_job(self.spooled_job(similarity={'threshold': None, 'top_k': 0}))
+        self.assertEqual((job.status, job.stage, job.pdf_file_id), (IngestionJob.FAILED, 'connections', None))
+        self.assertFalse(PDFFile.objects.exists())
+        self.assertFalse(PageText.objects.exists() or Chapter.objects.exists() or Posting.objects.exists())
+        stats = SearchIndexStats.objects.get()
+        self.assertEqual((stats.documents, stats.total_length), (0, 0))
+        self.assertFalse(SearchTerm.objects.exclude(doc_freq=0).exists())
+
+    @override_settings(INGESTION_JOB_TIMEOUT=60)
+    def test_requeued_job_restarts_without_duplicates(self):
+        job = self.spooled_job()
+        # 이전 실행이 페이지 일부를 저장하고 죽은 상태
+        partial = PDFFile.objects.create(filename='book.pdf', user=self.user, url='')
+        PageText.objects.create(pdf_file=partial, page_number=1, text='graphs', token_count=1)
+        search_index.index_pages(partial, [(1, ['graphs'])])
+        started_at = timezone.now() - timedelta(minutes=5)
+        IngestionJob.objects.filter(pk=job.pk).update(status=IngestionJob.RUNNING, started_at=started_at, pdf_file=partial)
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, IngestionJob.DONE)
+        self.assertEqual(list(PDFFile.objects.values_list('id', flat=True)), [job.pdf_file_id])
+        self.assertNotEqual(job.pdf_file_id, partial.id)
+        self.assertEqual(SearchIndexStats.objects.get().documents, 9)
+        job.refresh_from_db()
+        self.assertGreater(job.started_at, started_at + timedelta(minutes=4))
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='tester')
+
+    def make_indexed_pdf(self, pages, index=True):
+        pdf_file = PDFFile.objects.create(filename='search.pdf', user=self.user, url='file:///tmp/search.pdf')
+        chapters = BulkWriter().save_chapters(
+            build_chapters([[1, f'Chapter {i}', i + 1] for i in range(len(pages))], pdf_file, len(pages))
+        )
+        PageText.objects.bulk_create(build_page_texts(
+            pdf_file, [(page_number, text, len(tokenize(text)) if index else 0) for page_number, text in enumerate(pages, start=1)]
+        ))
+        if index:
+            search_index.index_pdf(pdf_file, [tokenize(text) for text in pages], chapters)
+        return pdf_file, chapters
+
+    def test_korean_words_split_into_bigrams(self):
+        self.assertEqual(tokenize('한국어 검색, Search2 가'), ['한국', '국어', '검색', 'search2', '가'])
+        self.assertEqual(search_index.parse_query('"검색 엔진" python'), [['검색', '엔진'], ['python']])
+        self.assertEqual(search_index.parse_query('"검색 엔진'), [['검색'], ['엔진']])
+
+    def test_quoted_phrase_requires_adjacent_tokens(self):
+        pdf_file, chapters = self.make_indexed_pdf([
+            '형태소 분석 없는 검색 엔진',
+            '엔진 오일과 검색 결과',
+            '데이터베이스 색인',
+        ])
+        names = lambda query: [r['name'] for r in search_index.search(query, pdf_file_id=pdf_file.id)]
+        self.assertEqual(names('"검색 엔진"'), ['Chapter 0'])
+        self.assertEqual(set(names('검색 엔진')), {'Chapter 0', 'Chapter 1'})
+        # 한 단어 안의 bigram 도 연속된 위치여야 일치
+        self.assertEqual(names('베이스데이터'), [])
+        self.assertEqual(names('데이터베이스'), ['Chapter 2'])
+
+    def test_bm25_ranks_frequent_and_rare_terms_higher(self):
+        pdf_file, chapters = self.make_indexed_pdf([
+            'python python python django',
+            'python django',
+            'django flask',
+            'django',
+        ])
+        results = search_index.search('python', pdf_file_id=pdf_file.id)
+        self.assertEqual([r['name'] for r in results], ['Chapter 0', 'Chapter 1'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        # 드문 검색어(flask)가 흔한 검색어(django)보다 점수에 크게 기여
+        results = search_index.search('django flask', pdf_file_id=pdf_file.id)
+        self.assertEqual(results[0]['name'], 'Chapter 2')
+        self.assertEqual(results[0]['found_pages'], [3])
+
+    def test_backfill_indexes_stored_pages(self):
+        indexed, _ = self.make_indexed_pdf(['검색 엔진'])
+        pdf_file, chapters = self.make_indexed_pdf(['색인 없는 검색', '두 번째 페이지'], index=False)
+        self.assertEqual(search_index.search('검색', pdf_file_id=pdf_file.id), [])
+
+        out = StringIO()
+        call_command('build_search_index', stdout=out)
+        self.assertIn('Indexed 1 PDF files', out.getvalue())
+        results = search_index.search('검색', user_id=self.user.id)
+        self.assertEqual({r['pdf_file_id'] for r in results}, {indexed.id, pdf_file.id})
+        self.assertEqual(search_index.search('페이지', pdf_file_id=pdf_file.id)[0]['id'], chapters[1].id)
+        self.assertEqual(
+            list(PageText.objects.filter(pdf_file=pdf_file).order_by('page_number').values_list('token_count', flat=True)),
+            [len(tokenize('색인 없는 검색')), len(tokenize('두 번째 페이지'))],
+        )
+
+        # 다시 실행해도 중복 색인하지 않고, 제거하면 통계가 원래대로 돌아옴
+        call_command('build_search_index', stdout=StringIO())
+        self.assertEqual(search_index.backfill_pdf(pdf_file), 0)
+        search_index.remove_pdf(pdf_file.id)
+        search_index.remove_pdf(indexed.id)
+        stats = SearchIndexStats.objects.get()
+        self.assertEqual((stats.documents, stats.total_length), (0, 0))
+        self.assertFalse(SearchTerm.objects.exclude(doc_freq=0).exists())
+
+    def test_search_view_searches_one_pdf_from_stored_text(self):
+        first, first_chapters = self.make_indexed_pdf(['검색 엔진 소개', '다른 내용'])
+        second, _ = self.make_indexed_pdf(['검색 엔진 구현'])
+        url = reverse('accountapp:search')
+        # 요청마다 PDF 를 다시 올리지 않고 저장된 페이지 텍스트로 만든 색인에서 찾음
+        response = self.client.post(url, {'keyword': '검색', 'pdf_file_id': first.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([(r['id'], r['found_pages']) for r in results], [(first_chapters[0].id, [1])])
+        results = self.client.post(url, {'keyword': '검색', 'user_id': self.user.id}, content_type='application/json').json()['results']
+        self.assertEqual({r['pdf_file_id'] for r in results}, {first.id, second.id})
+
+        self.assertEqual(self.client.post(url, {'keyword': '검색'}, content_type='application/json').status_code, 400)
+        missing = self.client.post(url, {'keyword': '검색', 'pdf_file_id': second.id + 100}, content_type='application/json')
+        self.assertEqual(missing.status_code, 404)
+
+    def test_common_terms_read_only_top_postings(self):
+        pdf_file, chapters = self.make_indexed_pdf([
+            'django', 'django django django', 'django flask', 'django django', '"django" orm django',
+        ])
+        with self.settings(SEARCH_MAX_POSTINGS_PER_TERM=2):
+            results = search_index.search('django', pdf_file_id=pdf_file.id)
+            self.assertEqual([r['name'] for r in results], ['Chapter 1', 'Chapter 3'])
+            # 다른 검색어로 후보가 된 페이지는 흔한 검색어의 posting 도 읽어서 점수를 매김
+            results = search_index.search('flask django', pdf_file_id=pdf_file.id)
+            self.assertEqual([r['name'] for r in results][:1], ['Chapter 2'])
+            with self.settings(SEARCH_MAX_POSTINGS_PER_TERM=100):
+                full = {r['id']: r['score'] for r in search_index.search('flask django', pdf_file_id=pdf_file.id)}
+            self.assertEqual(results[0]['score'], full[chapters[2].id])
+            self.assertEqual([r['name'] for r in search_index.search('"django orm"', pdf_file_id=pdf_file.id)], ['Chapter 4'])
+
+    def test_doc_freq_updates_in_term_order_with_stats_last(self):
+        pdf_file, _ = self.make_indexed_pdf(['alpha beta beta gamma', 'beta delta'])
+        with CaptureQueriesContext(connection) as queries:
+            search_index.remove_pdf(pdf_file.id)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertIn('api_searchterm', updates[0])
+        self.assertIn('api_searchindexstats', updates[1])
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'DELETE', 'INSERT'))]
+        self.assertEqual(writes[-1], updates[1])
+        self.assertFalse(SearchTerm.objects.exclude(doc_freq=0).exists())
+
+
+class SimilarityTests(TestCase):
+    def brute_force(self, queries, corpus, threshold, top_k, same):
+        queries, corpus = normalize(queries), normalize(corpus)
+        sims = queries @ corpus.T
+        if same:
+            np.fill_diagonal(sims, -np.inf)
+        edges = {}
+        for i, row in enumerate(sims):
+            candidates = np.argsort(-row)[:top_k] if top_k else np.arange(len(row))
+            for j in candidates:
+                if np.isfinite(row[j]) and (threshold is None or row[j] > threshold):
+                    # 같은 집합 안의 연결은 무방향 (source < target)
+                    edges[(min(i, j), max(i, j)) if same else (i, j)] = row[j]
+        return edges
+
+    def assert_edges(self, result, expected):
+        sources, targets, values = result
+        self.assertEqual(len(sources), len(set(zip(sources.tolist(), targets.tolist()))))
+        self.assertEqual(set(zip(sources.tolist(), targets.tolist())), set(expected))
+        for i, j, value in zip(sources.tolist(), targets.tolist(), values.tolist()):
+            self.assertAlmostEqual(value, expected[(i, j)], places=5)
+
+    def test_blocked_edges_match_brute_force(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(37, 8)).astype(np.float32)
+        corpus = rng.normal(size=(23, 8)).astype(np.float32)
+        for threshold, top_k in ((0.3, 0), (None, 3), (0.2, 5), (None, 100)):
+            for block_size in (1, 5, 64):
+                self.assert_edges(
+                    similarity_edges(vectors, threshold, top_k, block_size=block_size),
+                    self.brute_force(vectors, vectors, threshold, top_k, same=True),
+                )
+                self.assert_edges(
+                    cross_similarity_edges(vectors, corpus, threshold, top_k, block_size=block_size, corpus_block_size=block_size + 3),
+                    self.brute_force(vectors, corpus, threshold, top_k, same=False),
+                )
+
+    def test_rejects_missing_threshold_and_top_k(self):
+        vectors = np.eye(4, dtype=np.float32)
+        for edges in (similarity_edges, lambda v, **kwargs: cross_similarity_edges(v, v, **kwargs)):
+            with self.assertRaises(ValueError):
+                edges(vectors, threshold=None, top_k=0)
+        for data in ({'similarity_threshold': '', 'similarity_top_k': '0'}, {'similarity_threshold': 0.5, 'similarity_top_k': -1}):
+            with self.assertRaises(ValueError):
+                resolve_similarity_params(data)
+        self.assertEqual(resolve_similarity_params({'similarity_top_k': 3}), {'threshold': None, 'top_k': 3})
+
+
+class DedupTests(TestCase):
+    def test_reuse_requires_same_graph_options(self):
+        key = ingest_key({'threshold': 0.5, 'top_k': 3}, 'title')
+        source = PDFFile.objects.create(
+            filename='a.pdf', user=User.objects.create(username='first'), url='file:///tmp/a.pdf',
+            content_hash='f' * 64, ingest_key=key, ingested_at=timezone.now(),
+        )
+        self.assertEqual(find_ingested('f' * 64, ingest_key({'threshold': 0.5, 'top_k': 3}, 'title')), source)
+        for options in (({'threshold': 0.7, 'top_k': 3}, 'title'), ({'threshold': 0.5, 'top_k': 0}, 'title'),
+                        ({'threshold': 0.5, 'top_k': 3}, 'content')):
+            self.assertIsNone(find_ingested('f' * 64, ingest_key(*options)))
+
+    def test_record_artifact_inserts_then_updates(self):
+        first = record_artifact('a' * 64, 'pdfs/a.pdf', 'file:///tmp/a.pdf', 10)
+        second = record_artifact('a' * 64, 'pdfs/b.pdf', 'file:///tmp/b.pdf', 20)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual((second.storage_key, second.url, second.size), ('pdfs/b.pdf', 'file:///tmp/b.pdf', 20))
+        self.assertGreaterEqual(second.last_used_at, first.last_used_at)
+        self.assertEqual(DocumentArtifact.objects.count(), 1)
+
+
+# 다른 연결에서 커밋된 행과 부딪히는 경우를 보려면 테스트 트랜잭션 밖에서 실행해야 함
+class ArtifactRaceTests(TransactionTestCase):
+    def test_record_artifact_when_another_job_inserts_first(self):
+        create = DocumentArtifact.objects.create
+
+        # UPDATE 로 행을 찾지 못한 뒤 INSERT 전에 다른 작업(다른 DB 연결)이 같은 hash 를 먼저 기록
+        def create_after_other_job(**fields):
+            def other_job():
+                try:
+                    create(content_hash=fields['content_hash'], storage_key='other', url='file:///other', size=1)
+                finally:
+                    connection.close()
+
+            thread = threading.Thread(target=other_job)
+            thread.start()
+            thread.join()
+            return create(**fields)
+
+        with mock.patch.object(DocumentArtifact.objects, 'create', side_effect=create_after_other_job) as patched:
+            artifact = record_artifact('c' * 64, 'pdfs/c.pdf', 'file:///tmp/c.pdf', 30)
+        patched.assert_called_once()
+        self.assertEqual(DocumentArtifact.objects.count(), 1)
+        self.assertEqual((artifact.storage_key, artifact.url, artifact.size), ('pdfs/c.pdf', 'file:///tmp/c.pdf', 30))
+
+
+class BatchEncodingTests(TestCase):
+    def test_documents_encoded_together_match_single_documents(self):
+        toc = [[1, 'graph theory', 1], [2, 'trees', 2], [1, 'memory', 4]]
+        documents = [
+            (build_chapters(toc, None, 5), {page: f'page {page} text ' * (page * 40) for page in range(1, 6)}),
+            ([], {}),
+            (build_chapters(toc[:2], None, 3), {1: 'short', 2: 'tokens'}),
+        ]
+        for source in ('title', 'content'):
+            calls = []
+            batched = encode_documents(documents, lambda texts: calls.append(len(texts)) or hash_encode(texts), source)
+            self.assertEqual(len(calls), 1)
+            self.assertIsNone(batched[1])
+            for (chapters, page_texts), vectors in zip(documents, batched):
+                if chapters:
+                    np.testing.assert_allclose(vectors, encode_chapters(chapters, hash_encode, page_texts, source), rtol=1e-5)
+
+
+    def test_content_chunks_fit_the_model(self):
+        class Model:
+            tokenizer = CharTokenizer()
+            max_seq_length = 34
+
+        chapter = build_chapters([[1, '그래프 이론', 1]], None, 2)[0]
+        page_texts = {1: '그래프탐색알고리즘 ' * 64, 2: '최단경로문제 ' * 64}
+        for model in (Model(), None):
+            chunks = chapter_chunks(chapter, page_texts, max_tokens=128, max_chunks=1000, model=model)
+            self.assertTrue(chunks[0].startswith('그래프 이론'))
+            # 특수 토큰 2개를 뺀 32 토큰 (모델이 없으면 128 토큰 추정) 안에 들어감
+            limit = 32 if model else 128
+            self.assertTrue(all(len(chunk.replace(' ', '').replace('\n', '')) <= limit for chunk in chunks))
+            self.assertEqual(''.join(''.join(chunks).split()), ''.join(f"그래프 이론\n{page_texts[1]}\n{page_texts[2]}".split()))
+
+
+class EmbeddingCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), ord(text[0]), 1.0] for text in texts], dtype=np.float32)
+
+    def test_memory_then_disk_lookup(self):
+        cache = EmbeddingCache('test/model', memory_items=10, disk_dir=self.tmp, disk_items=10)
+        first = cache.encode(['alpha', 'beta', 'alpha'], self.encode)
+        self.assertEqual(self.calls, [['alpha', 'beta']])
+        np.testing.assert_array_equal(first[0], first[2])
+        cache.encode(['beta'], self.encode)
+        self.assertEqual((cache.memory_hits, cache.disk_hits, cache.misses), (1, 0, 2))
+
+        # 새 프로세스처럼 메모리가 비어 있으면 디스크에서 읽고 메모리에 올림
+        reopened = EmbeddingCache('test/model', memory_items=10, disk_dir=self.tmp, disk_items=10)
+        np.testing.assert_array_equal(reopened.encode(['alpha', 'beta'], self.encode), first[:2])
+        reopened.encode(['alpha'], self.encode)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(reopened.stats()['disk_hits'], 2)
+        self.assertEqual(reopened.stats()['memory_hits'], 1)
+        self.assertEqual(reopened.stats()['hit_rate'], 1.0)
+
+    def test_disk_rows_are_reused_after_eviction(self):
+        cache = EmbeddingCache('test/model', memory_items=1, disk_dir=self.tmp, disk_items=2)
+        cache.encode(['a'], self.encode)
+        cache.encode(['bb'], self.encode)
+        cache.encode(['a'], self.encode)  # 디스크에서 읽어 last_used 갱신
+        cache.encode(['ccc'], self.encode)  # 가장 오래 쓰이지 않은 bb 의 row 를 재사용
+        self.assertEqual(cache.disk.vectors.shape[0], 2)
+        self.assertEqual(cache.stats()['disk_items'], 2)
+        self.assertEqual(cache.stats()['disk_evictions'], 1)
+        self.assertGreaterEqual(cache.stats()['memory_evictions'], 3)
+
+        reopened = EmbeddingCache('test/model', memory_items=10, disk_dir=self.tmp, disk_items=2)
+        self.calls = []
+        vectors = reopened.encode(['a', 'ccc', 'bb'], self.encode)
+        self.assertEqual(self.calls, [['bb']])
+        np.testing.assert_array_equal(vectors, self.encode(['a', 'ccc', 'bb']))
+
+    def test_disk_row_being_overwritten_is_a_miss(self):
+        writer = DiskStore(self.tmp, max_items=2)
+        reader = DiskStore(self.tmp, max_items=2)  # 다른 프로세스처럼 따로 연 저장소
+        self.assertIsNone(reader.vectors)
+        writer.put_many({'a' * 32: np.ones(3, dtype=np.float32), 'b' * 32: np.zeros(3, dtype=np.float32)})
+        self.assertEqual(set(reader.get_many(['a' * 32, 'b' * 32])), {'a' * 32, 'b' * 32})
+
+        # 색인은 아직 'a' 를 가리키지만 다른 프로세스가 그 row 를 덮어쓰는 중이거나 이미 다른 key 를 쓴 상태
+        row = writer._db.execute('SELECT row FROM entries WHERE key = ?', ('a' * 32,)).fetchone()[0]
+        writer.keys[row] = b''
+        self.assertEqual(list(reader.get_many(['a' * 32, 'b' * 32])), ['b' * 32])
+        writer.keys[row] = ('c' * 32).encode()
+        self.assertEqual(reader.get_many(['a' * 32]), {})
+
+    def test_disk_store_without_keys_file_starts_empty(self):
+        # key 열이 없던 이전 형식의 저장소는 검증할 수 없으므로 비우고 다시 만듦
+        old = DiskStore(self.tmp, max_items=2)
+        old.put_many({'a' * 32: np.ones(3, dtype=np.float32)})
+        os.remove(os.path.join(self.tmp, 'keys.npy'))
+        store = DiskStore(self.tmp, max_items=2)
+        self.assertEqual(store.get_many(['a' * 32]), {})
+        store.put_many({'b' * 32: np.full(3, 2, dtype=np.float32)})
+        self.assertEqual(len(store), 1)
+        np.testing.assert_array_equal(store.get_many(['b' * 32])['b' * 32], np.full(3, 2))
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['index.sqlite3', 'keys.npy', 'vectors.npy'])
+
+    def test_memory_lru_evicts_least_recently_used(self):
+        lru = MemoryLRU(2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        lru.get('a')
+        lru.put('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c'), len(lru), lru.evictions), (1, 3, 2, 1))
+
+    def test_counters_are_exact_under_threads(self):
+        cache = EmbeddingCache('test/model', memory_items=100, disk_dir='')
+        texts = [f'text {i}' for i in range(20)]
+        cache.encode(texts, self.encode)
+
+        def lookup():
+            for _ in range(200):
+                cache.encode(texts, self.encode)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.stats()['memory_hits'], 8 * 200 * len(texts))
+        self.assertEqual(cache.stats()['misses'], len(texts))
+
+
+class CrossLinkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='librarian')
+
+    def make_library_pdf(self, user, vectors):
+        pdf_file = PDFFile.objects.create(filename='book.pdf', user=user, url='file:///tmp/book.pdf')
+        vectors = np.asarray(vectors, dtype=np.float32)
+        chapters = build_chapters([[1, f'Chapter {i}', i + 1] for i in range(len(vectors))], pdf_file, len(vectors))
+        write_chapter_graph(chapters, vectors, {'threshold': 0.99, 'top_k': 0})
+        save_chapter_embeddings(chapters, vectors)
+        return pdf_file, chapters
+
+    def test_new_pdf_links_to_other_pdfs_of_the_same_user(self):
+        old_pdf, old_chapters = self.make_library_pdf(self.user, [[1, 0, 0], [0, 1, 0]])
+        self.make_library_pdf(User.objects.create(username='stranger'), [[1, 0, 0], [0, 1, 0]])
+        new_pdf, new_chapters = self.make_library_pdf(self.user, [[1, 0.1, 0], [0, 0, 1]])
+        vectors = [[1, 0.1, 0], [0, 0, 1]]
+
+        self.assertEqual(link_pdf(new_pdf, new_chapters, vectors, threshold=0.9, top_k=2), 1)
+        link = CrossConnection.objects.get()
+        self.assertEqual((link.source_id, link.target_id), (new_chapters[0].id, old_chapters[0].id))
+        self.assertEqual(link.target_pdf_file_id, old_pdf.id)
+        # 다시 실행하면 새로 쓰는 연결이 없음
+        self.assertEqual(link_pdf(new_pdf, new_chapters, threshold=0.9, top_k=2), 0)
+
+        links = self.client.get(reverse('accountapp:pdf-links', args=[old_pdf.id])).json()['links']
+        self.assertEqual([(l['chapter_id'], l['other_pdf_file_id']) for l in links], [(old_chapters[0].id, new_pdf.id)])
+
+
+class SemanticIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='searcher')
+        self.rng = np.random.default_rng(7)
+        # 군집이 있는 벡터 (실제 임베딩처럼 주제별로 모여 있음)
+        self.centers = normalize(self.rng.normal(size=(12, 16)).astype(np.float32))
+
+    def clustered(self, n):
+        points = self.centers[self.rng.integers(len(self.centers), size=n)]
+        return normalize(points + 0.2 * self.rng.normal(size=points.shape).astype(np.float32))
+
+    def make_pdf(self, vectors):
+        pdf_file = PDFFile.objects.create(filename='book.pdf', user=self.user, url='file:///tmp/book.pdf')
+        chapters = build_chapters([[1, f'Chapter {i}', i + 1] for i in range(len(vectors))], pdf_file, len(vectors))
+        BulkWriter().save_chapters(chapters)
+        save_chapter_embeddings(chapters, vectors)
+        return pdf_file, chapters
+
+    def brute_force(self, ids, vectors, query, top_k):
+        scores = vectors @ normalize(query)[0]
+        return [int(ids[i]) for i in np.argsort(-scores, kind='stable')[:top_k]]
+
+    def test_ivf_candidates_find_brute_force_neighbours(self):
+        vectors = self.clustered(2000)
+        ivf = IVFIndex(vectors, n_lists=int(np.sqrt(len(vectors))))
+        self.assertEqual(sorted(np.concatenate(ivf.lists).tolist()), list(range(len(vectors))))
+        # 모든 리스트를 보면 전체 탐색과 같음
+        self.assertEqual(len(ivf.candidates(vectors[0], len(ivf.lists))), len(vectors))
+
+        ids = np.arange(len(vectors))
+        found = total = 0
+        for query in self.clustered(50):
+            candidates = ivf.candidates(query, 8)
+            expected = self.brute_force(ids, vectors, query[None], 10)
+            found += len(set(expected) & set(candidates.tolist()))
+            total += len(expected)
+        self.assertGreaterEqual(found / total, 0.9)
+
+    def test_search_matches_brute_force_top_k(self):
+        first_pdf, first = self.make_pdf(self.clustered(150))
+        second_pdf, second = self.make_pdf(self.clustered(150))
+        index = ChapterVectorIndex()
+        ids, _, vectors = index.user_vectors(self.user.id)
+        self.assertEqual(ids.tolist(), [chapter.id for chapter in first + second])
+
+        queries = self.clustered(5)
+        for query in queries:
+            self.assertEqual(
+                [chapter_id for chapter_id, _ in index.search(query[None], top_k=5)],
+                self.brute_force(ids, vectors, query[None], 5),
+            )
+            rows = np.flatnonzero(np.isin(ids, [chapter.id for chapter in second]))
+            self.assertEqual(
+                [chapter_id for chapter_id, _ in index.search(query[None], top_k=5, pdf_file_id=second_pdf.id)],
+                self.brute_force(ids[rows], vectors[rows], query[None], 5),
+            )
+
+        # IVF 경로에서 모든 리스트를 탐색하면 정확 검색과 같은 결과
+        with self.settings(SEMANTIC_IVF_MIN_SIZE=100, SEMANTIC_EXACT_LIMIT=0, SEMANTIC_IVF_PROBES=1000):
+            index = ChapterVectorIndex()
+            index.refresh()
+            self.assertIsNotNone(index.ivf)
+            for query in queries:
+                self.assertEqual(
+                    [chapter_id for chapter_id, _ in index.search(query[None], top_k=5, user_id=self.user.id)],
+                    self.brute_force(ids, vectors, query[None], 5),
+                )
+
+    def test_refresh_checks_the_table_only_after_writes(self):
+        first_pdf, _ = self.make_pdf(self.clustered(3))
+        index = ChapterVectorIndex()
+        index.refresh()
+        self.assertEqual(len(index.chapter_ids), 3)
+        with self.assertNumQueries(1):
+            index.refresh()
+
+        _, added = self.make_pdf(self.clustered(2))
+        index.refresh()
+        self.assertEqual(index.chapter_ids[-2:].tolist(), [chapter.id for chapter in added])
+        first_pdf.delete()
+        index.refresh()
+        self.assertEqual(index.chapter_ids.tolist(), [chapter.id for chapter in added])
+
+
+class PageImageTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        # 미리 렌더링은 요청 안에서 바로 실행 (테스트가 끝난 뒤 백그라운드 스레드가 남지 않도록)
+        self.settings_override = override_settings(
+            PDF_STORAGE_BACKEND='local', PDF_LOCAL_STORAGE_DIR=os.path.join(self.tmp, 'storage'),
+            PAGE_CACHE_DIR=os.path.join(self.tmp, 'pages'), EXTRACTION_WORKERS=1, PAGE_PREFETCH_PAGES=2,
+            PAGE_PREFETCH_ASYNC=False,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        path = os.path.join(self.tmp, 'book.pdf')
+        doc = fitz.open()
+        for i in range(6):
+            doc.new_page(width=400, height=600).insert_text((72, 72), f'Page {i + 1}')
+        doc.save(path)
+        content_hash = file_sha256(path)
+        url, _ = store_original(path, 'book.pdf', content_hash)
+        self.pdf_file = PDFFile.objects.create(
+            filename='book.pdf', user=User.objects.create(username='viewer'), url=url, content_hash=content_hash
+        )
+        chapters = build_chapters([[1, 'One', 1], [1, 'Two', 4]], self.pdf_file, 6)
+        write_chapter_graph(chapters, np.ones((2, 4), dtype=np.float32), {'threshold': 0.5, 'top_k': 0})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_render_cache_and_prefetch(self):
+        url = reverse('accountapp:pdf-page', args=[self.pdf_file.id, 2])
+        response = self.client.get(url, {'dpi': 72})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(fitz.Pixmap(response.content).width, 400)
+
+        self.assertEqual(self.client.get(url, {'dpi': 72})['X-Cache'], 'hit')
+        self.assertEqual(self.client.get(url, {'dpi': 72}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # 같은 챕터(1~3쪽) 안의 앞뒤 페이지만 미리 렌더링됨
+        cache = rendering.image_cache()
+        self.assertTrue(all(cache.contains(rendering.image_key(self.pdf_file, page, 72)) for page in (1, 3)))
+        self.assertFalse(cache.contains(rendering.image_key(self.pdf_file, 4, 72)))
+
+        thumbnail = self.client.get(reverse('accountapp:pdf-page-thumbnail', args=[self.pdf_file.id, 1]))
+        self.assertEqual(fitz.Pixmap(thumbnail.content).width, 200)
+        self.assertEqual(self.client.get(reverse('accountapp:pdf-page', args=[self.pdf_file.id, 7])).status_code, 404)
+
+    def test_render_pdf_without_artifact(self):
+        # 중복 제거 이전에 올라온 PDF: content_hash 와 DocumentArtifact 없이 url 만 있음
+        storage = get_storage()
+        legacy = PDFFile.objects.create(
+            filename='legacy.pdf', user=self.pdf_file.user,
+            url=storage.upload(os.path.join(self.tmp, 'book.pdf'), 'legacy.pdf'),
+        )
+        response = self.client.get(reverse('accountapp:pdf-page', args=[legacy.id, 1]), {'dpi': 72})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fitz.Pixmap(response.content).width, 400)
+
+    def test_renderer_keeps_settings_of_the_request(self):
+        # 백그라운드 prefetch 가 실행될 때는 설정이 바뀌어 있을 수 있음
+        renderer = rendering.PageRenderer()
+        source_key, storage_key = rendering._source_location(self.pdf_file)
+        key = rendering.image_key(self.pdf_file, 5, 72)
+        with override_settings(PDF_STORAGE_BACKEND='s3', PAGE_CACHE_DIR=os.path.join(self.tmp, 'other')):
+            data = renderer.render_to_cache(key, source_key, storage_key, 5, 72)
+        self.assertEqual(fitz.Pixmap(data).width, 400)
+        self.assertTrue(rendering.image_cache().contains(key))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'other')))
+
+    def test_disk_lru_evicts_least_recently_used(self):
+        cache = rendering.DiskLRU(os.path.join(self.tmp, 'lru'), max_bytes=25)
+        cache.put('a', b'x' * 10)
+        cache.put('b', b'x' * 10)
+        cache.lookup('a')
+        cache.put('c', b'x' * 10)
+        self.assertEqual([cache.contains(key) for key in 'abc'], [True, False, True])
+        self.assertEqual(cache.stats()['bytes'], 20)
+
+
+class ModelRegistryTests(TestCase):
+    class FakeEncoder:
+        def encode(self, texts, batch_size=None):
+            return hash_encode(texts)
+
+    def test_model_is_loaded_once_and_shared(self):
+        models = ModelRegistry()
+        barrier = threading.Barrier(8)
+        loaded = []
+
+        def load(*args):
+            loaded.append(args)
+            return self.FakeEncoder()
+
+        def get():
+            barrier.wait()
+            results.append(models.get())
+
+        results = []
+        with mock.patch('api.embeddings.load_encoder', side_effect=load):
+            threads = [threading.Thread(target=get) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(len({id(model) for model in results}), 1)
+            self.assertTrue(models.is_loaded())
+            # 다른 device 는 따로 로드
+            self.assertIsNot(models.get(device='cuda'), results[0])
+        self.assertEqual(len(loaded), 2)
+
+        stats = models.stats()
+        self.assertEqual([model['device'] for model in stats['models']], ['cpu', 'cuda'])
+        self.assertEqual(stats['models'][0]['model_name'], settings.EMBEDDING_MODEL_NAME)
+        self.assertGreaterEqual(stats['models'][0]['load_seconds'], 0)
+        self.assertIn('rss_delta_bytes', stats['models'][0])
+
+    @override_settings(EMBEDDING_CACHE_ENABLED=False)
+    def test_substitute_skips_model_loading(self):
+        models = ModelRegistry()
+        with mock.patch('api.embeddings.load_encoder') as load:
+            chunker = object()
+            with models.substitute(hash_encode, chunker=chunker):
+                np.testing.assert_array_equal(models.encode(['a', 'b']), hash_encode(['a', 'b']))
+                self.assertIs(models.chunking_model(), chunker)
+            load.assert_not_called()
+            load.return_value = self.FakeEncoder()
+            np.testing.assert_array_equal(models.encode(['a']), hash_encode(['a']))
+            load.assert_called_once()
+
+    def test_status_endpoint(self):
+        response = self.client.get(reverse('accountapp:model-status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'models', 'caches', 'rss_bytes'})
+
+
+class EncoderBackendTests(TestCase):
+    def test_agreement_report(self):
+        rng = np.random.default_rng(0)
+        reference = rng.normal(size=(50, 16)).astype(np.float32)
+        same = agreement(reference, reference * 3)
+        self.assertAlmostEqual(same['cosine_min'], 1.0, places=5)
+        self.assertEqual(same['nearest_neighbor_agreement'], 1.0)
+        noisy = agreement(reference, reference + rng.normal(scale=0.5, size=reference.shape))
+        self.assertLess(noisy['cosine_mean'], 1.0)
+        self.assertLess(noisy['top10_overlap'], 1.0)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            load_encoder('all-MiniLM-L6-v2', backend='tensorrt')
@@ -0,0 +1,122 @@
+import logging
+import re
+import time
+from collections import Counter
+
+import pymupdf as fitz  # PyMuPDF
+from django.conf import settings
+
+from .extraction import get_executor, open_pdf
+
+logger = logging.getLogger(__name__)
+
+# 이미지 데이터는 읽지 않음 (페이지당 비용을 글자 수에 비례하도록 제한)
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+BOLD_FLAG = 16
+PAGE_NUMBER_RE = re.compile(r'^[\divxlcIVXLC\s.\-–]+$')
+
+
+# 프로세스 풀 워커: [start, stop) 페이지의 글자 크기별 글자 수와, 페이지 위쪽 max_lines 줄의 (페이지, 줄 번호, 크기, 굵기, 텍스트) 를 수집
+# 글자 크기 분포는 모든 줄에서 모으므로 max_lines 는 비용이 아니라 제목 후보로 볼 줄의 범위만 정함
+def scan_range(path, start, stop, max_lines):
+    sizes = Counter()
+    candidates = []
+    with open_pdf(path) as pdf_document:
+        for page_num in range(start, stop):
+            lines = 0
+            blocks = pdf_document.load_page(page_num).get_text('dict', flags=TEXT_FLAGS)['blocks']
+            for block in blocks:
+                for line in block.get('lines', []):
+                    spans = [span for span in line['spans'] if span['text'].strip()]
+                    if not spans:
+                        continue
+                    for span in spans:
+                        sizes[round(span['size'], 1)] += len(span['text'])
+                    if lines < max_lines:
+                        size = round(max(span['size'] for span in spans), 1)
+                        bold = all(span['flags'] & BOLD_FLAG or 'bold' in span['font'].lower() for span in spans)
+                        text = ' '.join(span['text'].strip() for span in spans)
+                        candidates.append((page_num + 1, lines, size, bold, text))
+                        lines += 1
+    return sizes, candidates
+
+
+def _scan(path, total_pages, max_lines):
+    ranges = [
+        (start, min(start + settings.EXTRACTION_CHUNK_PAGES, total_pages))
+        for start in range(0, total_pages, settings.EXTRACTION_CHUNK_PAGES)
+    ]
+    if settings.EXTRACTION_WORKERS == 1 or total_pages < settings.EXTRACTION_PARALLEL_MIN_PAGES:
+        results = [scan_range(path, start, stop, max_lines) for start, stop in ranges]
+    else:
+        executor = get_executor()
+        results = executor.map(
+            scan_range, [path] * len(ranges), *zip(*ranges), [max_lines] * len(ranges)
+        )
+    sizes = Counter()
+    candidates = []
+    for range_sizes, range_candidates in results:
+        sizes.update(range_sizes)
+        candidates += range_candidates
+    return sizes, candidates
+
+
+# 목차(outline)가 없는 PDF 에서 글자 크기와 굵기로 [level, title, page] 목록을 추정 (get_toc() 와 같은 형식)
+# 본문 크기보다 큰 글자는 크기 순서대로 레벨을 매기고, 본문 크기의 굵은 줄은 가장 낮은 레벨로 취급
+def infer_toc(path, total_pages, max_levels=None, max_lines=None):
+    max_levels = max_levels or settings.TOC_HEURISTIC_MAX_LEVELS
+    max_lines = max_lines or settings.TOC_HEURISTIC_MAX_LINES
+    started = time.perf_counter()
+    sizes, candidates = _scan(path, total_pages, max_lines)
+    toc = toc_from_scan(sizes, candidates, total_pages, max_levels)
+    if sizes:
+        logger.info(
+            f"Inferred {len(toc)} TOC entries from {total_pages} pages in {time.perf_counter() - started:.3f}s "
+            f"(body size {sizes.most_common(1)[0][0]})"
+        )
+    return toc
+
+
+# scan_range 결과(글자 크기 분포, 제목 후보)로 목차를 만듦. DB/설정을 쓰지 않으므로 프로세스 풀 워커에서도 호출 가능
+def toc_from_scan(sizes, candidates, total_pages, max_levels):
+    if not sizes:
+        return []
+    body_size = sizes.most_common(1)[0][0]
+
+    # 페이지 번호, 너무 짧거나 긴 줄, 여러 페이지에 반복되는 머리글/바닥글은 제외
+    repeated = Counter(text for _, _, _, _, text in candidates)
+    headings = [
+        (page, line, size, bold, text)
+        for page, line, size, bold, text in candidates
+        if 2 < len(text) <= 120
+        and not PAGE_NUMBER_RE.match(text)
+        and repeated[text] <= max(2, total_pages // 20)
+        and (size >= body_size * 1.15 or (bold and size >= body_size))
+    ]
+
+    heading_sizes = sorted({size for _, _, size, _, _ in headings if size >= body_size * 1.15}, reverse=True)[:max_levels]
+    levels = {size: level for level, size in enumerate(heading_sizes, start=1)}
+    bold_level = len(heading_sizes) + 1 if len(heading_sizes) < max_levels else None
+
+    toc = []
+    previous = None  # 마지막으로 추가한 제목 줄의 (페이지, 줄 번호)
+    for page, line, size, bold, text in headings:
+        level = levels.get(size)
+        if level is None and bold and size < body_size * 1.15:
+            level = bold_level
+        if level is None:
+            continue
+        if toc and toc[-1][0] == level and previous == (page, line - 1):
+            # 바로 다음 줄로 이어진 같은 레벨의 제목은 여러 줄로 나뉜 제목이므로 하나로 합침
+            # (사이에 본문이 있으면 같은 페이지라도 별개의 제목)
+            toc[-1][1] = f"{toc[-1][1]} {text}"
+        else:
+            toc.append([level, text, page])
+        previous = (page, line)
+
+    # 첫 항목이 최상위 레벨이 되도록 레벨을 당김
+    if toc:
+        shift = min(level for level, _, _ in toc) - 1
+        for entry in toc:
+            entry[0] -= shift
+    return toc
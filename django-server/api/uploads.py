@@ -0,0 +1,88 @@
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .chapter_embeddings import EMBEDDING_SOURCES
+from .jobs import pool
+from .models import IngestionJob
+from .pipeline import run_job, spool_upload
+from .similarity import resolve_similarity_params
+
+logger = logging.getLogger(__name__)
+
+
+# 업로드 요청이 잘못되었을 때 (응답 상태 코드와 함께)
+class UploadRejected(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+# PDF 업로드 요청을 검증하고 스풀에 저장한 뒤 ingestion 작업을 등록 (RecommendView / AsyncRecommendView 공통)
+# hasher 는 요청의 업로드 핸들러로 등록한 SHA256UploadHandler (files 를 읽은 뒤에 hash 가 채워짐)
+def create_upload_job(data, files, hasher):
+    # 파일 및 유저 ID 정보 확인
+    if 'file' not in files or 'user_id' not in data:
+        logger.error("File or user_id not found in request")
+        raise UploadRejected("File and user ID must be provided.", 400)
+
+    file = files['file']
+    user_id = data['user_id']
+
+    # 유저 확인
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        logger.error(f"User with ID {user_id} does not exist.")
+        raise UploadRejected("User not found.", 404)
+
+    # 유사도 연결 조건 (threshold / top-k) 확인
+    try:
+        similarity_params = resolve_similarity_params(data)
+    except ValueError as e:
+        raise UploadRejected(str(e), 400)
+
+    # 챕터 임베딩에 쓸 텍스트 (제목 / 본문)
+    embedding_source = data.get('embedding_source') or settings.CHAPTER_EMBEDDING_SOURCE
+    if embedding_source not in EMBEDDING_SOURCES:
+        raise UploadRejected(f"embedding_source must be one of {', '.join(EMBEDDING_SOURCES)}.", 400)
+
+    # 업로드 파일을 스풀에 저장하고 작업 등록
+    file_path, bytes_copied = spool_upload(file, uuid.uuid4().hex)
+    job = IngestionJob.objects.create(
+        user=user,
+        file_name=file.name,
+        file_path=file_path,
+        options={
+            'similarity': similarity_params,
+            'embedding_source': embedding_source,
+            'content_hash': hasher.hashes.get('file', ''),
+        },
+        result={'upload_bytes': file.size, 'bytes_copied': bytes_copied},
+    )
+    logger.info(f"Ingestion job {job.id} queued for {file.name} ({bytes_copied} of {file.size} bytes copied)")
+    return job
+
+
+# 등록한 작업을 동기 모드면 바로 처리하고, 아니면 워커에 넘김. (응답 본문, 상태 코드) 를 반환
+def dispatch_job(job):
+    if not settings.INGESTION_ASYNC:
+        # 동기 모드: 요청 안에서 바로 처리하고 기존 응답 형식으로 반환
+        IngestionJob.objects.filter(pk=job.pk).update(status=IngestionJob.RUNNING, started_at=timezone.now())
+        job = run_job(job)
+        if job.status == IngestionJob.FAILED:
+            return {"error": job.error}, 500
+        return {"message": "PDF and connections have been saved.", "pdf_file_id": job.result['pdf_file_id'], "first_chapter_id": job.result['first_chapter_id']}, 200
+
+    if settings.INGESTION_AUTOSTART_WORKERS:
+        pool.start()
+    transaction.on_commit(pool.notify)
+    return {
+        "message": "PDF has been queued for processing.",
+        "job_id": job.id,
+        "status_url": reverse('accountapp:recommend-status', args=[job.id]),
+    }, 202
@@ -1,9 +1,26 @@
 from django.urls import path
-from api.views import RecommendView, SearchView
+from api.async_views import AsyncRecommendView, AsyncSearchView, AsyncSemanticSearchView
+from api.views import RecommendView, RecommendStatusView, CacheStatsView, MetricsView, StorageStatsView, PageImageView, PdfGraphView, PdfLinksView, SearchView, SemanticSearchView, EmbeddingModelStatusView, SessionListView, SessionMessagesView
 
 app_name = "accountapp"
 
 urlpatterns = [
     path("recommend/", RecommendView.as_view(), name="recommend"),
+    path("recommend/<int:job_id>/", RecommendStatusView.as_view(), name="recommend-status"),
     path('search/', SearchView.as_view(), name='search'),
+    path('semantic-search/', SemanticSearchView.as_view(), name='semantic-search'),
+    path('pdf/<int:pdf_file_id>/graph/', PdfGraphView.as_view(), name='pdf-graph'),
+    path('pdf/<int:pdf_file_id>/links/', PdfLinksView.as_view(), name='pdf-links'),
+    path('pdf/<int:pdf_file_id>/page/<int:page_number>.png', PageImageView.as_view(), name='pdf-page'),
+    path('pdf/<int:pdf_file_id>/page/<int:page_number>/thumbnail.png', PageImageView.as_view(thumbnail=True), name='pdf-page-thumbnail'),
+    # ASGI 서버(uvicorn)에서 이벤트 루프를 막지 않는 비동기 버전
+    path("async/recommend/", AsyncRecommendView.as_view(), name="async-recommend"),
+    path('async/search/', AsyncSearchView.as_view(), name='async-search'),
+    path('async/semantic-search/', AsyncSemanticSearchView.as_view(), name='async-semantic-search'),
+    path('sessions/', SessionListView.as_view(), name='sessions'),
+    path('sessions/<int:session_id>/messages/', SessionMessagesView.as_view(), name='session-messages'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('storage/stats/', StorageStatsView.as_view(), name='storage-stats'),
+    path('models/status/', EmbeddingModelStatusView.as_view(), name='model-status'),
 ]
\ No newline at end of file
@@ -1,222 +1,313 @@
-import pymupdf as fitz  # PyMuPDF
+import gzip
 import logging
-import boto3
-from io import BytesIO
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
-import numpy as np
-from .models import PDFFile, PageConnection, Chapter
+from .models import PDFFile, Chapter, IngestionJob, Session, Message
+from . import chat, graph_export, rendering, search_index
+from .semantic import semantic_search
+from .cross_links import pdf_links
+from .dedup import SHA256UploadHandler, cache_stats
+from .embeddings import current_rss_bytes, registry
+from .metrics import registry as metrics_registry
+from .parsing import PageNotFound
+from .storage import metrics as storage_metrics
+from .uploads import UploadRejected, create_upload_job, dispatch_job
 from django.conf import settings
+from django.db.models import Count
+from django.views import View
 from django.contrib.auth.models import User  # 장고에서 기본으로 제공하는 user db model
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
-from rest_framework.parsers import MultiPartParser, FormParser
-import logging
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
 logger = logging.getLogger(__name__)
 
-# pdf를 받아 s3에 저장, 챕터정보 추출하여 db에 저장, 챕터정보를 바탕으로 연결 정보 생성하여 db에 저장
+# pdf를 받아 ingestion 작업으로 등록 (s3 저장, 챕터정보 추출/저장, 연결 정보 생성은 워커가 수행)
 class RecommendView(APIView):
     def post(self, request):
+        # 업로드를 받는 동안 SHA-256 계산 (request.FILES 를 읽기 전에 등록해야 함)
+        hasher = SHA256UploadHandler(request)
+        request.upload_handlers.insert(0, hasher)
         try:
-            # 파일 및 유저 ID 정보 확인
-            if 'file' not in request.FILES or 'user_id' not in request.data:
-                logger.error("File or user_id not found in request")
-                return Response({"error": "File and user ID must be provided."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                job = create_upload_job(request.data, request.FILES, hasher)
+            except UploadRejected as e:
+                return Response({"error": str(e)}, status=e.status)
+            body, status_code = dispatch_job(job)
+            return Response(body, status=status_code)
+        except Exception as e:
+            logger.error(f"Error occurred: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ingestion 작업 진행 상황 (단계별 진행률, 소요 시간)
+class RecommendStatusView(APIView):
+    def get(self, request, job_id):
+        job = get_object_or_404(IngestionJob, pk=job_id)
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": job.progress,
+            "timings": job.timings,
+            "pdf_file_id": job.pdf_file_id,
+            "first_chapter_id": job.result.get('first_chapter_id'),
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }, status=status.HTTP_200_OK)
+
 
-            file = request.FILES['file']
-            user_id = request.data['user_id']
+# 챕터 그래프 (미리 만들어 둔 columnar JSON / MessagePack, ETag 로 변경 없으면 304)
+# DRF 의 Accept/format 협상을 거치지 않도록 Django View 사용
+class PdfGraphView(View):
+    def get(self, request, pdf_file_id):
+        get_object_or_404(PDFFile, pk=pdf_file_id)
+        fmt = 'msgpack' if 'msgpack' in request.headers.get('Accept', '') else 'json'
+        version = graph_export.graph_version(pdf_file_id)
+        etag = graph_export.graph_etag(pdf_file_id, version, fmt)
 
-            # 유저 확인
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            snapshot = graph_export.get_snapshot(pdf_file_id, version)
+            body = bytes(snapshot.msgpack_gzip if fmt == 'msgpack' else snapshot.json_gzip)
+            content_type = 'application/msgpack' if fmt == 'msgpack' else 'application/json'
+            if 'gzip' in request.headers.get('Accept-Encoding', ''):
+                response = HttpResponse(body, content_type=content_type)
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(gzip.decompress(body), content_type=content_type)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Vary'] = 'Accept, Accept-Encoding'
+        return response
+
+
+# PDF 페이지 PNG (?dpi=, 썸네일은 PAGE_THUMBNAIL_WIDTH 폭). 같은 id/페이지의 이미지는 바뀌지 않으므로 오래 캐시하도록 함
+class PageImageView(View):
+    thumbnail = False
+
+    def get(self, request, pdf_file_id, page_number):
+        pdf_file = get_object_or_404(PDFFile, pk=pdf_file_id)
+        dpi = None
+        if not self.thumbnail:
             try:
-                user = User.objects.get(pk=user_id)
-            except User.DoesNotExist:
-                logger.error(f"User with ID {user_id} does not exist.")
-                return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-
-            file_name = file.name
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
-            )
+                dpi = int(request.GET.get('dpi', settings.PAGE_RENDER_DPI))
+            except ValueError:
+                return JsonResponse({"error": "dpi must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+            dpi = min(max(dpi, settings.PAGE_RENDER_MIN_DPI), settings.PAGE_RENDER_MAX_DPI)
+        etag = '"{}"'.format(rendering.image_key(pdf_file, page_number, dpi, self.thumbnail).replace('/', '-'))
 
-            # S3에 파일 업로드
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
             try:
-                s3_client.upload_fileobj(file, settings.AWS_STORAGE_BUCKET_NAME, file_name)
-                file_url = f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{file_name}"
-                logger.info(f"File {file_name} uploaded to S3 at {file_url}")
+                data, cache_hit = rendering.page_image(pdf_file, page_number, dpi, self.thumbnail)
+            except (PageNotFound, FileNotFoundError) as e:
+                return JsonResponse({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
             except Exception as e:
-                logger.error(f"Failed to upload file to S3: {e}")
-                return Response({"error": "Failed to upload file to S3."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # PDFFile 객체 생성
-            pdf_file = PDFFile.objects.create(filename=file_name, user=user, url=file_url)
-            logger.info(f"PDFFile object created with id {pdf_file.id}")
-
-            # PDF 파일에서 페이지 텍스트를 추출하여 총 페이지 수 확인
-            file_obj = s3_client.get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=file_name)
-            file_content = file_obj['Body'].read()
-            file_io = BytesIO(file_content)
-            file_io.seek(0)
-
-            pdf_document = fitz.open(stream=file_io, filetype="pdf")
-            pages_text = [pdf_document.load_page(page_num).get_text() for page_num in range(len(pdf_document))]
-            logger.info(f"Extracted text from {len(pages_text)} pages")
-
-            # 챕터 추출 함수 정의
-            def save_chapters_from_toc(toc, pdf_file, total_pages):
-                chapters = []
-                current_group = 1  # 현재 그룹 번호
-                first_chapter_id = None  # 첫 번째 챕터의 ID를 저장할 변수
-                for i in range(len(toc)):
-                    level, title, start_page = toc[i]
-                    end_page = None
-
-                    # 다음 챕터의 시작 페이지를 찾고 현재 챕터의 end_page로 설정
-                    if i + 1 < len(toc):
-                        next_level, next_title, next_start_page = toc[i + 1]
-                        if next_level <= level:
-                            end_page = next_start_page - 1
-                        else:
-                            # 마지막 챕터의 경우, 마지막 페이지를 end_page로 설정
-                            end_page = total_pages - 1
-                    # `end_page`가 None일 경우 total_pages - 1로 설정
-                    if end_page is None:
-                        end_page = total_pages - 1
-
-                    # 시작 페이지와 끝 페이지가 동일한 경우를 처리
-                    if start_page > end_page:
-                        end_page = start_page
-
-                    # 그루핑
-                    if level == 1:
-                        # level 1 챕터의 경우 새로운 그룹 시작
-                        current_group += 1
-
-                    chapter = Chapter.objects.create(
-                        name=title,
-                        start_page=start_page,
-                        end_page=end_page,
-                        level=level,
-                        group=current_group,  # 현재 그룹 번호로 설정
-                        bookmarked=False,
-                        pdf_file=pdf_file
-                    )
-                    if first_chapter_id is None:
-                        first_chapter_id = chapter.id  # 첫 번째 챕터의 ID 저장
-                    chapters.append(chapter)
-                return chapters, first_chapter_id
-
-            toc = pdf_document.get_toc()
-            if toc:
-                chapters, first_chapter_id = save_chapters_from_toc(toc, pdf_file, len(pages_text))
-                logger.info(f"Chapters information saved from TOC. First chapter ID: {first_chapter_id}")
-            else:
-                logger.warning("No TOC found in PDF")
-                chapters, first_chapter_id = [], None
-
-            # 챕터별로 연결 생성
-            def create_connections(chapters):
-                for i, chapter in enumerate(chapters):
-                    for j in range(i + 1, len(chapters)):
-                        next_chapter = chapters[j]
-                        if next_chapter.level == chapter.level + 1:
-                            PageConnection.objects.create(
-                                pdf_file=chapter.pdf_file,
-                                source=chapter,
-                                target=next_chapter,
-                                similarity=-1.0  # 챕터기반 연결 구분
-                            )
-                        elif next_chapter.level <= chapter.level:
-                            break
-
-            create_connections(chapters)
-            logger.info("Chapter-based page connections created")
-
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-
-            # 챕터 임베딩 생성
-            chapter_texts = [chapter.name for chapter in chapters]
-            chapter_embeddings = model.encode(chapter_texts)
-
-            # 유사도 계산 및 연결 생성
-            def create_connections_from_embeddings(chapters, embeddings):
-                cosine_similarities = util.pytorch_cos_sim(embeddings, embeddings).numpy()
-                for i, chapter in enumerate(chapters):
-                    for j in range(i + 1, len(chapters)):
-                        similarity = cosine_similarities[i][j]
-                        if similarity > 0.75:  # 유사도 임계값 설정
-                            PageConnection.objects.create(
-                                pdf_file=chapter.pdf_file,
-                                source=chapter,
-                                target=chapters[j],
-                                similarity=similarity
-                            )
-
-            create_connections_from_embeddings(chapters, chapter_embeddings)
-            logger.info("Chapter-based page connections created using embeddings")
-            # ID를 반환하는 응답
-            return Response({"message": "PDF and connections have been saved.", "pdf_file_id": pdf_file.id, "first_chapter_id": first_chapter_id}, status=status.HTTP_200_OK)
+                logger.error(f"Error occurred in PageImageView: {e}")
+                return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            response = HttpResponse(data, content_type='image/png')
+            response['X-Cache'] = 'hit' if cache_hit else 'miss'
+            try:
+                rendering.prefetch_adjacent(pdf_file, page_number, dpi, self.thumbnail)
+            except Exception as e:
+                # 미리 렌더링은 부가 기능이므로 실패해도 이미 렌더링한 페이지는 그대로 응답
+                logger.warning(f"Failed to schedule page prefetch for PDF {pdf_file.id}: {e}")
+
+        response['ETag'] = etag
+        response['Cache-Control'] = f'private, max-age={settings.PAGE_IMAGE_MAX_AGE}, immutable'
+        return response
+
+
+# 다른 PDF 챕터와의 교차 문서 연결 목록 (?min_similarity=&limit=)
+class PdfLinksView(APIView):
+    def get(self, request, pdf_file_id):
+        try:
+            get_object_or_404(PDFFile, pk=pdf_file_id)
+            min_similarity = request.query_params.get('min_similarity')
+            limit = int(request.query_params.get('limit', 100))
+            links = pdf_links(pdf_file_id, float(min_similarity) if min_similarity else None, limit)
+            return Response({'pdf_file_id': pdf_file_id, 'links': links})
+
+        except Http404:
+            return Response({"error": "PDF file not found."}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Error occurred: {e}")
+            logger.error(f"Error occurred in PdfLinksView: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-# 키워드 검색
+
+
+# Prometheus text format 지표 (요청/단계별 시간, 쿼리 수, 저장소 작업, 작업 큐 상태)
+class MetricsView(View):
+    def get(self, request):
+        storage_operations = storage_metrics.stats()
+        queue = dict(IngestionJob.objects.values('status').annotate(n=Count('id')).values_list('status', 'n'))
+        extra = [
+            ('spreadout_storage_operations_total', 'counter', 'Storage operations by backend.',
+             [({'backend': op['backend'], 'operation': op['operation']}, op['count']) for op in storage_operations]),
+            ('spreadout_storage_errors_total', 'counter', 'Failed storage operations by backend.',
+             [({'backend': op['backend'], 'operation': op['operation']}, op['errors']) for op in storage_operations]),
+            ('spreadout_storage_seconds_total', 'counter', 'Time spent in storage operations.',
+             [({'backend': op['backend'], 'operation': op['operation']}, op['total_seconds']) for op in storage_operations]),
+            ('spreadout_storage_bytes_total', 'counter', 'Bytes transferred by storage operations.',
+             [({'backend': op['backend'], 'operation': op['operation']}, op['bytes']) for op in storage_operations]),
+            ('spreadout_ingestion_queue_jobs', 'gauge', 'Ingestion jobs by status.',
+             [({'status': job_status}, queue.get(job_status, 0)) for job_status, _ in IngestionJob.STATUS_CHOICES]),
+            ('spreadout_process_rss_bytes', 'gauge', 'Resident set size of this process.',
+             [({}, current_rss_bytes())]),
+        ]
+        return HttpResponse(metrics_registry.render(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# 중복 업로드 캐시 적중률, 절약한 시간
+class CacheStatsView(APIView):
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+# 저장소(S3 / 로컬) 작업별 호출 수와 지연 시간
+class StorageStatsView(APIView):
+    def get(self, request):
+        return Response({
+            'backend': settings.PDF_STORAGE_BACKEND,
+            'operations': storage_metrics.stats(),
+            'page_cache': rendering.stats(),
+        }, status=status.HTTP_200_OK)
+
+
+# 임베딩 모델 로드 상태 (로드 시간, 메모리 사용량)
+class EmbeddingModelStatusView(APIView):
+    def get(self, request):
+        return Response(registry.stats(), status=status.HTTP_200_OK)
+
+# 키워드 검색 (ingestion 때 만든 역색인에서 BM25 로 챕터 순위를 매김)
+# pdf_file_id 를 주면 해당 PDF 만, user_id 를 주면 유저의 전체 라이브러리에서 검색
+# 여러 단어, "따옴표로 묶은 구절" 검색 지원
 class SearchView(APIView):
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def post(self, request):
         try:
-            # 파일 및 검색어 정보 확인
-            if 'file' not in request.FILES or 'keyword' not in request.data:
-                return Response({"error": "File and keyword must be provided."}, status=status.HTTP_400_BAD_REQUEST)
+            # 검색어 및 검색 범위 확인
+            if 'keyword' not in request.data or not ('pdf_file_id' in request.data or 'user_id' in request.data):
+                return Response({"error": "keyword and pdf_file_id or user_id must be provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-            file = request.FILES['file']
             keyword = request.data['keyword']
+            try:
+                limit = int(request.data.get('limit', 20))
+                pdf_file_id = int(request.data['pdf_file_id']) if 'pdf_file_id' in request.data else None
+                user_id = int(request.data['user_id']) if 'user_id' in request.data else None
+            except (TypeError, ValueError):
+                return Response({"error": "pdf_file_id, user_id and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+            if pdf_file_id is not None:
+                pdf_file = get_object_or_404(PDFFile, pk=pdf_file_id)
+                results = search_index.search(keyword, pdf_file_id=pdf_file.id, limit=limit)
+            else:
+                user = get_object_or_404(User, pk=user_id)
+                results = search_index.search(keyword, user_id=user.id, limit=limit)
 
-            # PDF 텍스트 추출
-            doc = fitz.open(stream=file.read(), filetype='pdf')
-
-            # PDF 파일과 연결된 챕터를 찾기 위해 DB에서 필터링
-            # 'pdf_file'을 정의하거나 필터링에 사용할 모델 필드가 필요합니다.
-            # 예를 들어, 특정 PDF 파일에 연결된 챕터를 찾으려면 pdf_file_id 등을 사용해야 합니다.
-            # 지금은 파일 업로드가 아닌 pdf_file 객체를 필요로 하므로 주석 처리
-            # chapters = Chapter.objects.filter(pdf_file=pdf_file)  # pdf_file은 현재 정의되지 않음
-
-            # 현재 검색에서는 PDF 파일에 연결된 챕터 정보가 필요 없으므로 아래와 같이
-            chapters = Chapter.objects.all()  # 또는 특정 조건으로 필터링
-
-            results = {}
-            for chapter in chapters:
-                page_start = chapter.start_page - 1
-                page_end = chapter.end_page
-                chapter_text = "".join([doc.load_page(i).get_text() for i in range(page_start, page_end)])
-                if keyword.lower() in chapter_text.lower():
-                    found_pages = set()
-                    for i in range(page_start, page_end):
-                        if keyword.lower() in doc.load_page(i).get_text().lower():
-                            found_pages.add(i + 1)
-
-                    # 챕터의 level이 가장 낮은 것을 저장하도록 수정
-                    if chapter.level not in results or chapter.level < results[chapter.level]['level']:
-                        results[chapter.level] = {
-                            'id': chapter.id,
-                            'name': chapter.name,
-                            'start_page': chapter.start_page,
-                            'found_pages': frozenset(found_pages),
-                            'level': chapter.level
-                        }
-
-            # 결과를 level 오름차순으로 정렬하여 반환
-            sorted_results = sorted(results.values(), key=lambda x: x['level'])
-
-            return Response({'results': [{'id': res['id'], 'name': res['name'], 'page': res['start_page'], 'found_pages': res['found_pages']} for res in sorted_results]})
+            return Response({'results': results})
 
+        except Http404:
+            return Response({"error": "PDF file or user not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             logger.error(f"Error occurred in SearchView: {e}")
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# 의미 검색 (저장된 챕터 임베딩에서 질의와 가장 가까운 챕터 top-k)
+class SemanticSearchView(APIView):
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def post(self, request):
+        try:
+            if 'query' not in request.data or not ('pdf_file_id' in request.data or 'user_id' in request.data):
+                return Response({"error": "query and pdf_file_id or user_id must be provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+            query = request.data['query']
+            try:
+                top_k = int(request.data.get('top_k', 10))
+                pdf_file_id = int(request.data['pdf_file_id']) if 'pdf_file_id' in request.data else None
+                user_id = int(request.data['user_id']) if 'user_id' in request.data else None
+            except (TypeError, ValueError):
+                return Response({"error": "pdf_file_id, user_id and top_k must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+            if pdf_file_id is not None:
+                pdf_file = get_object_or_404(PDFFile, pk=pdf_file_id)
+                results = semantic_search(query, registry.encode, top_k=top_k, pdf_file_id=pdf_file.id)
+            else:
+                user = get_object_or_404(User, pk=user_id)
+                results = semantic_search(query, registry.encode, top_k=top_k, user_id=user.id)
+
+            return Response({'results': results})
+
+        except Http404:
+            return Response({"error": "PDF file or user not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error occurred in SemanticSearchView: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# 챕터별 채팅 세션 목록 / 생성
+class SessionListView(APIView):
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def get(self, request):
+        if 'user_id' not in request.query_params:
+            return Response({"error": "user_id must be provided."}, status=status.HTTP_400_BAD_REQUEST)
+        sessions = Session.objects.filter(user_id=request.query_params['user_id'])
+        if 'chapter_id' in request.query_params:
+            sessions = sessions.filter(chapter_id=request.query_params['chapter_id'])
+        return Response({'sessions': list(sessions.order_by('id').values('id', 'user_id', 'chapter_id'))})
+
+    def post(self, request):
+        if 'user_id' not in request.data or 'chapter_id' not in request.data:
+            return Response({"error": "user_id and chapter_id must be provided."}, status=status.HTTP_400_BAD_REQUEST)
+        user = get_object_or_404(User, pk=request.data['user_id'])
+        chapter = get_object_or_404(Chapter, pk=request.data['chapter_id'])
+        session = Session.objects.create(user=user, chapter=chapter)
+        return Response({'id': session.id, 'user_id': user.id, 'chapter_id': chapter.id}, status=status.HTTP_201_CREATED)
+
+
+# 세션 메세지 조회 (커서 기반 페이지네이션) / 여러 메세지 한 번에 추가
+# GET ?cursor=<next_cursor>&limit=50&order=desc|asc
+class SessionMessagesView(APIView):
+    parser_classes = [JSONParser]
+
+    def get(self, request, session_id):
+        get_object_or_404(Session, pk=session_id)
+        try:
+            limit = int(request.query_params.get('limit', settings.CHAT_PAGE_SIZE))
+            messages, next_cursor = chat.message_page(
+                session_id,
+                cursor=request.query_params.get('cursor'),
+                limit=max(limit, 1),
+                newest_first=request.query_params.get('order', 'desc') != 'asc',
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'messages': messages, 'next_cursor': next_cursor})
+
+    def post(self, request, session_id):
+        session = get_object_or_404(Session, pk=session_id)
+        if not isinstance(request.data, dict):
+            return Response({"error": "Request body must be a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+        messages = request.data.get('messages', [request.data] if 'content' in request.data else [])
+        senders = {sender for sender, _ in Message._meta.get_field('sender').choices}
+        if not isinstance(messages, list) or not messages or any(
+            not isinstance(message, dict) or message.get('sender') not in senders or not isinstance(message.get('content'), str)
+            for message in messages
+        ):
+            return Response({"error": "messages must be a list of {sender: user|bot, content}."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(messages) > settings.CHAT_MAX_PAGE_SIZE:
+            return Response({"error": f"At most {settings.CHAT_MAX_PAGE_SIZE} messages can be appended at once."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'messages': chat.append_messages(session, messages)}, status=status.HTTP_201_CREATED)
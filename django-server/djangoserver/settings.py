@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -128,3 +129,101 @@ AWS_ACCESS_KEY_ID = env('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = env('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = env('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = env('AWS_S3_REGION_NAME')
+AWS_S3_MAX_POOL_CONNECTIONS = env.int('AWS_S3_MAX_POOL_CONNECTIONS', default=32)
+AWS_S3_MULTIPART_THRESHOLD = env.int('AWS_S3_MULTIPART_THRESHOLD', default=16 * 1024 * 1024)  # 이보다 큰 파일은 multipart 업로드
+AWS_S3_MULTIPART_CHUNKSIZE = env.int('AWS_S3_MULTIPART_CHUNKSIZE', default=8 * 1024 * 1024)
+AWS_S3_TRANSFER_CONCURRENCY = env.int('AWS_S3_TRANSFER_CONCURRENCY', default=8)  # 동시에 올리는 part 수
+
+# Embedding model settings
+EMBEDDING_MODEL_NAME = env('EMBEDDING_MODEL_NAME', default='all-MiniLM-L6-v2')
+EMBEDDING_DEVICE = env('EMBEDDING_DEVICE', default='cpu')
+EMBEDDING_BATCH_SIZE = env.int('EMBEDDING_BATCH_SIZE', default=64)
+EMBEDDING_WARMUP = env.bool('EMBEDDING_WARMUP', default=False)
+EMBEDDING_TORCH_THREADS = env.int('EMBEDDING_TORCH_THREADS', default=0)  # 0 이면 torch 기본값 사용
+# 'torch', 'torch-int8' (동적 양자화), 'onnx', 'onnx-int8' (onnxruntime). ONNX 모델은 처음 쓸 때 EMBEDDING_ONNX_DIR 에 내보냄
+EMBEDDING_BACKEND = env('EMBEDDING_BACKEND', default='torch')
+EMBEDDING_THREADS = env.int('EMBEDDING_THREADS', default=EMBEDDING_TORCH_THREADS)  # 모든 backend 의 intra-op 스레드 수, 0 이면 기본값
+EMBEDDING_ONNX_DIR = env('EMBEDDING_ONNX_DIR', default=str(BASE_DIR / 'cache' / 'onnx'))
+EMBEDDING_CACHE_ENABLED = env.bool('EMBEDDING_CACHE_ENABLED', default=True)
+EMBEDDING_CACHE_MEMORY_ITEMS = env.int('EMBEDDING_CACHE_MEMORY_ITEMS', default=20000)
+EMBEDDING_CACHE_DIR = env('EMBEDDING_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'embeddings'))  # 빈 값이면 디스크 캐시 사용 안 함
+EMBEDDING_CACHE_DISK_ITEMS = env.int('EMBEDDING_CACHE_DISK_ITEMS', default=200000)
+
+# Ingestion settings
+INGEST_BULK_BATCH_SIZE = env.int('INGEST_BULK_BATCH_SIZE', default=500)
+INGESTION_ASYNC = env.bool('INGESTION_ASYNC', default=True)
+INGESTION_AUTOSTART_WORKERS = env.bool('INGESTION_AUTOSTART_WORKERS', default=True)
+INGESTION_WORKERS = env.int('INGESTION_WORKERS', default=2)
+INGESTION_POLL_SECONDS = env.float('INGESTION_POLL_SECONDS', default=2.0)
+INGESTION_JOB_TIMEOUT = env.int('INGESTION_JOB_TIMEOUT', default=3600)
+INGESTION_SPOOL_DIR = env('INGESTION_SPOOL_DIR', default=str(BASE_DIR / 'spool'))
+ARTIFACT_EVICTION_GRACE_SECONDS = env.int('ARTIFACT_EVICTION_GRACE_SECONDS', default=86400)
+
+# Similarity connection settings (threshold 와 top-k 는 요청 파라미터로 덮어쓸 수 있음)
+SIMILARITY_THRESHOLD = env.float('SIMILARITY_THRESHOLD', default=0.75)
+SIMILARITY_TOP_K = env.int('SIMILARITY_TOP_K', default=0)
+SIMILARITY_BLOCK_SIZE = env.int('SIMILARITY_BLOCK_SIZE', default=512)
+
+# PDF 원본 저장소 ('s3', 'local' 또는 저장소 클래스 경로)
+PDF_STORAGE_BACKEND = env('PDF_STORAGE_BACKEND', default='s3')
+PDF_LOCAL_STORAGE_DIR = env('PDF_LOCAL_STORAGE_DIR', default=str(BASE_DIR / 'storage'))
+
+# Full-text search settings (doc_freq 가 이 값보다 큰 검색어는 term_freq 상위 posting 만 후보로 읽음)
+SEARCH_MAX_POSTINGS_PER_TERM = env.int('SEARCH_MAX_POSTINGS_PER_TERM', default=5000)
+
+# Semantic search settings (챕터 수가 SEMANTIC_IVF_MIN_SIZE 이상이면 IVF 인덱스 사용)
+SEMANTIC_IVF_MIN_SIZE = env.int('SEMANTIC_IVF_MIN_SIZE', default=50000)
+SEMANTIC_IVF_PROBES = env.int('SEMANTIC_IVF_PROBES', default=8)
+SEMANTIC_EXACT_LIMIT = env.int('SEMANTIC_EXACT_LIMIT', default=20000)
+
+# PDF text extraction settings (EXTRACTION_WORKERS 가 0 이면 CPU 수, 1 이면 프로세스 풀 사용 안 함)
+EXTRACTION_WORKERS = env.int('EXTRACTION_WORKERS', default=0)
+EXTRACTION_CHUNK_PAGES = env.int('EXTRACTION_CHUNK_PAGES', default=32)
+EXTRACTION_PARALLEL_MIN_PAGES = env.int('EXTRACTION_PARALLEL_MIN_PAGES', default=64)
+
+# Chapter embedding settings ('title' 은 챕터 제목, 'content' 는 챕터 페이지 본문을 조각내서 평균)
+CHAPTER_EMBEDDING_SOURCE = env('CHAPTER_EMBEDDING_SOURCE', default='title')
+CHAPTER_EMBEDDING_CHUNK_TOKENS = env.int('CHAPTER_EMBEDDING_CHUNK_TOKENS', default=128)
+CHAPTER_EMBEDDING_MAX_CHUNKS = env.int('CHAPTER_EMBEDDING_MAX_CHUNKS', default=16)
+
+# 목차(outline)가 없는 PDF 의 목차 추정 (글자 크기/굵기 기반). 페이지마다 위쪽 TOC_HEURISTIC_MAX_LINES 줄만 제목 후보로 봄
+# (본문 크기를 정하려고 모든 줄을 읽으므로 스캔 비용은 줄지 않음. 그보다 아래에 있는 제목은 목차에 들어가지 않음)
+TOC_HEURISTIC_ENABLED = env.bool('TOC_HEURISTIC_ENABLED', default=True)
+TOC_HEURISTIC_MAX_LEVELS = env.int('TOC_HEURISTIC_MAX_LEVELS', default=3)
+TOC_HEURISTIC_MAX_LINES = env.int('TOC_HEURISTIC_MAX_LINES', default=8)
+
+# ASGI 비동기 뷰에서 PDF 파싱/모델 추론을 돌리는 스레드 수
+ASYNC_CPU_WORKERS = env.int('ASYNC_CPU_WORKERS', default=2)
+
+# Chat message pagination
+CHAT_PAGE_SIZE = env.int('CHAT_PAGE_SIZE', default=50)
+CHAT_MAX_PAGE_SIZE = env.int('CHAT_MAX_PAGE_SIZE', default=500)
+
+# Profiling (PROFILE_SAMPLE_RATE 비율의 요청, 또는 X-Profile: 1 헤더가 붙은 요청을 cProfile 로 기록)
+# X-Profile 헤더로 누구나 디스크에 덤프를 남길 수 있으므로 필요할 때만 켬
+PROFILE_HEADER_ENABLED = env.bool('PROFILE_HEADER_ENABLED', default=False)
+PROFILE_SAMPLE_RATE = env.float('PROFILE_SAMPLE_RATE', default=0.0)
+PROFILE_DIR = env('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+
+# manage.py ingest_pdfs 일괄 ingestion (챕터를 INGEST_LIBRARY_ENCODE_BATCH 개씩 모아서 인코딩)
+INGEST_LIBRARY_ENCODE_BATCH = env.int('INGEST_LIBRARY_ENCODE_BATCH', default=2048)
+INGEST_LIBRARY_UPLOAD_THREADS = env.int('INGEST_LIBRARY_UPLOAD_THREADS', default=4)
+
+# 같은 사용자의 다른 PDF 챕터와의 교차 문서 연결 (새 챕터마다 가장 유사한 CROSS_LINK_TOP_K 개 중 threshold 를 넘는 것만)
+CROSS_LINK_ENABLED = env.bool('CROSS_LINK_ENABLED', default=True)
+CROSS_LINK_THRESHOLD = env.float('CROSS_LINK_THRESHOLD', default=0.6)
+CROSS_LINK_TOP_K = env.int('CROSS_LINK_TOP_K', default=3)
+CROSS_LINK_BLOCK_SIZE = env.int('CROSS_LINK_BLOCK_SIZE', default=4096)  # 한 번에 비교하는 기존 챕터 수
+
+# PDF 페이지 이미지 (/api/pdf/<id>/page/<n>.png). 렌더링한 이미지와 원본 PDF 사본은 크기 제한 디스크 LRU 에 보관
+PAGE_RENDER_DPI = env.int('PAGE_RENDER_DPI', default=150)
+PAGE_RENDER_MIN_DPI = env.int('PAGE_RENDER_MIN_DPI', default=36)
+PAGE_RENDER_MAX_DPI = env.int('PAGE_RENDER_MAX_DPI', default=300)
+PAGE_THUMBNAIL_WIDTH = env.int('PAGE_THUMBNAIL_WIDTH', default=200)  # px
+PAGE_CACHE_DIR = env('PAGE_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'pages'))
+PAGE_CACHE_MAX_BYTES = env.int('PAGE_CACHE_MAX_BYTES', default=1024 * 1024 * 1024)
+PAGE_SOURCE_CACHE_MAX_BYTES = env.int('PAGE_SOURCE_CACHE_MAX_BYTES', default=2 * 1024 * 1024 * 1024)
+PAGE_IMAGE_MAX_AGE = env.int('PAGE_IMAGE_MAX_AGE', default=365 * 24 * 3600)
+PAGE_PREFETCH_PAGES = env.int('PAGE_PREFETCH_PAGES', default=3)  # 요청한 페이지 뒤로 미리 렌더링할 페이지 수 (0 이면 끔)
+PAGE_PREFETCH_THREADS = env.int('PAGE_PREFETCH_THREADS', default=2)
+PAGE_PREFETCH_ASYNC = env.bool('PAGE_PREFETCH_ASYNC', default=True)  # False 면 요청 스레드에서 바로 렌더링 (테스트용)